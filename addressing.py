@@ -0,0 +1,260 @@
+### LIBRARIES ###
+from __future__ import division
+import socket
+import struct
+
+
+### CONSTANTS ###
+GRPC_BASE_PORT = 50000                  # gRPC port of the switches follow the schema "5XXXX" (where XXXX=number of the switch)
+GRPC_MAX_PORT = 65535                   # Last TCP port available for the gRPC servers of the switches
+
+# legacy addressing (addressing=legacy, the default): the identifiers of the original generators
+LEAF_IPV4_LOOPBACK = "192.168.1."       # IPv4 loopback address of leaf switches will follow the schema "192.168.1.X" (where X=number of the switch)
+SPINE_IPV4_LOOPBACK = "192.168.2."      # IPv4 loopback address of spine switches will follow the schema "192.168.2.X" (where X=number of the switch)
+SUPER_SPINE_IPV4_LOOPBACK = "192.168.3."    # IPv4 loopback address of super spine switches will follow the schema "192.168.3.X" (where X=number of the switch)
+LEAF_MAC = "00:AA:00:00:00:"            # MAC address of the leaf switches follow the schema "00:AA:00:00:00:XX" (where XX=number of the switch)
+SPINE_MAC = "00:BB:00:00:00:"           # MAC address of the spine switches follow the schema "00:BB:00:00:00:XX" (where XX=number of the switch)
+SUPER_SPINE_MAC = "00:CC:00:00:00:"     # MAC address of the super spine switches follow the schema "00:CC:00:00:00:XX" (where XX=number of the switch)
+LEAF_MPLS_ID = "1"                      # MPLS ID of leaf switch follow the schema "1XX" (where XX=number of switch)
+SPINE_MPLS_ID = "2"                     # MPLS ID of spine switch follow the schema "2XX" (where XX=number of switch)
+SUPER_SPINE_MPLS_ID = "3"               # MPLS ID of super spine switch follow the schema "3XX" (where XX=number of switch)
+HOST_MAC = "00:00:00:00:00:X"           # Hosts MAC will follow the schema "00:00:00:00:00:X" (where X=number of leaf and letter of host)
+HOST_IPV4 = "172.16.X.Y"                # Hosts IPv4 will follow the schema "172.16.X.Y" (where X=number of leaf and Y=number of host)
+HOST_IPV4_GATEWAY = "172.16.X.254"      # Hosts IPv4 gateway will follow the schema "172.16.X.254" (where X=number of leaf)
+HOST_IPV6 = "2001:X:X::Y"               # Hosts IPv6 will follow the schema "2001:X:X::Y" (where X=number of leaf and Y=letter of host)
+HOST_IPV6_GATEWAY = "2001:X:X::ff"      # Hosts IPv6 gateway will follow the schema "2001:X:X::ff" (where X=number of leaf)
+HOST_IPV4_PREFIX = 24                   # Prefix length of the IPv4 subnet of each leaf
+HOST_IPV6_PREFIX = 64                   # Prefix length of the IPv6 subnet of each leaf
+
+# scalable addressing (addressing=scalable): integer pools, every identifier is unique as long as its pool lasts
+LEAF_MAC_BASE = 0x00AA00000000          # MAC address of leaf N is LEAF_MAC_BASE + N
+SPINE_MAC_BASE = 0x00BB00000000         # MAC address of spine N is SPINE_MAC_BASE + N
+SUPER_SPINE_MAC_BASE = 0x00CC00000000   # MAC address of super spine N is SUPER_SPINE_MAC_BASE + N
+SWITCH_MAC_COUNT = 1 << 32              # Number of MAC addresses of each tier
+HOST_MAC_BASE = 0x020000000000          # MAC address of host j of leaf N is HOST_MAC_BASE + N*HOST_MAC_BLOCK + j (locally administered)
+HOST_MAC_BLOCK = 1 << 16                # Number of host MAC addresses of each leaf
+SID_BASE = 16000                        # Node SID of the switch with index N is SID_BASE + N (start of the usual SRGB)
+SID_MAX = (1 << 20) - 1                 # Largest MPLS label
+IPV6_SID_MAX = 0xFFFF                   # IPv6 SID of the switch with index N is 3:<N in hex>:2:: (one 16-bit group)
+VLAN_BASE = 100                         # VLAN of leaf N is VLAN_BASE + N - 1
+VLAN_MAX = 4094                         # Largest usable VLAN ID
+LOOPBACK_POOL = u"192.168.0.0/16"       # IPv4 loopback of the switch with index N is the Nth address of the pool
+HOST_IPV4_POOL = u"10.0.0.0/8"          # IPv4 subnets of the leaves (one subnet per leaf, sized after the hosts per leaf)
+HOST_IPV6_POOL = u"2001::/16"           # IPv6 subnets of the leaves (one /64 per leaf)
+MIN_IPV4_SUBNET = 256                   # Smallest IPv4 subnet (in addresses) of a leaf
+
+
+### FUNCTIONS ###
+
+""" Returns the letters of host j of a leaf: "a" to "z", then "aa", "ab", ... (bijective base 26)
+"""
+def host_letters(j):
+    letters = ""
+    while j > 0:
+        j, r = divmod(j - 1, 26)
+        letters = chr(ord('a') + r) + letters
+    return letters
+
+
+""" Formats a 48-bit integer as a MAC address (upper case, as in the netcfg)
+"""
+def format_mac(value):
+    digits = "%012X" % value
+    return ":".join(digits[i:i+2] for i in range(0, 12, 2))
+
+
+""" Returns the allocator selected by the environment ("addressing" is "legacy", the default, or "scalable")
+    Input: environment; total number of leaf, spine and super spine switches; number of hosts per leaf
+"""
+def allocator_from_environ(environ, leafs, spines, hosts, super_spines=0):
+    scheme = environ.get('addressing', 'legacy')
+    if scheme == 'legacy':
+        return LegacyAllocator(leafs, spines, hosts, super_spines)
+    if scheme == 'scalable':
+        return ScalableAllocator(leafs, spines, hosts, super_spines)
+    raise ValueError("unknown addressing scheme '%s' (legacy or scalable)" % scheme)
+
+
+### CLASSES ###
+
+""" Contiguous range of integer identifiers: identifier i (from 0) is first + i*step
+    Input: name of the pool (for the errors); first identifier; number of identifiers; distance between identifiers
+"""
+class Pool(object):
+    __slots__ = ("name", "first", "size", "step")
+
+    def __init__(self, name, first, size, step=1):
+        self.name = name
+        self.first = first
+        self.size = size
+        self.step = step
+
+    """ Returns identifier i (ValueError when the pool is exhausted)
+    """
+    def value(self, i):
+        if not 0 <= i < self.size:
+            raise ValueError("%s pool exhausted: %d identifiers available, #%d requested" % (self.name, self.size, i + 1))
+        return self.first + i * self.step
+
+
+""" Identifiers of the original generators (the default, so that existing fabrics keep their netcfg): the host MAC
+    and IPv6 addresses are only valid up to 9 leaves and 6 hosts per leaf (decimal leaf number and host letter used as
+    hex digits), the switch MACs and SIDs up to 99 switches per tier and the VLANs (leaf*100) up to 40 leaves
+"""
+class LegacyAllocator(object):
+    name = "legacy"
+    macs = {"leaf": LEAF_MAC, "spine": SPINE_MAC, "superspine": SUPER_SPINE_MAC}
+    mpls_ids = {"leaf": LEAF_MPLS_ID, "spine": SPINE_MPLS_ID, "superspine": SUPER_SPINE_MPLS_ID}
+    loopbacks = {"leaf": LEAF_IPV4_LOOPBACK, "spine": SPINE_IPV4_LOOPBACK, "superspine": SUPER_SPINE_IPV4_LOOPBACK}
+
+    def __init__(self, leafs, spines, hosts, super_spines=0):
+        self.leafs = leafs
+        self.spines = spines
+        self.hosts = hosts
+        self.super_spines = super_spines
+
+    """ Returns the limits of the scheme that the fabric exceeds (empty when every identifier is valid)
+    """
+    def exceeded(self):
+        limits = []
+        if self.hosts > 6:
+            limits.append("%d hosts per leaf (host MACs and IPv6 addresses are only valid up to 6)" % self.hosts)
+        if max(self.leafs, self.spines, self.super_spines) > 9:
+            limits.append("%d switches per tier (host MACs and IPv6 addresses are only valid up to 9 leaves, switch "
+                          "MACs and SIDs up to 99 switches)" % max(self.leafs, self.spines, self.super_spines))
+        if self.leafs * 100 > VLAN_MAX:
+            limits.append("%d leaves (VLAN leaf*100 is only valid up to 40 leaves)" % self.leafs)
+        if self.leafs + self.spines + self.super_spines > GRPC_MAX_PORT - GRPC_BASE_PORT:
+            limits.append("%d switches (gRPC ports)" % (self.leafs + self.spines + self.super_spines))
+        return limits
+
+    """ Returns the gRPC port, MAC address, node SID and IPv4 loopback of a switch
+        Input: "leaf", "spine" or "superspine"; number of the switch within its tier; number of the switch in the whole
+               fabric
+    """
+    def switch_ids(self, kind, number, index):
+        return (GRPC_BASE_PORT + index,
+                self.macs[kind] + str(number).zfill(2),
+                self.mpls_ids[kind] + str(number).zfill(2),
+                self.loopbacks[kind] + str(number))
+
+    """ Returns the group of the IPv6 SID (3:<group>:2::) of a switch: the digits of its node SID
+        Input: node SID of the switch; number of the switch in the whole fabric
+    """
+    def ipv6_sid(self, sid, index):
+        return sid
+
+    """ Returns the VLAN, the IPv4 gateway (and prefix length) and the IPv6 gateway (and prefix length) of a leaf
+    """
+    def leaf_ids(self, leaf):
+        return (leaf * 100, HOST_IPV4_GATEWAY.replace("X", str(leaf)), HOST_IPV4_PREFIX,
+                HOST_IPV6_GATEWAY.replace("X", str(leaf)), HOST_IPV6_PREFIX)
+
+    """ Returns the MAC addresses, IPv4 addresses and IPv6 addresses of the hosts of a leaf (one list per identifier,
+        computed in bulk from the prefixes of the leaf)
+        Input: number of the leaf; letters of the hosts ("a", "b", ...)
+    """
+    def host_columns(self, leaf, letters):
+        mac_prefix = HOST_MAC.replace("X", str(leaf))
+        ipv4_prefix = HOST_IPV4.replace("X", str(leaf)).replace("Y", "")
+        ipv6_prefix = HOST_IPV6.replace("X", str(leaf)).replace("Y", "")
+        return ([mac_prefix + l.upper() for l in letters],
+                [ipv4_prefix + str(j) for j in range(1, len(letters) + 1)],
+                [ipv6_prefix + l for l in letters])
+
+
+""" Identifiers allocated from integer pools: each leaf gets the smallest IPv4 subnet (at least a /24) that holds its
+    hosts and its gateway (the last usable address), a /64 with the gateway at ::ffff:ffff:ffff:fffe and a block of
+    host MAC addresses; the other identifiers are the base of their pool plus the number of the switch or leaf, so
+    they do not move when the fabric is resized. A ValueError is raised when a
+    pool is exhausted, so two entities never share an identifier.
+"""
+class ScalableAllocator(object):
+    name = "scalable"
+
+    def __init__(self, leafs, spines, hosts, super_spines=0):
+        try:
+            import ipaddress
+        except ImportError:
+            raise ImportError("addressing=scalable needs the ipaddress module (Python 3 or the ipaddress backport)")
+        self.ipaddress = ipaddress
+        self.leafs = leafs
+        self.spines = spines
+        self.hosts = hosts
+        self.super_spines = super_spines
+
+        subnet_size = MIN_IPV4_SUBNET
+        while subnet_size < hosts + 3:  # network, hosts, gateway and broadcast addresses
+            subnet_size *= 2
+        self.ipv4_prefix = 32 - (subnet_size.bit_length() - 1)
+        ipv4_pool = ipaddress.ip_network(HOST_IPV4_POOL)
+        ipv6_pool = ipaddress.ip_network(HOST_IPV6_POOL)
+        loopback_pool = ipaddress.ip_network(LOOPBACK_POOL)
+
+        self.grpc_ports = Pool("gRPC port", GRPC_BASE_PORT + 1, GRPC_MAX_PORT - GRPC_BASE_PORT)
+        self.leaf_macs = Pool("leaf MAC", LEAF_MAC_BASE + 1, SWITCH_MAC_COUNT - 1)
+        self.spine_macs = Pool("spine MAC", SPINE_MAC_BASE + 1, SWITCH_MAC_COUNT - 1)
+        self.super_spine_macs = Pool("super spine MAC", SUPER_SPINE_MAC_BASE + 1, SWITCH_MAC_COUNT - 1)
+        self.sids = Pool("node SID", SID_BASE + 1, SID_MAX - SID_BASE)
+        self.loopbacks = Pool("IPv4 loopback", int(loopback_pool.network_address) + 1, loopback_pool.num_addresses - 2)
+        self.vlans = Pool("VLAN", VLAN_BASE, VLAN_MAX - VLAN_BASE + 1)
+        self.host_macs = Pool("host MAC", HOST_MAC_BASE + HOST_MAC_BLOCK, (1 << 24) - 1, HOST_MAC_BLOCK)
+        self.ipv4_subnets = Pool("IPv4 subnet", int(ipv4_pool.network_address), ipv4_pool.num_addresses // subnet_size,
+                                 subnet_size)
+        self.ipv6_subnets = Pool("IPv6 subnet", int(ipv6_pool.network_address), ipv6_pool.num_addresses >> 64, 1 << 64)
+        self.subnet_size = subnet_size
+
+        # fail before any entity is built if the fabric does not fit in the pools
+        switches = leafs + spines + super_spines
+        self.grpc_ports.value(switches - 1)
+        self.sids.value(switches - 1)
+        self.loopbacks.value(switches - 1)
+        self.vlans.value(leafs - 1)
+        self.ipv4_subnets.value(leafs - 1)
+        self.host_macs.value(leafs - 1)
+        if hosts >= HOST_MAC_BLOCK:
+            raise ValueError("host MAC pool exhausted: %d identifiers available per leaf, #%d requested"
+                             % (HOST_MAC_BLOCK - 1, hosts))
+
+    def exceeded(self):
+        switches = self.leafs + self.spines + self.super_spines
+        if switches > IPV6_SID_MAX:
+            return ["%d switches (IPv6 SIDs are only valid up to %d switches)" % (switches, IPV6_SID_MAX)]
+        return []
+
+    def switch_ids(self, kind, number, index):
+        macs = {"leaf": self.leaf_macs, "spine": self.spine_macs, "superspine": self.super_spine_macs}[kind]
+        return (self.grpc_ports.value(index - 1),
+                format_mac(macs.value(number - 1)),
+                str(self.sids.value(index - 1)),
+                str(self.ipaddress.IPv4Address(self.loopbacks.value(index - 1))))
+
+    """ The node SIDs (SID_BASE + N) are decimal MPLS labels, which do not fit a 16-bit group of an IPv6 address: the
+        group of the IPv6 SID is the index of the switch in hex
+    """
+    def ipv6_sid(self, sid, index):
+        return "%x" % index
+
+    def leaf_ids(self, leaf):
+        ipv4_subnet = self.ipv4_subnets.value(leaf - 1)
+        ipv6_subnet = self.ipv6_subnets.value(leaf - 1)
+        return (self.vlans.value(leaf - 1),
+                str(self.ipaddress.IPv4Address(ipv4_subnet + self.subnet_size - 2)), self.ipv4_prefix,
+                str(self.ipaddress.IPv6Address(ipv6_subnet + (1 << 64) - 2)), 64)
+
+    """ The host MAC, IPv4 and IPv6 addresses of a leaf are the base of its blocks plus the number of the host: the
+        prefixes are formatted once per leaf and only the host part is formatted for each host
+    """
+    def host_columns(self, leaf, letters):
+        count = len(letters)
+        if count > self.subnet_size - 3 or count >= HOST_MAC_BLOCK:
+            raise ValueError("%d hosts do not fit in the subnet of a leaf (%d hosts at most)"
+                             % (count, min(self.subnet_size - 3, HOST_MAC_BLOCK - 1)))
+        mac_block = format_mac(self.host_macs.value(leaf - 1))[:-5]
+        ipv4_first = self.ipv4_subnets.value(leaf - 1) + 1
+        # the interface ID of every host fits in the last group, so all the addresses share the compressed prefix
+        ipv6_prefix = str(self.ipaddress.IPv6Address(self.ipv6_subnets.value(leaf - 1) + 1))[:-1]
+        ipv4s = struct.pack("!%dI" % count, *range(ipv4_first, ipv4_first + count))
+        return (["%s%02X:%02X" % (mac_block, j >> 8, j & 0xFF) for j in range(1, count + 1)],
+                [socket.inet_ntoa(ipv4s[i:i+4]) for i in range(0, 4 * count, 4)],
+                [ipv6_prefix + "%x" % j for j in range(1, count + 1)])
@@ -0,0 +1,178 @@
+### LIBRARIES ###
+from __future__ import division
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+
+### CONSTANTS ###
+CACHE_VERSION = "1"                     # Bump to invalidate every entry (e.g. when the layout of the entries changes)
+FRAMES_DIR = "mininet/mn_scripts"       # Directory with the frame files read by the generators
+META_FILE = "meta.json"                 # File (inside each entry) with the outputs, the size and the last use of the entry
+DEFAULT_MAX_MB = 512                    # Size (in MB) above which the least recently used entries are evicted
+DEFAULT_MAX_DAYS = 30                   # Age (in days since the last use) above which an entry is evicted
+
+
+### FUNCTIONS ###
+
+""" Returns the source files of the modules loaded from the directory of the generator (the generator and the
+    modules it imports), so that any change to the code invalidates the entries it generated
+    Input: file of the generator
+"""
+def source_files(generator_file):
+    directory = os.path.dirname(os.path.abspath(generator_file))
+    files = set([os.path.abspath(generator_file)])
+    for module in list(sys.modules.values()):
+        module_file = getattr(module, '__file__', None)
+        if module_file and os.path.dirname(os.path.abspath(module_file)) == directory:
+            files.add(os.path.abspath(module_file).replace('.pyc', '.py'))
+    return sorted(f for f in files if os.path.exists(f))
+
+
+""" Returns the key of the artifacts of a generator run: a hash of the generator, its sources, its parameters
+    (fabric dimensions and options) and the contents of every frame file
+    Input: file of the generator; list of parameters
+"""
+def cache_key(generator_file, parameters):
+    key = hashlib.sha256()
+    key.update(("%s\n%s\n%r\n" % (CACHE_VERSION, os.path.basename(generator_file), parameters)).encode('utf-8'))
+    frames = [os.path.join(FRAMES_DIR, name) for name in sorted(os.listdir(FRAMES_DIR))] if os.path.isdir(FRAMES_DIR) else []
+    for file_name in source_files(generator_file) + frames:
+        key.update(os.path.basename(file_name).encode('utf-8') + b'\n')
+        f_file = open(file_name, 'rb')
+        key.update(hashlib.sha256(f_file.read()).digest())
+        f_file.close()
+    return key.hexdigest()
+
+
+""" Returns the total size (in bytes) of the given files
+"""
+def files_size(file_names):
+    return sum(os.path.getsize(f) for f in file_names if os.path.exists(f))
+
+
+### CLASSES ###
+
+""" Content-addressed cache of generated artifacts
+    Each entry is a directory named after the cache key with a copy of the outputs and a meta file. On a hit the
+    outputs are restored with a hard link (or a copy, when linking is disabled or not possible); the least recently
+    used entries are evicted when the cache grows past its size limit or when they were not used for too long.
+    Input: cache directory; size limit (MB); age limit (days); True to restore the outputs with hard links
+"""
+class ArtifactCache(object):
+
+    def __init__(self, directory, max_mb=DEFAULT_MAX_MB, max_days=DEFAULT_MAX_DAYS, link=True):
+        self.directory = directory
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age = max_days * 24 * 3600
+        self.link = link
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    """ Builds the cache from the environment ("netcfg_cache" is the cache directory; None when it is not set)
+    """
+    @staticmethod
+    def from_environ(environ):
+        if not environ.get('netcfg_cache'):
+            return None
+        return ArtifactCache(environ['netcfg_cache'],
+                             float(environ.get('netcfg_cache_max_mb', DEFAULT_MAX_MB)),
+                             float(environ.get('netcfg_cache_max_days', DEFAULT_MAX_DAYS)),
+                             environ.get('netcfg_cache_link', '1') == '1')
+
+    """ Restores the outputs of an entry
+        Input: cache key; output files
+        Output: True on a hit, False on a miss (in which case the outputs are removed, so that the generator writes
+                new files instead of truncating files that may be hard links to an entry)
+    """
+    def restore(self, key, outputs):
+        entry = os.path.join(self.directory, key)
+        meta = self.read_meta(entry)
+        if meta is None or sorted(meta["outputs"]) != sorted(outputs):
+            for output in outputs:
+                if os.path.lexists(output):
+                    os.remove(output)
+            return False
+
+        for output in outputs:
+            if os.path.lexists(output):
+                os.remove(output)
+            output_dir = os.path.dirname(output)
+            if output_dir and not os.path.isdir(output_dir):
+                os.makedirs(output_dir)
+            cached = os.path.join(entry, "files", output)
+            if self.link:
+                try:
+                    os.link(cached, output)
+                    continue
+                except OSError:
+                    pass            # e.g. the cache is on another file system
+            shutil.copy2(cached, output)
+
+        meta["last_used"] = time.time()
+        self.write_meta(entry, meta)
+        return True
+
+    """ Stores the outputs of a generator run and evicts the entries past the limits
+        Input: cache key; output files
+    """
+    def store(self, key, outputs):
+        entry = os.path.join(self.directory, key)
+        staging = entry + ".tmp%d" % os.getpid()
+        for output in outputs:
+            cached = os.path.join(staging, "files", output)
+            if not os.path.isdir(os.path.dirname(cached)):
+                os.makedirs(os.path.dirname(cached))
+            shutil.copy2(output, cached)
+        now = time.time()
+        self.write_meta(staging, {"outputs": list(outputs), "size": files_size(outputs), "created": now,
+                                  "last_used": now})
+        if os.path.isdir(entry):
+            shutil.rmtree(entry)
+        os.rename(staging, entry)       # the entry only becomes visible once it is complete
+        self.evict()
+
+    """ Evicts the entries not used for longer than the age limit, then the least recently used entries until the
+        cache fits in its size limit
+        Output: number of entries evicted
+    """
+    def evict(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            meta = self.read_meta(entry)
+            if meta is None:
+                if '.tmp' not in name:
+                    shutil.rmtree(entry, ignore_errors=True)   # entry without a valid meta file
+                continue
+            entries.append((meta["last_used"], meta["size"], entry))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for last_used, size, entry in entries:
+            if now - last_used <= self.max_age and total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            evicted += 1
+        return evicted
+
+    def read_meta(self, entry):
+        try:
+            f_meta = open(os.path.join(entry, META_FILE), 'r')
+            meta = json.load(f_meta)
+            f_meta.close()
+            return meta
+        except (IOError, OSError, ValueError):
+            return None
+
+    def write_meta(self, entry, meta):
+        f_meta = open(os.path.join(entry, META_FILE + ".tmp"), 'w')
+        json.dump(meta, f_meta)
+        f_meta.close()
+        os.rename(os.path.join(entry, META_FILE + ".tmp"), os.path.join(entry, META_FILE))
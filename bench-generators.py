@@ -0,0 +1,300 @@
+### LIBRARIES ###
+from __future__ import division
+from __future__ import print_function
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fabric import Fabric
+
+
+### CONSTANTS ###
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = "4x3x4,16x4x16,32x8x32,64x16x48"       # Fabric sizes (leafs x spines x hosts) benchmarked by default
+DEFAULT_THRESHOLD = 0.25                # Relative slowdown (against the baseline) that fails the run
+NOISE_FLOOR = 0.005                     # Absolute slowdown (in seconds) always tolerated, whatever the relative slowdown
+PHASES = ["devices_config", "ports_config", "hosts_config", "topology_config", "docker_config", "host_discovery_script"]
+NETCFG_PHASES = {                       # netcfg block and entities of the fabric model rendered by each netcfg phase
+    "devices_config": ("devices", lambda fabric: fabric.switches),
+    "ports_config": ("ports", lambda fabric: fabric.edge_ports()),
+    "hosts_config": ("hosts", lambda fabric: fabric.host_list),
+}
+PHASE_ENTITIES = {                      # number of entities rendered by each phase (for the cost per entity)
+    "devices_config": lambda fabric: len(fabric.switches),
+    "ports_config": lambda fabric: sum(1 for _ in fabric.edge_ports()),
+    "hosts_config": lambda fabric: len(fabric.host_list),
+    "topology_config": lambda fabric: len(fabric.switches) + len(fabric.links) + len(fabric.host_list),
+    "docker_config": lambda fabric: len(fabric.switches),
+    "host_discovery_script": lambda fabric: len(fabric.host_list),
+}
+
+# Outputs of each generator (relative to the working directory)
+OUTPUTS = {
+    "netcfg.py": ["mininet/netcfg-custom.json", "mininet/topo-custom.py", "docker-compose.yml", "util/mn-host-discovery.sh"],
+    "netcfg-v6.py": ["mininet/netcfg-custom-v6.json", "mininet/topo-custom-v6.py", "util/mn-host-discovery-v6.sh"],
+}
+
+# Stand-in frames for the files that the generators read from mininet/mn_scripts/
+DEVICE_FRAME = '''    "device:leaf0": {
+      "basic": {
+        "managementAddress": "grpc://mininet:50000?device_id=1",
+        "driver": "stratum-bmv2",
+        "pipeconf": "org.onosproject.pipelines.fabric",
+        "locType": "grid",
+        "gridX": 0,
+        "gridY": 0
+      },
+      "segmentrouting": {
+        "name": "leaf0",
+        "ipv4NodeSid": 100,
+        "ipv4Loopback": "192.168.1.0",
+        "routerMac": "00:AA:00:00:00:00",
+        "isEdgeRouter": true,
+        "adjacencySids": []
+      }
+    }'''
+PORT_FRAME = '''    "device:leaf0/0": {
+      "interfaces": [
+        {
+          "name": "leaf0-0",
+          "ips": [
+            "172.16.0.254/24"
+          ],
+          "vlan-tagged": [
+            0
+          ]
+        }
+      ]
+    }'''
+HOST_FRAME = '''    "00:00:00:00:00:0A/0": {
+      "basic": {
+        "name": "h0a",
+        "locType": "grid",
+        "gridX": 0,
+        "gridY": 0
+      }
+    }'''
+FRAMES = {
+    "device_frame.txt": DEVICE_FRAME,
+    "port_frame.txt": PORT_FRAME,
+    "host_frame.txt": HOST_FRAME,
+    "topo_v4_frame_header.txt": "# topology header\n" * 93 + '    """4x3 fabric topology with IPv4 hosts"""\n' * 5,
+    "topo_v4_frame_footer.txt": "# topology footer\n" * 16 + "    description='4x3 fabric'\n" * 4,
+    "topo_v6_frame_header.txt": "# topology header *x%\n" * 5,
+    "topo_v6_frame_footer.txt": "# topology footer *x%\n" * 4 + "    description='*x% fabric'\n",
+    "docker_frame_header.txt": "services:\n  mininet:\n    ports:\n",
+    "docker_frame_footer.txt": "    volumes:\n      - ./mininet:/mininet\n",
+}
+
+
+### FUNCTIONS ###
+
+""" Creates the directory layout expected by the generators, with stand-in frame files
+    Input: working directory
+"""
+def create_workdir(workdir):
+    os.makedirs(os.path.join(workdir, "mininet", "mn_scripts"))
+    os.makedirs(os.path.join(workdir, "util"))
+    for name, frame in FRAMES.items():
+        f_frame = open(os.path.join(workdir, "mininet", "mn_scripts", name), 'w')
+        f_frame.write(frame)
+        f_frame.close()
+
+
+""" Loads a fresh copy of a generator (the generators keep their state in module globals)
+    Input: file name of the generator; fabric model
+"""
+def load_generator(name, fabric):
+    spec = importlib.util.spec_from_file_location("bench_" + name.replace('-', '_').replace('.py', ''),
+                                                  os.path.join(SRC_DIR, name))
+    generator = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(generator)
+    generator.fabric = fabric
+    return generator
+
+
+""" Returns the arguments of a generator phase (netcfg.py takes the fabric model, netcfg-v6.py reads the globals)
+"""
+def phase_args(name, fabric):
+    return (fabric,) if name == "netcfg.py" else ()
+
+
+""" Returns the total size (in bytes) of the outputs of a generator, but the netcfg file (which is still being written)
+"""
+def output_bytes(name):
+    return sum(os.path.getsize(f) for f in OUTPUTS[name][1:] if os.path.exists(f))
+
+
+""" Runs every phase of a generator once and measures it
+    Input: file name of the generator; fabric size; True to trace the peak memory of each phase; True to minify netcfg
+    Output: dictionary {phase: {"wall": seconds, "peak_memory": bytes or None, "bytes": bytes written, "entities":
+            number of entities rendered}}, where the "fabric" phase is the construction of the fabric model shared by
+            the other phases
+"""
+def run_generator(name, leaf, spine, host, trace_memory, minify):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    fabric = Fabric(leaf, spine, host)
+    wall = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    results = {"fabric": {"wall": wall, "peak_memory": peak, "bytes": 0, "entities": len(fabric.switches) +
+                          len(fabric.links) + len(fabric.host_list)}}
+
+    generator = load_generator(name, fabric)
+    args = phase_args(name, fabric)
+
+    generator.begin_of_file()
+    netcfg = generator.NetcfgWriter(OUTPUTS[name][0], minify)
+
+    for phase in PHASES:
+        written = output_bytes(name) + netcfg.bytes
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+
+        if phase in NETCFG_PHASES:
+            block, entities = NETCFG_PHASES[phase]
+            netcfg.block(block, getattr(generator, phase)(entities(fabric)))
+            if phase == "hosts_config":
+                netcfg.close()
+        elif phase == "docker_config" and not hasattr(generator, "docker_config"):
+            continue        # netcfg-v6.py does not generate docker-compose.yml
+        else:
+            getattr(generator, phase)(*args)
+
+        wall = time.perf_counter() - start
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        written = output_bytes(name) + netcfg.bytes - written
+        results[phase] = {"wall": wall, "peak_memory": peak, "bytes": written,
+                          "entities": PHASE_ENTITIES[phase](fabric)}
+
+    generator.end_of_file(*args)
+    return results
+
+
+""" Benchmarks a generator for a fabric size in a temporary directory
+    Timing runs are made without memory tracing (which slows allocations down); the best of them is kept and the
+    peak memory of each phase comes from an extra traced run.
+"""
+def bench(name, leaf, spine, host, repeat, minify):
+    cwd = os.getcwd()
+    phases = None
+    for run in range(repeat + 1):
+        workdir = tempfile.mkdtemp(prefix="bench-generators-")
+        try:
+            create_workdir(workdir)
+            os.chdir(workdir)
+            trace_memory = run == repeat
+            results = run_generator(name, leaf, spine, host, trace_memory, minify)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir)
+
+        if phases is None:
+            phases = results
+        for phase, result in results.items():
+            if trace_memory:
+                phases[phase]["peak_memory"] = result["peak_memory"]
+            else:
+                phases[phase]["wall"] = min(phases[phase]["wall"], result["wall"])
+                phases[phase]["bytes"] = result["bytes"]
+
+    total = {"wall": sum(p["wall"] for p in phases.values()),
+             "peak_memory": max(p["peak_memory"] for p in phases.values()),
+             "bytes": sum(p["bytes"] for p in phases.values()),
+             "entities": sum(p["entities"] for p in phases.values())}
+    return {"generator": name, "leafs": leaf, "spines": spine, "hosts": host, "phases": phases, "total": total}
+
+
+""" Compares the results against a baseline and returns the list of slowdowns past the threshold
+"""
+def compare(results, baseline, threshold):
+    regressions = []
+    previous = {}
+    for entry in baseline["results"]:
+        previous[(entry["generator"], entry["leafs"], entry["spines"], entry["hosts"])] = entry
+
+    for entry in results:
+        old = previous.get((entry["generator"], entry["leafs"], entry["spines"], entry["hosts"]))
+        if old is None:
+            continue
+        for phase, result in entry["phases"].items():
+            if phase not in old["phases"]:
+                continue
+            old_wall = old["phases"][phase]["wall"]
+            if result["wall"] - old_wall > NOISE_FLOOR and result["wall"] > old_wall * (1 + threshold):
+                regressions.append("%s %dx%dx%d %s: %.4fs -> %.4fs (+%.0f%%)" % (
+                    entry["generator"], entry["leafs"], entry["spines"], entry["hosts"], phase, old_wall,
+                    result["wall"], (result["wall"] / old_wall - 1) * 100 if old_wall else float('inf')))
+    return regressions
+
+
+""" Prints one line per phase with the measured values
+"""
+def print_results(entry):
+    print("%s %dx%dx%d" % (entry["generator"], entry["leafs"], entry["spines"], entry["hosts"]))
+    for phase in ["fabric"] + PHASES + ["total"]:
+        result = entry["total"] if phase == "total" else entry["phases"].get(phase)
+        if result is None:
+            continue
+        per_entity = result["wall"] / result["entities"] * 1e6 if result.get("entities") else 0.0
+        print("  %-22s %10.4fs %12s B peak %12d B written %8.2fus/entity" % (
+            phase, result["wall"], result["peak_memory"], result["bytes"], per_entity))
+
+
+""" Parses the fabric sizes given as "LxSxH,LxSxH,..."
+"""
+def parse_sizes(sizes):
+    return [tuple(int(n) for n in size.split('x')) for size in sizes.split(',') if size]
+
+
+""" Main funcion
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark of the netcfg/topology generators across fabric sizes')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='fabric sizes as leafsxspinesxhosts, comma separated')
+    parser.add_argument('--generators', default=','.join(sorted(OUTPUTS)), help='generators to benchmark')
+    parser.add_argument('--repeat', type=int, default=3, help='timing runs per size (the best one is kept)')
+    parser.add_argument('--minify', action='store_true', help='benchmark the minified netcfg output')
+    parser.add_argument('--output', help='file where the results are saved (JSON)')
+    parser.add_argument('--baseline', help='results of a previous run to compare against (JSON)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative slowdown against the baseline that fails the run (default 0.25)')
+    args = parser.parse_args()
+
+    results = []
+    for leaf, spine, host in parse_sizes(args.sizes):
+        for name in args.generators.split(','):
+            entry = bench(name, leaf, spine, host, max(args.repeat, 1), args.minify)
+            print_results(entry)
+            results.append(entry)
+
+    if args.output:
+        f_output = open(args.output, 'w')
+        json.dump({"python": platform.python_version(), "minify": args.minify, "results": results}, f_output, indent=2)
+        f_output.close()
+
+    if args.baseline:
+        f_baseline = open(args.baseline, 'r')
+        baseline = json.load(f_baseline)
+        f_baseline.close()
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print("SLOWDOWN " + regression)
+        if regressions:
+            sys.exit(1)
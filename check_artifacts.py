@@ -0,0 +1,491 @@
+#  Consistency checker of the generated artifacts
+#
+#  The generated files must agree with each other: the netcfg (devices, ports, hosts), the topology (the topo script, or
+#  the topo spec it reads), the gRPC ports published by docker-compose.yml, the host discovery script and the gRPC ports
+#  of the switches of the partitions file (partitions=N). Every file is read once and its entries are indexed in
+#  dictionaries, so that duplicates (MACs, IPs, SIDs, gRPC ports, names), dangling references (ports of unknown devices,
+#  hosts on unknown ports) and mismatches between the topology and the netcfg are found in time linear in the size of
+#  the fabric.
+
+### LIBRARIES ###
+from __future__ import print_function
+import argparse
+import json
+import os
+import re
+import socket
+import sys
+import time
+
+from topo_partitions import PARTITIONS_VERSION
+
+
+### CONSTANTS ###
+MAC_PATTERN = re.compile(r'^[0-9A-Fa-f]{2}(:[0-9A-Fa-f]{2}){5}$')
+GRPC_PATTERN = re.compile(r'^grpc://[^:/]+:(\d+)')
+STATEMENT_PATTERN = re.compile(r"^\s*(?:(\w+) = )?self\.(addSwitch|addHost|addLink)\((.*)\)\s*(?:#.*)?$", re.S)
+SPEC_PATTERN = re.compile(r"build_from_spec\(self, '([^']+)'")
+PARAM_PATTERN = re.compile(r"""(\w+)=(?:'([^']*)'|"([^"]*)"|(\d+))""")
+COMPOSE_PORT_PATTERN = re.compile(r'^\s*- "(\d+)(?:-(\d+))?:(\d+)(?:-(\d+))?"')
+DISCOVERY_PATTERN = re.compile(r'^util/mn-cmd (\S+) ping -c 1 (\S+)')
+HOST_NETWORK_PATTERN = re.compile(r'^\s*network_mode: "?host"?\s*$')
+RESERVED_MARKER = "# reserved"          # comment before the gRPC ports reserved for the switches added to the fabric
+DEFAULT_FILES = {                       # generated files checked by default (v4 and v6 fabrics)
+    "v4": {"netcfg": "mininet/netcfg-custom.json", "topo": "mininet/topo-custom.py", "compose": "docker-compose.yml",
+           "discovery": "util/mn-host-discovery.sh"},
+    "v6": {"netcfg": "mininet/netcfg-custom-v6.json", "topo": "mininet/topo-custom-v6.py", "compose": None,
+           "discovery": "util/mn-host-discovery-v6.sh"},
+}
+DEFAULT_MAX_ERRORS = 50                 # Number of errors printed (the others are only counted)
+
+
+### FUNCTIONS ###
+
+""" Returns True if a string is an IPv4 or IPv6 address
+"""
+def valid_ip(address):
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, address)
+            return True
+        except (socket.error, ValueError):
+            pass
+    return False
+
+
+""" Yields the statements of a Python script, the lines of a statement spanning several lines joined together
+"""
+def statements(lines):
+    pending = ""
+    for line in lines:
+        pending += line
+        if pending.count('(') <= pending.count(')'):
+            yield pending
+            pending = ""
+    if pending:
+        yield pending
+
+
+""" Returns the parameters of an addHost statement (keyword arguments with a literal value)
+"""
+def host_params(arguments):
+    params = {}
+    for name, single, double, number in PARAM_PATTERN.findall(arguments):
+        params[name] = int(number) if number else single or double
+    return params
+
+
+""" Numbers the ports of the links in the order Mininet does: from 1 on switches, from 0 on hosts
+    Input: [(node1, node2), ...]; names of the switches
+    Output: [(node1, port1, node2, port2), ...]
+"""
+def number_ports(links, switches):
+    used = {}
+    numbered = []
+    for node1, node2 in links:
+        ports = []
+        for node in (node1, node2):
+            used[node] = used.get(node, 0) + 1
+            ports.append(used[node] if node in switches else used[node] - 1)
+        numbered.append((node1, ports[0], node2, ports[1]))
+    return numbered
+
+
+""" Reads the topology built by a generated topo script, from the script itself or from the topo spec it reads
+    Output: {"switches": [name, ...], "hosts": {name: parameters}, "links": [(node1, port1, node2, port2), ...]}
+"""
+def read_topology(file_name):
+    f_topo = open(file_name, 'r')
+    lines = f_topo.readlines()
+    f_topo.close()
+    for line in lines:
+        spec = SPEC_PATTERN.search(line)
+        if spec:
+            return read_spec(os.path.join(os.path.dirname(file_name), spec.group(1)))
+
+    switches, hosts, links = [], {}, []
+    variables = {}
+    for statement in statements(lines):
+        match = STATEMENT_PATTERN.match(statement) if "self.add" in statement else None
+        if match is None:
+            continue
+        variable, call, arguments = match.groups()
+        if call == "addLink":
+            node1, node2 = [variables.get(name.strip(), name.strip()) for name in arguments.split(',')[:2]]
+            links.append((node1, node2))
+            continue
+        name = arguments.split(',')[0].strip().strip("'\"")
+        if variable:
+            variables[variable] = name
+        if call == "addSwitch":
+            switches.append(name)
+        else:
+            hosts[name] = host_params(arguments)
+    return {"switches": switches, "hosts": hosts, "links": number_ports(links, set(switches))}
+
+
+""" Reads the topology of a topo spec (see read_topology)
+"""
+def read_spec(file_name):
+    f_spec = open(file_name, 'r')
+    spec = json.load(f_spec)
+    f_spec.close()
+    fields = spec["hosts"]["fields"]
+    hosts = dict((row[0], dict(zip(fields, row[1:]))) for row in spec["hosts"]["rows"])
+    return {"switches": spec["switches"], "hosts": hosts,
+            "links": number_ports([tuple(link) for link in spec["links"]], set(spec["switches"]))}
+
+
+""" Reads the ports published by a docker-compose file ("50001:50001" or ranges "50001-50010:50001-50010"); the ports
+    reserved for the switches added to the running fabric (after the reserved comment) are not read
+    Output: [(published port, container port), ...] (None when the container uses the network of the host)
+"""
+def read_compose_ports(file_name):
+    ports = []
+    reserved = False
+    f_compose = open(file_name, 'r')
+    for line in f_compose:
+        if HOST_NETWORK_PATTERN.match(line):
+            f_compose.close()
+            return None
+        if line.strip().startswith('#'):
+            reserved = line.strip().startswith(RESERVED_MARKER)
+        match = COMPOSE_PORT_PATTERN.match(line) if not reserved else None
+        if match is None:
+            continue
+        first, last, container_first, container_last = match.groups()
+        first, container_first = int(first), int(container_first)
+        last = int(last) if last else first
+        container_last = int(container_last) if container_last else container_first
+        if last - first != container_last - container_first:
+            ports.append((first, None))         # ranges of different lengths: reported as unmatched
+            continue
+        ports.extend((first + i, container_first + i) for i in range(last - first + 1))
+    f_compose.close()
+    return ports
+
+
+""" Reads the pings of a host discovery script
+    Output: [(host, gateway), ...]
+"""
+def read_discovery(file_name):
+    pings = []
+    f_discovery = open(file_name, 'r')
+    for line in f_discovery:
+        match = DISCOVERY_PATTERN.match(line)
+        if match is not None:
+            pings.append(match.groups())
+    f_discovery.close()
+    return pings
+
+
+""" Reads the switches of a partitions file
+    Output: [(switch name, gRPC port, index of its partition), ...] (None when the layout of the file is not supported)
+"""
+def read_partition_switches(file_name):
+    f_partitions = open(file_name, 'r')
+    partitions = json.load(f_partitions)
+    f_partitions.close()
+    if partitions.get("version") != PARTITIONS_VERSION:
+        return None
+    return [(name, grpc_port, index) for index, part in enumerate(partitions["partitions"])
+            for name, grpc_port in part["switches"]]
+
+
+""" Checks the generated artifacts of a fabric against each other
+    Input: netcfg file; topo script (optional); docker-compose file (optional); host discovery script (optional);
+           partitions file (optional)
+    Output: [(category, message), ...] (empty when the artifacts are consistent)
+"""
+def check_artifacts(netcfg_file, topo_file=None, compose_file=None, discovery_file=None, partitions_file=None):
+    checker = ArtifactChecker()
+    try:
+        f_netcfg = open(netcfg_file, 'r')
+        netcfg = json.load(f_netcfg)
+        f_netcfg.close()
+    except ValueError as error:
+        checker.error("json", "%s: %s" % (netcfg_file, error))
+        return checker.errors
+    checker.check_netcfg(netcfg)
+    if topo_file:
+        checker.check_topology(read_topology(topo_file))
+    if compose_file:
+        checker.check_compose(read_compose_ports(compose_file))
+    if discovery_file:
+        checker.check_discovery(read_discovery(discovery_file))
+    if partitions_file:
+        checker.check_partitions(read_partition_switches(partitions_file))
+    return checker.errors
+
+
+""" Prints the errors of a check: the number of errors of each category, then the first errors
+"""
+def print_errors(errors, max_errors=DEFAULT_MAX_ERRORS):
+    counts = {}
+    for category, _ in errors:
+        counts[category] = counts.get(category, 0) + 1
+    print("%d errors (%s)" % (len(errors), ", ".join("%s %d" % item for item in sorted(counts.items()))))
+    for category, message in errors[:max_errors]:
+        print("  [%s] %s" % (category, message))
+    if len(errors) > max_errors:
+        print("  ... %d more" % (len(errors) - max_errors))
+
+
+### CLASSES ###
+
+""" Checks of the generated artifacts: each check indexes the entries of an artifact and looks up the entries of the
+    artifacts checked before it
+    errors: [(category, message), ...]
+"""
+class ArtifactChecker(object):
+
+    def __init__(self):
+        self.errors = []
+        self.indexes = {}               # kind of value -> {value: owner}, to find the duplicates
+        self.devices = {}               # switch name -> device entry of the netcfg
+        self.ports = {}                 # (switch name, port) -> port entry of the netcfg
+        self.netcfg_hosts = {}          # host key of the netcfg (MAC/VLAN) -> host entry
+        self.grpc_ports = {}            # gRPC port -> switch name
+        self.gateways = {}              # host name -> gateway, from the topology
+
+    def error(self, category, message):
+        self.errors.append((category, message))
+
+    """ Indexes a value, reporting it if another owner already has it
+    """
+    def unique(self, kind, value, owner):
+        index = self.indexes.setdefault(kind, {})
+        other = index.setdefault(value, owner)
+        if other != owner:
+            self.error("duplicate", "%s %s of %s is also used by %s" % (kind, value, owner, other))
+
+    """ Checks the blocks of the netcfg: device identifiers, ports of known devices and valid host keys
+    """
+    def check_netcfg(self, netcfg):
+        for block in ("devices", "ports", "hosts"):
+            if not isinstance(netcfg.get(block), dict):
+                self.error("netcfg", "missing block %s" % block)
+                netcfg[block] = {}
+
+        for key, device in netcfg["devices"].items():
+            name = key[len("device:"):] if key.startswith("device:") else key
+            self.devices[name] = device
+            basic = device.get("basic", {})
+            routing = device.get("segmentrouting") or device.get("fabricDeviceConfig") or {}
+            if routing.get("name", name) != name:
+                self.error("netcfg", "device %s is named %s" % (key, routing["name"]))
+            grpc = GRPC_PATTERN.match(basic.get("managementAddress", ""))
+            if grpc is None:
+                self.error("netcfg", "device %s has no gRPC address" % key)
+            else:
+                self.grpc_ports[int(grpc.group(1))] = name
+                self.unique("gRPC port", grpc.group(1), name)
+            mac = routing.get("routerMac") or routing.get("myStationMac")
+            if mac is None or not MAC_PATTERN.match(mac):
+                self.error("address", "device %s has an invalid MAC %s" % (key, mac))
+            else:
+                self.unique("MAC", mac.upper(), name)
+            sid = routing.get("ipv4NodeSid", routing.get("mySid"))
+            if sid is None:
+                self.error("netcfg", "device %s has no SID" % key)
+            else:
+                self.unique("SID", str(sid), name)
+            if "mySid" in routing and not valid_ip(str(routing["mySid"])):
+                self.error("address", "device %s has an invalid SID %s" % (key, routing["mySid"]))
+            loopback = routing.get("ipv4Loopback")
+            if loopback is not None:
+                if not valid_ip(loopback):
+                    self.error("address", "device %s has an invalid loopback %s" % (key, loopback))
+                self.unique("IP", loopback, name)
+
+        for key, port in netcfg["ports"].items():
+            device, _, number = key.rpartition('/')
+            name = device[len("device:"):]
+            if name not in self.devices:
+                self.error("dangling", "port %s of an unknown device" % key)
+            if not number.isdigit():
+                self.error("netcfg", "port %s has no port number" % key)
+                continue
+            self.ports[(name, int(number))] = port
+            for interface in port.get("interfaces", []):
+                if interface.get("name") != name + "-" + number:
+                    self.error("netcfg", "port %s has the interface %s" % (key, interface.get("name")))
+                for address in interface.get("ips", []):
+                    gateway = address.split('/')[0]
+                    if not valid_ip(gateway):
+                        self.error("address", "port %s has an invalid address %s" % (key, address))
+                    self.unique("IP", gateway, name)        # the ports of a subnet are on a single leaf
+
+        for key, host in netcfg["hosts"].items():
+            mac, _, vlan = key.partition('/')
+            self.netcfg_hosts[key] = host
+            name = host.get("basic", {}).get("name", key)
+            if not MAC_PATTERN.match(mac):
+                self.error("address", "host %s has an invalid MAC %s" % (name, mac))
+            self.unique("MAC", mac.upper(), name)
+            self.unique("host name", name, key)
+
+    """ Checks the topology against the netcfg: same switches, every host on a port of the netcfg with its subnet and
+        VLAN (and on the location, with the addresses, declared in the netcfg), every netcfg host and port matching a
+        host of the topology
+    """
+    def check_topology(self, topology):
+        switches = set(topology["switches"])
+        for name in topology["switches"]:
+            self.unique("switch", name, "the topology")
+            if name not in self.devices:
+                self.error("mismatch", "switch %s of the topology has no device in the netcfg" % name)
+        for name in self.devices:
+            if name not in switches:
+                self.error("mismatch", "device %s of the netcfg is not in the topology" % name)
+
+        attached = {}                   # host name -> (switch, port)
+        for node1, port1, node2, port2 in topology["links"]:
+            for node in (node1, node2):
+                if node not in switches and node not in topology["hosts"]:
+                    self.error("dangling", "link %s-%s of the unknown node %s" % (node1, node2, node))
+            if node1 in topology["hosts"] and node2 in switches:
+                attached[node1] = (node2, port2)
+            elif node2 in topology["hosts"] and node1 in switches:
+                attached[node2] = (node1, port1)
+
+        host_ports = set()
+        host_keys = set()
+        for name, params in topology["hosts"].items():
+            mac = params.get("mac")
+            address = params.get("ip") or params.get("ipv6")
+            gateway = params.get("gw") or params.get("ipv6_gw")
+            vlan = params.get("vlan")
+            self.gateways[name] = gateway
+            if mac is None or not MAC_PATTERN.match(mac):
+                self.error("address", "host %s has an invalid MAC %s" % (name, mac))
+            if address is None or not valid_ip(address.split('/')[0]):
+                self.error("address", "host %s has an invalid address %s" % (name, address))
+            else:
+                self.unique("IP", address.split('/')[0], name)
+
+            key = "%s/%s" % (mac, vlan)
+            host_keys.add(key)
+            if key not in self.netcfg_hosts:
+                self.error("mismatch", "host %s (%s) is not in the netcfg" % (name, key))
+            elif self.netcfg_hosts[key].get("basic", {}).get("name", name) != name:
+                self.error("mismatch", "host %s is named %s in the netcfg" % (name,
+                                                                            self.netcfg_hosts[key]["basic"]["name"]))
+
+            if name not in attached:
+                self.error("dangling", "host %s is not linked to a switch" % name)
+                continue
+            host_ports.add(attached[name])
+            declared = self.netcfg_hosts.get(key, {}).get("basic", {})
+            if "locations" in declared and declared["locations"] != ["device:%s/%d" % attached[name]]:
+                self.error("mismatch", "host %s is on %s/%d, located on %s in the netcfg" % (
+                    (name,) + attached[name] + (", ".join(declared["locations"]),)))
+            addresses = [params[field].split('/')[0] for field in ("ip", "ipv6") if params.get(field)]
+            if "ips" in declared and sorted(declared["ips"]) != sorted(addresses):
+                self.error("mismatch", "host %s has the addresses %s, declared as %s in the netcfg" % (
+                    name, ", ".join(addresses), ", ".join(declared["ips"])))
+            port = self.ports.get(attached[name])
+            if port is None:
+                self.error("mismatch", "host %s is on %s/%d, which has no port in the netcfg"
+                           % ((name,) + attached[name]))
+                continue
+            interfaces = port.get("interfaces", [{}])
+            subnet = gateway + "/" + address.split('/')[1] if gateway and address and '/' in address else None
+            if subnet not in interfaces[0].get("ips", []):
+                self.error("mismatch", "host %s (gateway %s) is on %s/%d, which routes %s" % (
+                    (name, subnet) + attached[name] + (", ".join(interfaces[0].get("ips", [])),)))
+            if vlan is not None and [vlan] != interfaces[0].get("vlan-tagged"):
+                self.error("mismatch", "host %s (VLAN %s) is on %s/%d, tagged with %s" % (
+                    (name, vlan) + attached[name] + (interfaces[0].get("vlan-tagged"),)))
+
+        for switch, number in self.ports:
+            if (switch, number) not in host_ports:
+                self.error("mismatch", "port %s/%d of the netcfg has no host in the topology" % (switch, number))
+        for key in self.netcfg_hosts:
+            if key not in host_keys:
+                self.error("mismatch", "host %s of the netcfg is not in the topology" % key)
+
+    """ Checks the ports published by docker-compose: the gRPC port of every device, once, on the same port (nothing to
+        check when the container uses the network of the host)
+    """
+    def check_compose(self, ports):
+        if ports is None:
+            return
+        published = set()
+        for port, container_port in ports:
+            if port != container_port:
+                self.error("compose", "port %d is published as %s" % (port, container_port))
+            if port in published:
+                self.error("duplicate", "port %d is published twice" % port)
+            published.add(port)
+            if port not in self.grpc_ports:
+                self.error("compose", "port %d is not the gRPC port of a device" % port)
+        for port, name in sorted(self.grpc_ports.items()):
+            if port not in published:
+                self.error("compose", "gRPC port %d of %s is not published" % (port, name))
+
+    """ Checks the pings of the host discovery script: every host of the topology once, towards its gateway
+    """
+    def check_discovery(self, pings):
+        pinged = set()
+        for host, gateway in pings:
+            if host in pinged:
+                self.error("discovery", "host %s is pinged twice" % host)
+            pinged.add(host)
+            if self.gateways and host not in self.gateways:
+                self.error("discovery", "unknown host %s is pinged" % host)
+            elif self.gateways and self.gateways[host] != gateway:
+                self.error("discovery", "host %s pings %s instead of its gateway %s" % (host, gateway,
+                                                                                      self.gateways[host]))
+        for host in self.gateways:
+            if host not in pinged:
+                self.error("discovery", "host %s is not pinged" % host)
+
+    """ Checks the switches of the partitions: every device in a single partition, with the gRPC port of its netcfg
+        device (each partition process starts its switches on the ports of the file)
+    """
+    def check_partitions(self, switches):
+        if switches is None:
+            self.error("partitions", "unsupported partitions version (expected %d)" % PARTITIONS_VERSION)
+            return
+        device_ports = dict((name, port) for port, name in self.grpc_ports.items())
+        partitioned = {}
+        for name, grpc_port, index in switches:
+            if name in partitioned:
+                self.error("partitions", "switch %s is in partitions %d and %d" % (name, partitioned[name], index))
+            partitioned[name] = index
+            if name not in self.devices:
+                self.error("partitions", "switch %s of partition %d has no device in the netcfg" % (name, index))
+            elif device_ports.get(name) != grpc_port:
+                self.error("partitions", "switch %s of partition %d has the gRPC port %s instead of %s"
+                           % (name, index, grpc_port, device_ports.get(name)))
+        for name in self.devices:
+            if name not in partitioned:
+                self.error("partitions", "device %s of the netcfg is in no partition" % name)
+
+
+""" Main funcion
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Consistency checker of the generated artifacts')
+    parser.add_argument('--v6', action='store_true', help='check the files of the IPv6 fabric (netcfg-v6.py)')
+    parser.add_argument('--netcfg', help='netcfg file')
+    parser.add_argument('--topo', help='topo script (or "" to skip the topology)')
+    parser.add_argument('--compose', help='docker-compose file (or "" to skip the published ports)')
+    parser.add_argument('--discovery', help='host discovery script (or "" to skip the pings)')
+    parser.add_argument('--partitions', default="", help='partitions file (generated with partitions=N)')
+    parser.add_argument('--max-errors', type=int, default=DEFAULT_MAX_ERRORS, help='number of errors printed')
+    args = parser.parse_args()
+
+    files = DEFAULT_FILES["v6" if args.v6 else "v4"]
+    start = time.time()
+    errors = check_artifacts(args.netcfg or files["netcfg"],
+                             files["topo"] if args.topo is None else args.topo,
+                             files["compose"] if args.compose is None else args.compose,
+                             files["discovery"] if args.discovery is None else args.discovery,
+                             args.partitions)
+    if errors:
+        print_errors(errors, args.max_errors)
+    else:
+        print("artifacts consistent (checked in %.3fs)" % (time.time() - start))
+    sys.exit(1 if errors else 0)
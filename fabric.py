@@ -0,0 +1,464 @@
+### LIBRARIES ###
+from __future__ import division
+from addressing import LegacyAllocator, host_letters
+
+
+### CONSTANTS ###
+LEAF_SPACING = 200                      # Grid spacing between leaf switches
+GRID_X_LEAF = 200                       # XX cordinates of first leaf switch
+GRID_Y_SPINE = 200                      # YY cordinates of the spine switches (of the super spines in a 3-tier fabric)
+TIER_SPACING = 200                      # Grid spacing between the tiers of a 3-tier fabric
+HOST_COLUMN_SPACING = 50                # Grid spacing between the columns of hosts under a leaf
+HOST_ROW_SPACING = 100                  # Grid spacing between the rows of hosts under a leaf
+HOST_COLUMNS = 3                        # Number of columns of hosts under a leaf
+SWITCH_NAMES = {"leaf": "leaf", "spine": "spine", "superspine": "sspine"}   # Name prefix of the switches of each tier (Mininet interface names, switch-ethN, are limited to 15 characters)
+LAYOUTS = ("legacy", "rows")            # Host layouts: "legacy" puts every host past the 6th on the 2nd row, "rows" adds rows
+
+
+### CLASSES ###
+
+""" Leaf, spine or super spine switch
+    number: number of the switch within its tier (leaf1, spine1, ...); index: number of the switch in the whole fabric
+    vlan, ipv4_gateway, ipv4_prefix, ipv6_gateway, ipv6_prefix: subnet of the hosts of a leaf (None on spines)
+    Input: ...; allocator of the identifiers (see addressing.py)
+"""
+class Switch(object):
+    __slots__ = ("name", "kind", "number", "index", "grpc_port", "grid_x", "grid_y", "mac", "sid", "ipv6_sid",
+                 "ipv4_loopback", "vlan", "ipv4_gateway", "ipv4_prefix", "ipv6_gateway", "ipv6_prefix", "ports", "hosts")
+
+    def __init__(self, kind, number, index, grid_x, grid_y, allocator):
+        self.name = SWITCH_NAMES[kind] + str(number)
+        self.kind = kind
+        self.number = number
+        self.index = index
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.grpc_port, self.mac, self.sid, self.ipv4_loopback = allocator.switch_ids(kind, number, index)
+        self.ipv6_sid = allocator.ipv6_sid(self.sid, index)
+        if kind == "leaf":
+            (self.vlan, self.ipv4_gateway, self.ipv4_prefix,
+             self.ipv6_gateway, self.ipv6_prefix) = allocator.leaf_ids(number)
+        else:
+            self.vlan = self.ipv4_gateway = self.ipv4_prefix = self.ipv6_gateway = self.ipv6_prefix = None
+        self.ports = []                 # ports of the switch, in the order Mininet numbers them
+        self.hosts = []                 # hosts attached to the switch (leaf switches only)
+
+
+""" Host attached to a leaf switch
+    number: number of the host within its leaf (1 for "a", 2 for "b", ..., 27 for "aa", ...)
+    Input: ...; letters of the host; MAC, IPv4 and IPv6 addresses (computed in bulk for the whole leaf)
+"""
+class Host(object):
+    __slots__ = ("name", "leaf", "number", "letter", "mac", "port", "grid_x", "grid_y", "vlan",
+                 "ipv4", "ipv4_gateway", "ipv4_prefix", "ipv6", "ipv6_gateway", "ipv6_prefix")
+
+    def __init__(self, leaf, number, port, grid_x, grid_y, letters, mac, ipv4, ipv6):
+        self.name = "h" + str(leaf.number) + letters
+        self.leaf = leaf
+        self.number = number
+        self.letter = letters.upper()
+        self.mac = mac
+        self.ipv4 = ipv4
+        self.ipv6 = ipv6
+        self.port = port
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.vlan = leaf.vlan
+        self.ipv4_gateway = leaf.ipv4_gateway
+        self.ipv4_prefix = leaf.ipv4_prefix
+        self.ipv6_gateway = leaf.ipv6_gateway
+        self.ipv6_prefix = leaf.ipv6_prefix
+
+
+""" Port of a switch, named after the Mininet interface ("leaf1-4" for port 4 of leaf1)
+    peer: switch or host at the other end of the link
+"""
+class Port(object):
+    __slots__ = ("switch", "number", "name", "peer")
+
+    def __init__(self, switch, number, peer):
+        self.switch = switch
+        self.number = number
+        self.name = switch.name + "-" + str(number)
+        self.peer = peer
+
+
+""" Link between two nodes, in the order it is added to the Mininet topology
+    port1/port2: port numbers of node1/node2 (hosts only have port 0)
+"""
+class Link(object):
+    __slots__ = ("node1", "port1", "node2", "port2")
+
+    def __init__(self, node1, port1, node2, port2):
+        self.node1 = node1
+        self.port1 = port1
+        self.node2 = node2
+        self.port2 = port2
+
+
+""" Leaf-spine fabric: every spine is linked to every leaf and every leaf has the same number of hosts
+    With several pods (or with super spines) the fabric is a 3-tier Clos: each pod is a leaf-spine fabric and the spine
+    k of every pod is linked to every super spine of the plane k (the super spines are split in one plane per spine of
+    a pod). Leaf and spine switches are numbered pod after pod.
+    Every entity is computed once here and then read by every emitter (netcfg, topology, docker, host discovery).
+    The values shared by the hosts of every leaf (letters, grid offsets) are computed once, and the identifiers of the
+    hosts of a leaf are computed in bulk by the allocator.
+    Input: number of leaf switches per pod; number of spine switches per pod; number of hosts per leaf switch;
+           allocator of the identifiers (the legacy identifiers by default); layout of the hosts under their leaf (see
+           LAYOUTS); number of pods; number of super spine switches
+"""
+class Fabric(object):
+    __slots__ = ("leafs", "spines", "hosts", "pods", "pod_leafs", "pod_spines", "super_spines", "allocator", "layout",
+                 "leaf_switches", "spine_switches", "super_spine_switches", "switches", "host_list", "links",
+                 "switch_link_count", "index", "owners", "spine_spacing", "grid_y_leaf", "mutations")
+
+    def __init__(self, leaf, spine, host, allocator=None, layout="legacy", pods=1, super_spines=0):
+        if layout not in LAYOUTS:
+            raise ValueError("unknown host layout '%s' (%s)" % (layout, ", ".join(LAYOUTS)))
+        if pods < 1:
+            raise ValueError("a fabric needs at least one pod")
+        if pods > 1 and super_spines < 1:
+            raise ValueError("a fabric with %d pods needs super spines" % pods)
+        if super_spines % spine:
+            raise ValueError("the number of super spines (%d) is not a multiple of the number of spines per pod (%d)"
+                             % (super_spines, spine))
+        self.pods = pods
+        self.pod_leafs = leaf
+        self.pod_spines = spine
+        self.super_spines = super_spines
+        self.leafs = leaf * pods
+        self.spines = spine * pods
+        self.hosts = host
+        self.allocator = (allocator if allocator is not None
+                          else LegacyAllocator(self.leafs, self.spines, host, super_spines))
+        self.layout = layout
+        self.leaf_switches = []
+        self.spine_switches = []
+        self.super_spine_switches = []
+        self.host_list = []
+        self.links = []
+        self.index = {}                 # name of a switch, host or port -> entity
+        self.owners = None              # (kind of identifier, identifier) -> entity, built on the first owner() call
+        self.mutations = 0              # number of changes applied after the fabric was built (see add_leaf, ...)
+
+        if pods == 1 and not super_spines:
+            self.grid_definition()
+            grid_x_spine = GRID_X_LEAF + self.spine_spacing // 2
+            for i in range(1, leaf + 1):
+                self.leaf_switches.append(Switch("leaf", i, i, GRID_X_LEAF + (i-1) * LEAF_SPACING, self.grid_y_leaf,
+                                                 self.allocator))
+            for i in range(1, spine + 1):
+                self.spine_switches.append(Switch("spine", i, leaf + i, grid_x_spine + (i-1) * self.spine_spacing,
+                                                  GRID_Y_SPINE, self.allocator))
+        else:
+            self.add_tiers()
+        self.switches = self.leaf_switches + self.spine_switches + self.super_spine_switches
+
+        # Switch links: Mininet numbers the ports in the order the links are added (spine i of a pod is port i of every
+        # leaf of the pod, the super spines of a spine come after its leaves)
+        for pod in range(pods):
+            pod_leaf_switches = self.leaf_switches[pod * leaf:(pod + 1) * leaf]
+            for spine_switch in self.spine_switches[pod * spine:(pod + 1) * spine]:
+                for leaf_switch in pod_leaf_switches:
+                    self.add_link(spine_switch, len(spine_switch.ports) + 1, leaf_switch, len(leaf_switch.ports) + 1)
+        plane = super_spines // spine
+        for i, spine_switch in enumerate(self.spine_switches):
+            k = i % spine
+            for super_spine_switch in self.super_spine_switches[k * plane:(k + 1) * plane]:
+                self.add_link(super_spine_switch, len(super_spine_switch.ports) + 1,
+                              spine_switch, len(spine_switch.ports) + 1)
+        self.switch_link_count = len(self.links)
+
+        # Hosts: host j of a leaf is attached to port spine+j (spine: number of spines per pod)
+        letters = [host_letters(j) for j in range(1, host + 1)]
+        offsets = self.host_offsets()
+        for leaf_switch in self.leaf_switches:
+            macs, ipv4s, ipv6s = self.allocator.host_columns(leaf_switch.number, letters)
+            grid_x, grid_y = leaf_switch.grid_x, self.grid_y_leaf
+            leaf_hosts = [Host(leaf_switch, j, spine + j, grid_x + offsets[j-1][0], grid_y + offsets[j-1][1],
+                               letters[j-1], macs[j-1], ipv4s[j-1], ipv6s[j-1]) for j in range(1, host + 1)]
+            leaf_switch.hosts = leaf_hosts
+            self.host_list.extend(leaf_hosts)
+            self.add_host_links(leaf_switch, leaf_hosts)
+
+        for switch in self.switches:
+            self.index[switch.name] = switch
+
+    """ Defines the grid spacing between spine switches and the YY coordinates of the leaf switches
+    """
+    def grid_definition(self):
+        leaf_len = (self.leafs - 1) * LEAF_SPACING
+        self.spine_spacing = leaf_len // self.spines
+        self.grid_y_leaf = GRID_Y_SPINE + self.spine_spacing
+
+    """ Creates the switches of a 3-tier fabric: the super spines on top of the whole fabric, the spines of each pod
+        centered above the leaves of the pod and an empty column between two pods
+    """
+    def add_tiers(self):
+        leaf, spine = self.pod_leafs, self.pod_spines
+        self.spine_spacing = max(leaf - 1, 1) * LEAF_SPACING // spine
+        self.grid_y_leaf = GRID_Y_SPINE + 2 * TIER_SPACING
+        for pod in range(self.pods):
+            grid_x_pod = GRID_X_LEAF + pod * (leaf + 1) * LEAF_SPACING
+            for i in range(pod * leaf + 1, (pod + 1) * leaf + 1):
+                self.leaf_switches.append(Switch("leaf", i, i, grid_x_pod + (i - pod * leaf - 1) * LEAF_SPACING,
+                                                 self.grid_y_leaf, self.allocator))
+            grid_x_spine = grid_x_pod + self.spine_spacing // 2
+            for k in range(spine):
+                i = pod * spine + k + 1
+                self.spine_switches.append(Switch("spine", i, self.leafs + i, grid_x_spine + k * self.spine_spacing,
+                                                  GRID_Y_SPINE + TIER_SPACING, self.allocator))
+        fabric_len = self.leaf_switches[-1].grid_x - GRID_X_LEAF
+        super_spine_spacing = max(fabric_len, LEAF_SPACING) // self.super_spines
+        for i in range(1, self.super_spines + 1):
+            self.super_spine_switches.append(Switch("superspine", i, self.leafs + self.spines + i,
+                                                    GRID_X_LEAF + super_spine_spacing // 2 + (i-1) * super_spine_spacing,
+                                                    GRID_Y_SPINE, self.allocator))
+
+    """ Returns the grid offsets (relative to the leaf) of the hosts of a leaf, three hosts per row under the leaf
+        With the legacy layout every host past the 6th is on the 2nd row (on top of the hosts 4 to 6), with the "rows"
+        layout each group of three hosts gets its own row (both layouts agree up to 6 hosts).
+        Input: first and last host (all the hosts of a leaf of the fabric by default)
+    """
+    def host_offsets(self, first=1, last=None):
+        offsets = []
+        for j in range(first, (self.hosts if last is None else last) + 1):
+            column = (j - 1) % HOST_COLUMNS - 1     # -1, 0, 1: 1st, 2nd, 3rd column
+            if self.layout == "legacy":
+                row = 1 if j/3 <= 1 else 2
+            else:
+                row = (j - 1) // HOST_COLUMNS + 1
+            offsets.append((column * HOST_COLUMN_SPACING, row * HOST_ROW_SPACING))
+        return offsets
+
+    """ Adds a link and the ports of the switches at both ends
+    """
+    def add_link(self, node1, port1, node2, port2):
+        self.links.append(Link(node1, port1, node2, port2))
+        for node, port, peer in ((node1, port1, node2), (node2, port2, node1)):
+            if isinstance(node, Switch):
+                new_port = Port(node, port, peer)
+                node.ports.append(new_port)
+                self.index[new_port.name] = new_port
+
+    """ Returns the links between switches (the host links come after them)
+    """
+    def switch_links(self):
+        return self.links[:self.switch_link_count]
+
+    """ Adds the links between a leaf and its hosts (the host ports of a leaf come after its spine ports)
+    """
+    def add_host_links(self, leaf_switch, hosts):
+        index = self.index
+        for new_host in hosts:
+            self.links.append(Link(new_host, 0, leaf_switch, new_host.port))
+            new_port = Port(leaf_switch, new_host.port, new_host)
+            leaf_switch.ports.append(new_port)
+            index[new_host.name] = new_host
+            index[new_port.name] = new_port
+
+    """ Returns the switch, host or port with a given name (None if it does not exist)
+    """
+    def lookup(self, name):
+        return self.index.get(name)
+
+    """ Returns the switch or host that owns an identifier (None if no entity owns it)
+        Input: kind of identifier ("grpc_port", "mac", "sid", "ipv4_loopback", "vlan", "ipv4", "ipv6"; the gateways of
+               a leaf are owned by the leaf); identifier
+    """
+    def owner(self, kind, value):
+        if self.owners is None:
+            owners = {}
+            for switch in self.switches:
+                for name in ("grpc_port", "mac", "sid", "ipv4_loopback"):
+                    owners[(name, getattr(switch, name))] = switch
+            for switch in self.leaf_switches:
+                owners[("vlan", switch.vlan)] = switch
+                owners[("ipv4", switch.ipv4_gateway)] = switch
+                owners[("ipv6", switch.ipv6_gateway)] = switch
+            for host in self.host_list:
+                owners[("mac", host.mac)] = host
+                owners[("ipv4", host.ipv4)] = host
+                owners[("ipv6", host.ipv6)] = host
+            self.owners = owners
+        if kind == "mac":
+            value = value.upper()
+        elif kind in ("grpc_port", "vlan"):
+            value = int(value)
+        return self.owners.get((kind, str(value) if kind == "sid" else value))
+
+    """ Returns the ports of the leaf switches that are attached to hosts, in the order of the hosts
+        Input: leaf switches (all the leaf switches of the fabric by default)
+    """
+    def edge_ports(self, leaf_switches=None):
+        for switch in (self.leaf_switches if leaf_switches is None else leaf_switches):
+            for port in switch.ports:
+                if isinstance(port.peer, Host):
+                    yield port
+
+    """ Returns the next free port number of a switch (the ports of a changed fabric are not renumbered)
+    """
+    def next_port(self, switch):
+        return max([port.number for port in switch.ports] or [0]) + 1
+
+    """ Links two switches of a changed fabric on their next free ports (the switch links stay before the host links)
+    """
+    def link_switches(self, node1, node2):
+        self.add_link(node1, self.next_port(node1), node2, self.next_port(node2))
+        self.links.insert(self.switch_link_count, self.links.pop())
+        self.switch_link_count += 1
+        return self.links[self.switch_link_count - 1]
+
+    """ Checks that the fabric can be changed and returns the change that is about to be applied
+    """
+    def begin_change(self):
+        if self.pods > 1 or self.super_spines:
+            raise ValueError("only 2-tier fabrics can be changed")
+        self.mutations += 1
+        self.owners = None
+        return FabricChange()
+
+    """ Adds a switch to a changed fabric: its number follows the last switch of its tier and its index (gRPC port...)
+        the last switch of the fabric, so that the identifiers of the other switches do not move
+    """
+    def new_switch(self, kind, tier, grid_x, grid_y):
+        number = max([switch.number for switch in tier] or [0]) + 1
+        switch = Switch(kind, number, max(switch.index for switch in self.switches) + 1, grid_x, grid_y,
+                        self.allocator)
+        tier.append(switch)
+        self.switches = self.leaf_switches + self.spine_switches + self.super_spine_switches
+        self.index[switch.name] = switch
+        return switch
+
+    """ Removes a switch and its links (and the hosts of a leaf) from a changed fabric
+    """
+    def remove_switch(self, switch, tier, change):
+        change.hosts_removed.extend(switch.hosts)
+        removed = set([switch] + switch.hosts)
+        for host in switch.hosts:
+            del self.index[host.name]
+        self.host_list = [host for host in self.host_list if host.leaf is not switch]
+        kept = []
+        for i, link in enumerate(self.links):
+            if link.node1 in removed or link.node2 in removed:
+                change.links_removed.append(link)
+                self.switch_link_count -= i < self.switch_link_count
+            else:
+                kept.append(link)
+        self.links = kept
+        for port in switch.ports:
+            del self.index[port.name]
+            if isinstance(port.peer, Switch):
+                peer_port = [peer_port for peer_port in port.peer.ports if peer_port.peer is switch][0]
+                port.peer.ports.remove(peer_port)
+                del self.index[peer_port.name]
+                change.switches_changed.append(port.peer)
+        tier.remove(switch)
+        self.switches = self.leaf_switches + self.spine_switches + self.super_spine_switches
+        del self.index[switch.name]
+        change.switches_removed.append(switch)
+
+    """ Adds a leaf switch (linked to every spine) with its hosts
+        Input: number of hosts of the leaf
+    """
+    def add_leaf(self, hosts):
+        change = self.begin_change()
+        grid_x = max([switch.grid_x for switch in self.leaf_switches] or [GRID_X_LEAF - LEAF_SPACING]) + LEAF_SPACING
+        leaf_switch = self.new_switch("leaf", self.leaf_switches, grid_x, self.grid_y_leaf)
+        change.switches_added.append(leaf_switch)
+        for spine_switch in self.spine_switches:
+            change.links_added.append(self.link_switches(spine_switch, leaf_switch))
+            change.switches_changed.append(spine_switch)
+        self.leafs = self.pod_leafs = len(self.leaf_switches)
+        self.add_leaf_hosts(leaf_switch, hosts, change)
+        change.switches_changed.remove(leaf_switch)
+        return change
+
+    """ Removes a leaf switch with its hosts
+    """
+    def remove_leaf(self, name):
+        leaf_switch = self.index.get(name)
+        if leaf_switch not in self.leaf_switches:
+            raise ValueError("no leaf switch named '%s'" % name)
+        change = self.begin_change()
+        self.remove_switch(leaf_switch, self.leaf_switches, change)
+        self.leafs = self.pod_leafs = len(self.leaf_switches)
+        return change
+
+    """ Adds a spine switch linked to every leaf
+    """
+    def add_spine(self):
+        change = self.begin_change()
+        grid_x = max(switch.grid_x for switch in self.spine_switches) + max(self.spine_spacing, LEAF_SPACING)
+        spine_switch = self.new_switch("spine", self.spine_switches, grid_x, GRID_Y_SPINE)
+        change.switches_added.append(spine_switch)
+        for leaf_switch in self.leaf_switches:
+            change.links_added.append(self.link_switches(spine_switch, leaf_switch))
+            change.switches_changed.append(leaf_switch)
+        self.spines = self.pod_spines = len(self.spine_switches)
+        return change
+
+    """ Removes a spine switch
+    """
+    def remove_spine(self, name):
+        spine_switch = self.index.get(name)
+        if spine_switch not in self.spine_switches:
+            raise ValueError("no spine switch named '%s'" % name)
+        if len(self.spine_switches) == 1:
+            raise ValueError("the last spine switch cannot be removed")
+        change = self.begin_change()
+        self.remove_switch(spine_switch, self.spine_switches, change)
+        self.spines = self.pod_spines = len(self.spine_switches)
+        return change
+
+    """ Adds hosts to a leaf switch, on the next free ports of the leaf
+    """
+    def add_hosts(self, name, count):
+        leaf_switch = self.index.get(name)
+        if leaf_switch not in self.leaf_switches:
+            raise ValueError("no leaf switch named '%s'" % name)
+        if count < 1:
+            raise ValueError("at least one host has to be added")
+        change = self.begin_change()
+        self.add_leaf_hosts(leaf_switch, count, change)
+        return change
+
+    """ Adds hosts after the last host of a leaf switch (the leaf has to be restarted to get the new ports)
+    """
+    def add_leaf_hosts(self, leaf_switch, count, change):
+        first = len(leaf_switch.hosts) + 1
+        last = first + count - 1
+        letters = [host_letters(j) for j in range(1, last + 1)]
+        macs, ipv4s, ipv6s = self.allocator.host_columns(leaf_switch.number, letters)
+        offsets = self.host_offsets(first, last)
+        port = self.next_port(leaf_switch)
+        new_hosts = [Host(leaf_switch, j, port + j - first, leaf_switch.grid_x + offsets[j-first][0],
+                          self.grid_y_leaf + offsets[j-first][1], letters[j-1], macs[j-1], ipv4s[j-1], ipv6s[j-1])
+                     for j in range(first, last + 1)]
+        leaf_switch.hosts.extend(new_hosts)
+        self.host_list.extend(new_hosts)
+        first_link = len(self.links)
+        self.add_host_links(leaf_switch, new_hosts)
+        change.hosts_added.extend(new_hosts)
+        change.links_added.extend(self.links[first_link:])
+        change.switches_changed.append(leaf_switch)
+
+
+""" Change applied to a fabric by add_leaf, remove_leaf, add_spine, remove_spine or add_hosts
+    switches_changed: switches whose ports changed (their dataplane has to be restarted)
+"""
+class FabricChange(object):
+    __slots__ = ("switches_added", "switches_removed", "switches_changed", "hosts_added", "hosts_removed",
+                 "links_added", "links_removed")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, [])
+
+    """ Returns a one line summary with the names of the switches and the number of hosts and links changed
+    """
+    def summary(self):
+        names = lambda entities: " ".join(entity.name for entity in entities) or "none"
+        return "added: %s; removed: %s; restarted: %s; hosts +%d -%d, links +%d -%d" % (
+            names(self.switches_added), names(self.switches_removed), names(self.switches_changed),
+            len(self.hosts_added), len(self.hosts_removed), len(self.links_added), len(self.links_removed))
@@ -0,0 +1,91 @@
+### LIBRARIES ###
+from __future__ import division
+
+
+### FUNCTIONS ###
+
+""" Attributes of a switch that end up in its netcfg entry (its grid coordinates only count on a relayout)
+"""
+def switch_signature(switch, relayout):
+    signature = (switch.kind, switch.grpc_port, switch.mac, switch.sid, switch.ipv4_loopback)
+    return signature + (switch.grid_x, switch.grid_y) if relayout else signature
+
+
+""" Attributes of a host that end up in its netcfg entry (its grid coordinates only count on a relayout)
+"""
+def host_signature(host, relayout):
+    signature = (host.leaf.name, host.port, host.mac, host.vlan, host.ipv4, host.ipv4_prefix, host.ipv6, host.ipv6_prefix)
+    return signature + (host.grid_x, host.grid_y) if relayout else signature
+
+
+""" Attributes of an edge port that end up in its netcfg entry
+"""
+def port_signature(port, relayout):
+    return (port.peer.name, port.peer.vlan, port.peer.ipv4_gateway, port.peer.ipv4_prefix, port.peer.ipv6_gateway,
+            port.peer.ipv6_prefix)
+
+
+""" Splits two collections of entities (matched by name) into added, removed and changed entities
+    Input: entities of the previous fabric; entities of the new fabric; signature function; True on a relayout
+    Output: list of added entities (new fabric); list of removed entities (previous fabric); list of changed entities
+            (new fabric)
+"""
+def diff_entities(old_entities, new_entities, signature, relayout):
+    old_index = dict((entity.name, entity) for entity in old_entities)
+    added = []
+    changed = []
+    for entity in new_entities:
+        old_entity = old_index.pop(entity.name, None)
+        if old_entity is None:
+            added.append(entity)
+        elif signature(old_entity, relayout) != signature(entity, relayout):
+            changed.append(entity)
+    removed = [entity for entity in old_entities if entity.name in old_index]
+    return added, removed, changed
+
+
+### CLASSES ###
+
+""" Difference between two fabrics, as the switches, edge ports and hosts that were added, removed or changed
+    When the number of spines per pod and of hosts per leaf does not change (and there is no relayout and neither fabric
+    was changed after it was built, see Fabric.add_leaf), the hosts and ports of the leaves present in both fabrics are
+    identical, so only the leaves that were added or removed are walked: adding a leaf costs O(hosts on that leaf) plus
+    a comparison of the switches.
+    Input: previous fabric model; new fabric model; True to also update the grid coordinates of existing entities
+"""
+class FabricDelta(object):
+    __slots__ = ("switches_added", "switches_removed", "switches_changed", "ports_added", "ports_removed",
+                 "ports_changed", "hosts_added", "hosts_removed", "hosts_changed")
+
+    def __init__(self, old, new, relayout=False):
+        self.switches_added, self.switches_removed, self.switches_changed = diff_entities(
+            old.switches, new.switches, switch_signature, relayout)
+
+        if (old.pod_spines == new.pod_spines and old.hosts == new.hosts and not relayout
+                and not old.mutations and not new.mutations):
+            common = min(old.leafs, new.leafs)
+            old_leaf_switches = old.leaf_switches[common:]
+            new_leaf_switches = new.leaf_switches[common:]
+        else:
+            old_leaf_switches = old.leaf_switches
+            new_leaf_switches = new.leaf_switches
+
+        self.hosts_added, self.hosts_removed, self.hosts_changed = diff_entities(
+            [host for switch in old_leaf_switches for host in switch.hosts],
+            [host for switch in new_leaf_switches for host in switch.hosts], host_signature, relayout)
+        self.ports_added, self.ports_removed, self.ports_changed = diff_entities(
+            list(old.edge_ports(old_leaf_switches)), list(new.edge_ports(new_leaf_switches)), port_signature, relayout)
+
+    """ Returns True if both fabrics are equivalent
+    """
+    def empty(self):
+        return not any(getattr(self, name) for name in self.__slots__)
+
+    """ Returns a one line summary with the number of entities added, removed and changed
+    """
+    def summary(self):
+        return ", ".join("%s +%d -%d ~%d" % (kind, len(getattr(self, kind + "_added")),
+                                             len(getattr(self, kind + "_removed")),
+                                             len(getattr(self, kind + "_changed")))
+                         for kind in ("switches", "ports", "hosts"))
+
@@ -0,0 +1,344 @@
+#  Changes of a running fabric (leaves, spines and hosts added or removed without restarting Mininet)
+#
+#  The generators write the parameters of the fabric (write_fabric) next to the topo script, so that the topology can
+#  rebuild the fabric model and change it: FabricControl applies a change (Fabric.add_leaf, remove_leaf, add_spine,
+#  remove_spine, add_hosts) to the model, then to the running network (new nodes and links are created and started,
+#  removed ones deleted, and only the switches whose ports changed are restarted), and appends it to the mutations log
+#  once the network is changed; when the change fails, the model is rebuilt from the fabric file and the mutations log. The changes are requested from the Mininet CLI (fabric
+#  command) or from a local HTTP endpoint. The generators replay the mutations log (mutations=<log>) to write the
+#  matching incremental netcfg.
+
+### LIBRARIES ###
+from __future__ import print_function
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from addressing import allocator_from_environ
+from fabric import Fabric
+
+
+### CONSTANTS ###
+FABRIC_VERSION = 1                      # Version of the layout of the fabric file
+DEFAULT_CONTROL_PORT = 8282             # Port of the HTTP endpoint (on the loopback interface of the Mininet container)
+COMMANDS = {                            # fabric command of the CLI -> (operation, names of its arguments)
+    "add-leaf": ("add_leaf", ["hosts"]),
+    "remove-leaf": ("remove_leaf", ["name"]),
+    "add-spine": ("add_spine", []),
+    "remove-spine": ("remove_spine", ["name"]),
+    "add-hosts": ("add_hosts", ["name", "count"]),
+}
+
+
+### FUNCTIONS ###
+
+""" Returns the absolute path of a file given relative to the directory of this module (the mininet directory, where
+    the generators write the files of the topology)
+"""
+def module_path(file_name):
+    if os.path.isabs(file_name):
+        return file_name
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+
+
+""" Writes the parameters the fabric model is built from
+"""
+def write_fabric(file_name, fabric):
+    params = {"version": FABRIC_VERSION, "leafs": fabric.pod_leafs, "spines": fabric.pod_spines,
+              "hosts": fabric.hosts, "pods": fabric.pods, "super_spines": fabric.super_spines,
+              "addressing": fabric.allocator.name, "layout": fabric.layout}
+    f_fabric = open(file_name, 'w')
+    json.dump(params, f_fabric, sort_keys=True)
+    f_fabric.close()
+
+
+""" Builds the fabric model from a fabric file
+"""
+def load_fabric(file_name):
+    f_fabric = open(module_path(file_name), 'r')
+    params = json.load(f_fabric)
+    f_fabric.close()
+    if params.get("version") != FABRIC_VERSION:
+        raise ValueError("unsupported fabric version %r in %s" % (params.get("version"), file_name))
+    pods, super_spines = params["pods"], params["super_spines"]
+    allocator = allocator_from_environ({"addressing": params["addressing"]}, params["leafs"] * pods,
+                                       params["spines"] * pods, params["hosts"], super_spines)
+    return Fabric(params["leafs"], params["spines"], params["hosts"], allocator, params["layout"], pods,
+                  super_spines)
+
+
+""" Applies an operation to the fabric model
+    Input: fabric model; operation {"op": "add_leaf", "hosts": N} (the hosts per leaf of the fabric by default),
+           {"op": "remove_leaf", "name": leaf}, {"op": "add_spine"}, {"op": "remove_spine", "name": spine} or
+           {"op": "add_hosts", "name": leaf, "count": N}
+    Output: change applied to the fabric (FabricChange)
+"""
+def apply_mutation(fabric, operation):
+    op = operation.get("op")
+    if op == "add_leaf":
+        return fabric.add_leaf(int(operation.get("hosts", fabric.hosts)))
+    if op == "remove_leaf":
+        return fabric.remove_leaf(str(operation["name"]))
+    if op == "add_spine":
+        return fabric.add_spine()
+    if op == "remove_spine":
+        return fabric.remove_spine(str(operation["name"]))
+    if op == "add_hosts":
+        return fabric.add_hosts(str(operation["name"]), int(operation["count"]))
+    raise ValueError("unknown operation %r" % op)
+
+
+""" Applies the operations of a mutations log (one JSON operation per line) to the fabric model
+    Output: number of operations applied
+"""
+def replay_mutations(fabric, file_name):
+    count = 0
+    f_log = open(module_path(file_name), 'r')
+    for line in f_log:
+        if line.strip():
+            apply_mutation(fabric, json.loads(line))
+            count += 1
+    f_log.close()
+    return count
+
+
+""" Rebuilds the fabric model from a fabric file and the operations of a mutations log
+"""
+def rebuild_fabric(fabric_file, log_file):
+    fabric = load_fabric(fabric_file)
+    replay_mutations(fabric, log_file)
+    return fabric
+
+
+""" Checks the changes of the fabric model of a fabric file: a leaf is added and rolled back (the model is rebuilt from
+    the fabric file and an empty mutations log), then added again and removed, and the model rebuilt from the log of
+    both changes must match the changed model
+    Input: fabric file; mutations log written by the check
+    Output: [error, ...] (empty when the changes are consistent)
+"""
+def check_mutations(fabric_file, log_file):
+    errors = []
+    snapshot = lambda fabric: ([switch.name for switch in fabric.switches], [host.name for host in fabric.host_list],
+                               len(fabric.links))
+    open(module_path(log_file), 'w').close()
+    fabric = load_fabric(fabric_file)
+    initial = snapshot(fabric)
+    leaf = apply_mutation(fabric, {"op": "add_leaf"}).switches_added[0].name
+    fabric = rebuild_fabric(fabric_file, log_file)
+    if snapshot(fabric) != initial:
+        errors.append("the model rolled back after adding %s differs from the fabric file" % leaf)
+    operations = [{"op": "add_leaf"}, {"op": "remove_leaf", "name": leaf}]
+    for operation in operations:
+        apply_mutation(fabric, operation)
+    f_log = open(module_path(log_file), 'w')
+    f_log.write("".join(json.dumps(operation, sort_keys=True) + "\n" for operation in operations))
+    f_log.close()
+    if snapshot(rebuild_fabric(fabric_file, log_file)) != snapshot(fabric):
+        errors.append("the model rebuilt from the mutations log differs from the changed model")
+    return errors
+
+
+""" Returns the operation of a fabric command of the CLI ("add-leaf 4", "remove-spine spine2", ...)
+"""
+def parse_command(line):
+    args = line.split()
+    if not args or args[0] not in COMMANDS:
+        raise ValueError("usage: fabric %s" % " | ".join(
+            " ".join([command] + ["<%s>" % name for name in names]) for command, (_, names) in sorted(COMMANDS.items())))
+    op, names = COMMANDS[args[0]]
+    operation = {"op": op}
+    operation.update(zip(names, args[1:]))
+    return operation
+
+
+""" Starts the changes of the running fabric: the fabric model is rebuilt from the fabric file and a new mutations log is
+    started (the topology starts from the generated fabric); the log of the previous run of the topology is kept as
+    <log>-<time of its last change>.jsonl
+    Input: running network; fabric file; mutations log; class of the switches; class of the hosts; function returning
+           the parameters of a host of the fabric model; port of the HTTP endpoint (None for the CLI only); parameters
+           of every switch
+    Output: FabricControl (also set as net.fabric_control, for the fabric command of the CLI)
+"""
+def start_control(net, fabric_file, log_file, switch_cls, host_cls, host_params, port=None, **switch_params):
+    control = FabricControl(net, fabric_file, log_file, switch_cls, host_cls, host_params, **switch_params)
+    net.fabric_control = control
+    if control.previous_log is not None:
+        print("*** Previous mutations log kept as %s" % os.path.basename(control.previous_log))
+    if port is not None:
+        server = ControlServer(("127.0.0.1", port), control)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        print("*** Fabric control endpoint on http://127.0.0.1:%d/fabric" % port)
+    return control
+
+
+""" CLI command: fabric add-leaf [hosts] | remove-leaf <leaf> | add-spine | remove-spine <spine> | add-hosts <leaf> <n>
+"""
+def do_fabric(cli, line):
+    control = getattr(cli.mn, 'fabric_control', None)
+    if control is None:
+        print("The fabric cannot be changed: the topology was started without --control")
+        return
+    try:
+        change = control.apply(parse_command(line))
+    except (ValueError, KeyError, RuntimeError) as error:
+        print("fabric: %s" % error)
+        return
+    print(change.summary())
+    print("Incremental netcfg: mutations=mininet/%s python3 netcfg.py (or netcfg-v6.py)"
+          % os.path.basename(control.log_file))
+
+
+### CLASSES ###
+
+""" Applies changes of the fabric to the running network (one change at a time)
+    previous_log: file the mutations log of the previous run was renamed to (None if there was none)
+"""
+class FabricControl(object):
+
+    def __init__(self, net, fabric_file, log_file, switch_cls, host_cls, host_params, **switch_params):
+        self.net = net
+        self.fabric_file = fabric_file
+        self.fabric = load_fabric(fabric_file)
+        self.log_file = module_path(log_file)
+        self.switch_cls = switch_cls
+        self.host_cls = host_cls
+        self.host_params = host_params
+        self.switch_params = switch_params
+        self.lock = threading.Lock()
+        self.previous_log = None
+        if os.path.exists(self.log_file) and os.path.getsize(self.log_file):
+            root, extension = os.path.splitext(self.log_file)
+            modified = time.strftime("%Y%m%d-%H%M%S", time.localtime(os.path.getmtime(self.log_file)))
+            self.previous_log = root + "-" + modified + extension
+            os.rename(self.log_file, self.previous_log)
+        open(self.log_file, 'w').close()
+
+    """ Applies an operation (see apply_mutation) to the fabric model and to the running network, and logs it once the
+        network is changed: after an invalid operation (ValueError, KeyError) or a failure of the network
+        (RuntimeError), the model is rebuilt from the fabric file and the mutations log, which does not have the
+        operation
+    """
+    def apply(self, operation):
+        with self.lock:
+            try:
+                change = apply_mutation(self.fabric, operation)
+            except (ValueError, KeyError):
+                self.fabric = rebuild_fabric(self.fabric_file, self.log_file)
+                raise
+            try:
+                self.apply_change(change)
+            except Exception as error:
+                self.fabric = rebuild_fabric(self.fabric_file, self.log_file)
+                raise RuntimeError("%s failed on the running network, which may be partly changed (the fabric model "
+                                   "and the mutations log are unchanged): %s" % (operation.get("op"), error))
+            f_log = open(self.log_file, 'a')
+            f_log.write(json.dumps(operation, sort_keys=True) + "\n")
+            f_log.close()
+            return change
+
+    """ Deletes the removed links and nodes, creates the new nodes and links, starts the new nodes and restarts the
+        switches whose ports changed (their dataplane reads its ports when it starts)
+    """
+    def apply_change(self, change):
+        net = self.net
+        for link in change.links_removed:
+            net.delLinkBetween(net[link.node1.name], net[link.node2.name])
+        for host in change.hosts_removed:
+            net.delHost(net[host.name])
+        for switch in change.switches_removed:
+            net.delSwitch(net[switch.name])
+
+        for switch in change.switches_added:
+            node = net.addSwitch(switch.name, cls=self.switch_cls, **self.switch_params)
+            node.grpcPort = switch.grpc_port    # the gRPC port of the fabric model, not the next port of the class
+        for host in change.hosts_added:
+            net.addHost(host.name, cls=self.host_cls, **self.host_params(host))
+        for link in change.links_added:
+            net.addLink(link.node1.name, link.node2.name, port1=link.port1, port2=link.port2)
+
+        for host in change.hosts_added:
+            net[host.name].configDefault()
+        for switch in change.switches_added:
+            net[switch.name].start(net.controllers)
+        removed = set(switch.name for switch in change.switches_removed)
+        for name in sorted(set(switch.name for switch in change.switches_changed) - removed):
+            node = net[name]
+            node.stop(deleteIntfs=False)
+            node.start(net.controllers)
+
+
+""" Handler of the HTTP endpoint: POST /fabric with an operation (JSON) applies it, GET /fabric returns the switches and
+    the number of hosts of the fabric
+"""
+class ControlHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body, sort_keys=True).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/') != "/fabric":
+            return self.reply(404, {"error": "not found"})
+        fabric = self.server.control.fabric
+        self.reply(200, {"switches": [switch.name for switch in fabric.switches], "hosts": len(fabric.host_list),
+                         "mutations": fabric.mutations})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.rstrip('/') != "/fabric":
+            return self.reply(404, {"error": "not found"})
+        try:
+            change = self.server.control.apply(json.loads(body.decode('utf-8')))
+        except (ValueError, KeyError) as error:
+            return self.reply(400, {"error": str(error)})
+        except RuntimeError as error:
+            return self.reply(500, {"error": str(error)})
+        self.reply(200, {"change": change.summary()})
+
+
+""" HTTP endpoint of a FabricControl
+"""
+class ControlServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, control):
+        HTTPServer.__init__(self, address, ControlHandler)
+        self.control = control
+
+
+""" Main funcion (check of the changes of the fabric model: python fabric_mutation.py <fabric file>) """
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: fabric_mutation.py <fabric file>")
+    f_log, log_file = tempfile.mkstemp(suffix=".jsonl")
+    os.close(f_log)
+    try:
+        errors = check_mutations(os.path.abspath(sys.argv[1]), log_file)
+    except ValueError as error:         # fabric that cannot be changed (3-tier) or operation refused by the model
+        errors = [str(error)]
+    finally:
+        os.remove(log_file)
+    for error in errors:
+        print("error: %s" % error)
+    if not errors:
+        print("fabric changes consistent")
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,394 @@
+#  Failover convergence-time benchmark of the generated fabrics
+#
+#  Host pairs on different leaves exchange a continuous stream of timestamped UDP probes (python failover.py
+#  probe|sink, one sequence-numbered packet every 1/rate seconds) while a failure is injected and then restored:
+#    link: the busiest uplink of the leaf of the first sender goes down (Mininet configLinkStatus), then up again
+#    spine: every link of the busiest spine goes down, then up again
+#    spine-stop: the busiest spine is stopped (its interfaces kept), then started again
+#  The busiest uplink or spine is the one that carried the most probe bytes before the failure, so that the failure hits
+#  the probes. The sinks record the gaps of the sequence numbers: the convergence time of an event (failure or
+#  restoration) is the time from the event until the probes are delivered again after the last gap that followed it,
+#  and the packets lost are the probes missing in those gaps. Each scenario is repeated, and the convergence times of
+#  every pair and repetition are reported as a histogram per scenario and event, with the dimensions of the fabric, so
+#  that the runs on fabrics of different sizes can be compared.
+
+### LIBRARIES ###
+from __future__ import division
+from __future__ import print_function
+import json
+import os
+import shutil
+import socket
+import struct
+import sys
+import tempfile
+import time
+
+from port_counters import COUNTERS, read_counters, switch_tier
+from throughput import address, host_leaf, pattern_flows
+
+try:
+    from mininet.log import info, warn
+except ImportError:                     # the probes run outside of Mininet (python failover.py ...)
+    info = warn = None
+
+
+### CONSTANTS ###
+SCENARIOS = ["link", "spine", "spine-stop"]
+DEFAULT_RATE = 1000                     # Probes sent per second by each sender
+DEFAULT_HOLD = 3                        # Time (in seconds) the failure is held before it is restored
+DEFAULT_SETTLE = 2                      # Time (in seconds) before the failure and after the restoration
+DEFAULT_REPEAT = 5                      # Number of runs of each scenario
+DEFAULT_PAIRS = 4                       # Number of host pairs probing
+DEFAULT_PORT = 5301                     # UDP port of the sink of the first pair (the next pairs use the next ports)
+REPORT_VERSION = 1                      # Version of the layout of the report
+PROBE_SIZE = 64                         # Size (in bytes) of the payload of a probe
+PROBE_FORMAT = "!Id"                    # Sequence number and send time of a probe
+STARTUP = 1                             # Time (in seconds) given to the sinks to listen before the probes start
+GRACE = 2                               # Time (in seconds) the sinks keep listening after the last probe
+HISTOGRAM_BUCKETS = [0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]     # upper bounds (ms) of the buckets
+
+
+### FUNCTIONS ###
+
+""" Returns the links of a switch to other switches: [(switch name, peer name, interface of the switch), ...]
+"""
+def switch_links(switch, switch_names):
+    links = []
+    for intf in switch.intfList():
+        link = getattr(intf, 'link', None)
+        if link is None:
+            continue
+        peer = link.intf2 if link.intf1 is intf else link.intf1
+        if peer.node.name in switch_names:
+            links.append((switch.name, peer.node.name, intf.name))
+    return links
+
+
+""" Returns the bytes sent so far by the interfaces of the network: {interface: bytes}
+"""
+def tx_bytes():
+    tx = COUNTERS.index("tx_bytes")
+    return dict((name, counters[tx]) for name, counters in read_counters().items())
+
+
+""" Returns the target of a scenario: the uplink of the leaf of the first sender (link), or the spine (spine,
+    spine-stop), that sent the most bytes since the given counters
+    Output: (switch name, peer name) of a link, or (spine name, None)
+"""
+def busiest_target(net, scenario, leaf, before):
+    after = tx_bytes()
+    names = set(switch.name for switch in net.switches)
+    if scenario == "link":
+        uplinks = switch_links(net[leaf], names)
+        best = max(uplinks, key=lambda uplink: after.get(uplink[2], 0) - before.get(uplink[2], 0))
+        return best[0], best[1]
+    spines = set(peer for _, peer, _ in switch_links(net[leaf], names))
+    load = {}
+    for name in spines:
+        load[name] = sum(after.get(intf, 0) - before.get(intf, 0) for _, _, intf in switch_links(net[name], names))
+    return max(sorted(load), key=lambda name: load[name]), None
+
+
+""" Returns the target of the failures of scenarios: (switch name, peer name) of a link for the link scenario,
+    (spine name, None) for the spine and spine-stop scenarios (None for the busiest one); a ValueError is raised when
+    the target does not fit the scenarios
+    Input: scenarios; target ("leafN:spineM", "spineM" or None); names of the switches of the fabric
+"""
+def parse_target(scenarios, target, switch_names):
+    if not target:
+        return None
+    names = tuple(target.split(':', 1)) if ':' in target else (target, None)
+    for name in names:
+        if name is not None and name not in switch_names:
+            raise ValueError("unknown switch %r in the failover target %r" % (name, target))
+    for scenario in scenarios:
+        if scenario == "link" and names[1] is None:
+            raise ValueError("the target of a link failure is a link (leafN:spineM), not %r" % target)
+        if scenario != "link" and (names[1] is not None or switch_tier(names[0]) not in ("spine", "sspine")):
+            raise ValueError("the target of a %s failure is a spine (spineM), not %r" % (scenario, target))
+    return names
+
+
+""" Injects (up=False) or restores (up=True) the failure of a scenario
+"""
+def apply_failure(net, scenario, target, up):
+    name, peer = target
+    status = 'up' if up else 'down'
+    if scenario == "link":
+        net.configLinkStatus(name, peer, status)
+    elif scenario == "spine":
+        names = set(switch.name for switch in net.switches)
+        for _, other, _ in switch_links(net[name], names):
+            net.configLinkStatus(name, other, status)
+    elif up:
+        net[name].start(net.controllers)
+    else:
+        net[name].stop(deleteIntfs=False)
+
+
+""" Returns the convergence time (ms) and the packets lost after an event, from the gaps recorded by a sink: a gap
+    follows the event when its first missing probe was sent between the event and the next event
+    Input: sink report (with the number of probes sent); time of the event; time of the next event (or of the end of
+           the probes); rate of the probes
+    Output: (convergence time in ms, or None if the probes were not delivered again before the next event; packets lost)
+"""
+def event_result(sink, start, end, rate):
+    interval = 1.0 / rate
+    convergence, lost = 0.0, 0
+    for seq_before, sent_before, seq_after, sent_after in sink["gaps"]:
+        if not start - interval <= sent_before < end - interval:
+            continue
+        lost += seq_after - seq_before - 1
+        convergence = None if convergence is None or sent_after >= end else max(convergence, sent_after - start)
+    last_seq, last_sent = sink["last"] if sink["last"] else (-1, 0)
+    if sink["sent"] - 1 > last_seq and last_sent < end:        # not delivered again until the end of the probes
+        convergence = None
+        if last_sent >= start - interval:
+            lost += sink["sent"] - 1 - last_seq
+    return (None if convergence is None else round(convergence * 1000, 3)), lost
+
+
+""" Returns the histogram of convergence times: counts per bucket (upper bound in ms, ">5000" past the last one,
+    "unrecovered" for the events after which the probes were not delivered again) and percentiles
+"""
+def histogram(times):
+    labels = ["<=%g" % bound for bound in HISTOGRAM_BUCKETS] + [">%g" % HISTOGRAM_BUCKETS[-1], "unrecovered"]
+    counts = dict((label, 0) for label in labels)
+    recovered = sorted(value for value in times if value is not None)
+    for value in times:
+        if value is None:
+            counts["unrecovered"] += 1
+            continue
+        bounds = [bound for bound in HISTOGRAM_BUCKETS if value <= bound]
+        counts["<=%g" % bounds[0] if bounds else ">%g" % HISTOGRAM_BUCKETS[-1]] += 1
+    summary = {"buckets": [[label, counts[label]] for label in labels], "samples": len(times)}
+    if recovered:
+        summary.update({"p50": percentile(recovered, 0.5), "p90": percentile(recovered, 0.9),
+                        "p99": percentile(recovered, 0.99), "max": recovered[-1]})
+    return summary
+
+
+def percentile(values, fraction):
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+""" Runs one repetition of a scenario: the probes are started, the failure is injected on the busiest target, held,
+    restored and followed by the settle time
+    Input: Mininet network; scenario; pairs [(sender, receiver), ...]; rate, hold and settle times; target (None for
+           the busiest one); directory of the files of the probes and sinks; UDP port of the first sink
+    Output: {"target", "fail": [pair results], "restore": [pair results]}
+"""
+def run_once(net, scenario, pairs, rate, hold, settle, target, directory, port):
+    duration = settle + hold + settle
+    script = os.path.abspath(__file__).replace('.pyc', '.py')
+    pids = []
+    for index, (src, dst) in enumerate(pairs):
+        sink_file = os.path.join(directory, "sink-%d.json" % index)
+        ipv6 = " --ipv6" if ':' in address(dst) else ""
+        pids.append((dst, dst.cmd("%s %s sink %d %g %s%s > /dev/null 2>&1 & echo $!" % (
+            sys.executable, script, port + index, STARTUP + duration + GRACE, sink_file, ipv6)).strip()))
+    time.sleep(STARTUP)
+    before = tx_bytes()
+    for index, (src, dst) in enumerate(pairs):
+        probe_file = os.path.join(directory, "probe-%d.json" % index)
+        pids.append((src, src.cmd("%s %s probe %s %d %d %g %s > /dev/null 2>&1 & echo $!" % (
+            sys.executable, script, address(dst), port + index, rate, duration, probe_file)).strip()))
+
+    time.sleep(settle)
+    if target is None:
+        target = busiest_target(net, scenario, host_leaf(pairs[0][0]), before)
+    failed_at = time.time()
+    apply_failure(net, scenario, target, up=False)
+    time.sleep(hold)
+    restored_at = time.time()
+    apply_failure(net, scenario, target, up=True)
+    time.sleep(settle + GRACE + STARTUP)
+
+    results = {"target": [name for name in target if name], "fail": [], "restore": []}
+    for index, (src, dst) in enumerate(pairs):
+        sink = read_json(os.path.join(directory, "sink-%d.json" % index))
+        probe = read_json(os.path.join(directory, "probe-%d.json" % index))
+        if sink is None or probe is None:
+            for event in ("fail", "restore"):
+                results[event].append({"src": src.name, "dst": dst.name, "convergence_ms": None, "lost": None,
+                                       "error": "no report from the %s" % ("sink" if sink is None else "probe")})
+            continue
+        sink["sent"] = probe["sent"]
+        for event, start, end in (("fail", failed_at, restored_at), ("restore", restored_at, probe["end"])):
+            convergence, lost = event_result(sink, start, end, rate)
+            results[event].append({"src": src.name, "dst": dst.name, "convergence_ms": convergence, "lost": lost,
+                                   "error": None})
+    for host, pid in pids:
+        if pid:
+            host.cmd("kill %s 2>/dev/null" % pid.splitlines()[-1])
+    return results
+
+
+def read_json(file_name):
+    try:
+        f_json = open(file_name, 'r')
+    except IOError:
+        return None
+    try:
+        return json.load(f_json)
+    except ValueError:
+        return None
+    finally:
+        f_json.close()
+
+
+""" Runs the failover benchmark on the running network
+    Input: Mininet network; scenarios (SCENARIOS); number of runs of each scenario; number of host pairs (a permutation
+           of the hosts across leaves); rate of the probes; hold and settle times; target of the failures
+           ("leafN:spineM" for a link, "spineM" for a spine; None for the busiest one); UDP port of the first sink;
+           JSON file the report is written to (optional, relative to the directory of this module)
+    Output: report: the results of every run, and the histogram of the convergence times of each scenario and event
+"""
+def run_benchmark(net, scenarios=("link",), repeat=DEFAULT_REPEAT, pairs=DEFAULT_PAIRS, rate=DEFAULT_RATE,
+                  hold=DEFAULT_HOLD, settle=DEFAULT_SETTLE, target=None, port=DEFAULT_PORT, report_file=None):
+    for scenario in scenarios:
+        if scenario not in SCENARIOS:
+            raise ValueError("unknown scenario %r (%s)" % (scenario, ", ".join(SCENARIOS)))
+    hosts = [host for host in net.hosts if host.params.get('ip') or host.params.get('ipv6')]
+    leaves = dict((host.name, host_leaf(host)) for host in hosts)
+    flows = pattern_flows(hosts, leaves, "permutation")[:max(pairs, 1)]
+    if not flows:
+        raise ValueError("no pair of hosts on different leaves")
+    target = parse_target(scenarios, target, set(switch.name for switch in net.switches))
+
+    start = time.time()
+    runs = []
+    directory = tempfile.mkdtemp(prefix="failover-")
+    try:
+        for scenario in scenarios:
+            for index in range(repeat):
+                run_directory = os.path.join(directory, "%s-%d" % (scenario, index))
+                os.mkdir(run_directory)
+                result = run_once(net, scenario, flows, rate, hold, settle, target, run_directory, port)
+                result.update(scenario=scenario, repeat=index)
+                runs.append(result)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    histograms = {}
+    for scenario in scenarios:
+        histograms[scenario] = {}
+        for event in ("fail", "restore"):
+            pair_results = [pair for run in runs if run["scenario"] == scenario for pair in run[event]
+                            if pair["error"] is None]
+            histograms[scenario][event] = histogram([pair["convergence_ms"] for pair in pair_results])
+            histograms[scenario][event]["lost"] = sum(pair["lost"] for pair in pair_results)
+    switch_names = set(leaves.values())
+    report = {"version": REPORT_VERSION, "scenarios": list(scenarios), "repeat": repeat, "rate": rate, "hold": hold,
+              "settle": settle, "pairs": [[src.name, dst.name] for src, dst in flows],
+              "fabric": {"leaves": len(switch_names), "switches": len(net.switches),
+                         "hosts": len(hosts)},
+              "elapsed": time.time() - start, "runs": runs, "histograms": histograms}
+    if report_file:
+        f_report = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), report_file), 'w')
+        json.dump(report, f_report, indent=2, sort_keys=True)
+        f_report.close()
+    return report
+
+
+""" Logs the result of a failover benchmark
+"""
+def print_report(report):
+    info("*** Failover (%s): %d runs of %d pairs at %d probes/s, %.1fs\n" % (
+        ", ".join(report["scenarios"]), len(report["runs"]), len(report["pairs"]), report["rate"], report["elapsed"]))
+    for scenario in report["scenarios"]:
+        for event in ("fail", "restore"):
+            summary = report["histograms"][scenario][event]
+            unrecovered = dict(summary["buckets"])["unrecovered"]
+            if "p50" in summary:
+                info("*** %s %s: p50 %.1f / p90 %.1f / max %.1f ms, %d probes lost\n" % (
+                    scenario, event, summary["p50"], summary["p90"], summary["max"], summary["lost"]))
+            if unrecovered:
+                warn("*** %s %s: %d pairs did not recover\n" % (scenario, event, unrecovered))
+
+
+""" Mininet CLI command: failover [scenario] [repeat] [target]
+"""
+def do_failover(cli, line):
+    args = line.split()
+    scenario = args[0] if len(args) > 0 else "link"
+    repeat = int(args[1]) if len(args) > 1 else DEFAULT_REPEAT
+    target = args[2] if len(args) > 2 else None
+    try:
+        print_report(run_benchmark(cli.mn, [scenario], repeat, target=target))
+    except ValueError as error:
+        print("failover: %s" % error)
+
+
+""" Probe: sends a sequence-numbered, timestamped UDP packet every 1/rate seconds for the duration, then writes the
+    number of packets sent and the end time of the probes
+"""
+def probe(destination, port, rate, duration, file_name):
+    sender = socket.socket(socket.AF_INET6 if ':' in destination else socket.AF_INET, socket.SOCK_DGRAM)
+    padding = b'\0' * (PROBE_SIZE - struct.calcsize(PROBE_FORMAT))
+    interval = 1.0 / rate
+    start = time.time()
+    seq = 0
+    while True:
+        now = time.time()
+        if now - start >= duration:
+            break
+        try:
+            sender.sendto(struct.pack(PROBE_FORMAT, seq, now) + padding, (destination, port))
+        except socket.error:            # no route while the fabric converges: the probe counts as lost
+            pass
+        seq += 1
+        delay = start + seq * interval - time.time()
+        if delay > 0:
+            time.sleep(delay)
+    write_json(file_name, {"sent": seq, "start": start, "end": time.time()})
+
+
+""" Sink: receives the probes for the duration, then writes the number of probes received, the first and last probes
+    ([sequence number, send time]) and the gaps of the sequence numbers ([sequence number and send time of the probe
+    before the gap, of the probe after the gap])
+"""
+def sink(port, duration, file_name, ipv6=False):
+    receiver = socket.socket(socket.AF_INET6 if ipv6 else socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("::" if ipv6 else "0.0.0.0", port))
+    receiver.settimeout(0.2)
+    report = {"received": 0, "reordered": 0, "first": None, "last": None, "gaps": []}
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        try:
+            data = receiver.recv(PROBE_SIZE)
+        except socket.timeout:
+            continue
+        seq, sent = struct.unpack(PROBE_FORMAT, data[:struct.calcsize(PROBE_FORMAT)])
+        report["received"] += 1
+        last = report["last"]
+        if last is None:
+            report["first"] = [seq, sent]
+            if seq > 0:
+                report["gaps"].append([-1, sent, seq, sent])
+        elif seq <= last[0]:
+            report["reordered"] += 1
+            continue
+        elif seq > last[0] + 1:
+            report["gaps"].append([last[0], last[1], seq, sent])
+        report["last"] = [seq, sent]
+    write_json(file_name, report)
+
+
+def write_json(file_name, data):
+    f_json = open(file_name + ".tmp", 'w')
+    json.dump(data, f_json)
+    f_json.close()
+    os.rename(file_name + ".tmp", file_name)
+
+
+""" Main funcion (probes: probe <address> <port> <rate> <duration> <file> | sink <port> <duration> <file> [--ipv6]) """
+if __name__ == "__main__":
+    if len(sys.argv) > 6 and sys.argv[1] == "probe":
+        probe(sys.argv[2], int(sys.argv[3]), float(sys.argv[4]), float(sys.argv[5]), sys.argv[6])
+    elif len(sys.argv) > 4 and sys.argv[1] == "sink":
+        sink(int(sys.argv[2]), float(sys.argv[3]), sys.argv[4], "--ipv6" in sys.argv[5:])
+    else:
+        sys.exit("usage: failover.py probe <address> <port> <rate> <duration> <file> | "
+                 "sink <port> <duration> <file> [--ipv6]")
@@ -0,0 +1,159 @@
+#  Concurrent host discovery for the generated Mininet topologies
+#
+#  ONOS learns the location of a host when the host sends traffic to the fabric. Instead of running one
+#  `util/mn-cmd <host> ping` per host (a docker exec and a mnexec each, one after the other), the sweep below makes
+#  every host ping its gateway from inside the running Mininet, with a bounded number of pings in flight.
+
+### LIBRARIES ###
+from __future__ import division
+import base64
+import json
+import select
+import time
+
+try:
+    from urllib.request import Request, urlopen
+except ImportError:
+    from urllib2 import Request, urlopen
+
+from mininet.log import info, warn
+
+
+### CONSTANTS ###
+DEFAULT_PARALLELISM = 64                # Number of hosts pinging at the same time
+DEFAULT_TIMEOUT = 2                     # Deadline (in seconds) of the ping of each host
+DEFAULT_RETRIES = 2                     # Number of extra sweeps over the hosts that failed
+INTERRUPT_GRACE = 1                     # Extra time (in seconds) after the deadline before a ping is interrupted
+STATUS_MARK = "discovery-status="       # Marker written after the ping with its exit status
+ONOS_USER = "onos"
+ONOS_PASSWORD = "rocks"
+
+
+### FUNCTIONS ###
+
+""" Returns the gateway a host pings (IPv4 hosts are configured with "gw", IPv6 hosts with "ipv6_gw")
+"""
+def gateway(host):
+    return host.params.get('gw') or host.params.get('ipv6_gw')
+
+
+""" Returns the command run by each host: a single ping with a deadline, followed by its exit status
+"""
+def ping_command(gw, timeout):
+    return "ping -c 1 -w %d %s > /dev/null 2>&1; echo %s$?" % (max(int(round(timeout)), 1), gw, STATUS_MARK)
+
+
+""" Returns True if the output of the ping command reports a success
+"""
+def ping_succeeded(output):
+    if STATUS_MARK not in output:
+        return False
+    status = output.split(STATUS_MARK, 1)[1].split()
+    return bool(status) and status[0] == '0'
+
+
+""" Makes the given hosts ping their gateway, with at most "parallelism" pings in flight
+    Input: hosts; number of hosts pinging at the same time; deadline (in seconds) of each ping
+    Output: list of the hosts whose ping failed
+"""
+def sweep(hosts, parallelism, timeout):
+    queue = list(reversed(hosts))
+    active = {}                         # file descriptor of the host shell -> [host, start time, output]
+    failed = []
+    poller = select.poll()
+
+    while queue or active:
+        while queue and len(active) < parallelism:
+            host = queue.pop()
+            host.sendCmd(ping_command(gateway(host), timeout))
+            fd = host.stdout.fileno()
+            poller.register(fd, select.POLLIN)
+            active[fd] = [host, time.time(), '']
+
+        for fd, _ in poller.poll(100):
+            entry = active[fd]
+            entry[2] += entry[0].monitor(0)
+            if not entry[0].waiting:
+                poller.unregister(fd)
+                del active[fd]
+                if not ping_succeeded(entry[2]):
+                    failed.append(entry[0])
+
+        now = time.time()
+        for fd, entry in list(active.items()):
+            if now - entry[1] > timeout + INTERRUPT_GRACE:
+                entry[0].sendInt()
+                entry[0].waitOutput()
+                poller.unregister(fd)
+                del active[fd]
+                failed.append(entry[0])
+
+    return failed
+
+
+""" Returns the MAC addresses of the hosts known by ONOS (None if ONOS cannot be reached)
+    Input: base URL of ONOS (e.g. http://onos:8181)
+"""
+def onos_hosts(onos_url):
+    request = Request(onos_url.rstrip('/') + "/onos/v1/hosts")
+    credentials = base64.b64encode(("%s:%s" % (ONOS_USER, ONOS_PASSWORD)).encode('utf-8')).decode('ascii')
+    request.add_header("Authorization", "Basic " + credentials)
+    try:
+        response = urlopen(request, timeout=10)
+        hosts = json.loads(response.read().decode('utf-8'))["hosts"]
+    except Exception as error:
+        warn("*** Could not read the hosts known by ONOS: %s\n" % error)
+        return None
+    return set(host["mac"].upper() for host in hosts)
+
+
+""" Makes every host ping its gateway so that ONOS learns its location, retrying the hosts that failed
+    Input: Mininet network; number of hosts pinging at the same time; deadline (in seconds) of each ping; number of
+           retries; base URL of ONOS to check which hosts it learned (optional)
+    Output: dictionary with the duration of the sweep, the number of attempts of each host, the hosts that never got
+            an answer from their gateway and the hosts ONOS did not learn (None when ONOS is not checked)
+"""
+def discover_hosts(net, parallelism=DEFAULT_PARALLELISM, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                   onos_url=None):
+    start = time.time()
+    hosts = [host for host in net.hosts if gateway(host)]
+    attempts = dict((host.name, 0) for host in hosts)
+    pending = hosts
+
+    for _ in range(retries + 1):
+        if not pending:
+            break
+        for host in pending:
+            attempts[host.name] += 1
+        pending = sweep(pending, max(parallelism, 1), timeout)
+
+    unlearned = None
+    if onos_url:
+        learned = onos_hosts(onos_url)
+        if learned is not None:
+            unlearned = sorted(host.name for host in hosts if str(host.MAC()).upper() not in learned)
+
+    return {"elapsed": time.time() - start, "hosts": len(hosts), "attempts": attempts,
+            "failed": sorted(host.name for host in pending), "unlearned": unlearned}
+
+
+""" Logs the result of a discovery sweep
+"""
+def print_report(report):
+    info("*** Host discovery: %d hosts in %.2fs (%d retried)\n" % (
+        report["hosts"], report["elapsed"], sum(1 for n in report["attempts"].values() if n > 1)))
+    if report["failed"]:
+        warn("*** No answer from the gateway: %s\n" % ' '.join(report["failed"]))
+    if report["unlearned"]:
+        warn("*** Not learned by ONOS: %s\n" % ' '.join(report["unlearned"]))
+
+
+""" Mininet CLI command: discover [parallelism] [timeout] [retries] [onos url]
+"""
+def do_discover(cli, line):
+    args = line.split()
+    parallelism = int(args[0]) if len(args) > 0 else DEFAULT_PARALLELISM
+    timeout = float(args[1]) if len(args) > 1 else DEFAULT_TIMEOUT
+    retries = int(args[2]) if len(args) > 2 else DEFAULT_RETRIES
+    onos_url = args[3] if len(args) > 3 else None
+    print_report(discover_hosts(cli.mn, parallelism, timeout, retries, onos_url))
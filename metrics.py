@@ -0,0 +1,193 @@
+#  Per-phase timing and resource metrics of the generators and of the fabric bring-up
+#
+#  A Metrics recorder times the phases of a run (the generator phases of netcfg.py and netcfg-v6.py, the steps of the
+#  main() of the topo script): for each phase it records the wall time, the CPU time and the memory (current and peak
+#  RSS) of the process, with the counts of the phase (switches, links, hosts, bytes written to the output files). The
+#  records are appended to a JSON-lines metrics file, one line per phase, after a first line describing the run, so
+#  that the runs of different releases can be compared. A summary table of the phases can be printed on exit.
+
+### LIBRARIES ###
+from __future__ import division
+from __future__ import print_function
+import atexit
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:                     # not available on every platform: the peak RSS is not recorded
+    resource = None
+
+
+### CONSTANTS ###
+METRICS_VERSION = 1                     # Version of the layout of the metrics records
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096     # Size (in bytes) of a memory page
+SUMMARY_COUNTS = ["switches", "links", "hosts", "bytes"]     # Counts shown in the summary table
+GENERATOR_PARAMS = ["leafs", "spines", "hosts", "pods", "super_spines", "addressing", "host_layout", "minify",
+                    "relayout", "topo_spec", "partitions", "prev_leafs", "prev_spines", "prev_hosts", "prev_pods",
+                    "prev_super_spines", "prev_netcfg", "mutations", "check", "host_stack",
+                    "host_locations", "grpc_publish", "grpc_reserve"]           # variables recorded with a run
+
+
+### FUNCTIONS ###
+
+""" Returns the CPU time (user and system, in seconds) used by the process so far
+"""
+def cpu_time():
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)        # finer than the clock ticks of os.times
+        return usage.ru_utime + usage.ru_stime
+    times = os.times()
+    return times[0] + times[1]
+
+
+""" Returns the current resident memory (in bytes) of the process (None where /proc is not available)
+"""
+def current_rss():
+    try:
+        f_statm = open("/proc/self/statm", 'r')
+    except IOError:
+        return None
+    try:
+        return int(f_statm.read().split()[1]) * PAGE_SIZE
+    finally:
+        f_statm.close()
+
+
+""" Returns the peak resident memory (in bytes) of the process so far (None where it is not available)
+"""
+def peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024        # kilobytes on Linux, bytes on macOS
+
+
+""" Returns the size (in bytes) of a file (0 if it does not exist)
+"""
+def file_size(file_name):
+    try:
+        return os.path.getsize(file_name)
+    except OSError:
+        return 0
+
+
+""" Returns the recorder of the generators: metrics=<file> appends the records to the file, metrics_summary=1 prints the
+    summary table on exit (no phase is recorded with neither)
+    Input: environment; name of the generator
+"""
+def metrics_from_environ(environ, script):
+    params = dict((name, environ[name]) for name in GENERATOR_PARAMS if name in environ)
+    return Metrics(environ.get('metrics') or None, environ.get('metrics_summary', '0') == '1', script, params)
+
+
+""" Returns the counts of a fabric model: switches, links (between switches and to the hosts) and hosts
+"""
+def fabric_counts(fabric):
+    return {"switches": len(fabric.switches), "links": len(fabric.links), "hosts": len(fabric.host_list)}
+
+
+""" Formats a size in bytes as mebibytes for the summary table
+"""
+def format_mib(size):
+    return "-" if size is None else "%.1f" % (size / (1024 * 1024))
+
+
+### CLASSES ###
+
+""" Recorder of the metrics of the phases of a run
+    records: records of the phases recorded so far
+    Input: metrics file the records are appended to (None to keep them in memory); True to print the summary table on
+           exit; name of the script; parameters of the run (dimensions of the fabric, options)
+"""
+class Metrics(object):
+
+    def __init__(self, file_name=None, summary=False, script=None, params=None):
+        self.file_name = file_name
+        self.summary = summary
+        self.script = os.path.basename(script) if script else os.path.basename(sys.argv[0])
+        self.run = time.strftime("%Y-%m-%dT%H:%M:%S") + "-" + str(os.getpid())     # identifies the records of a run
+        self.enabled = bool(file_name or summary)
+        self.records = []
+        self.stack = []                 # phases in progress (a phase can run inside another one)
+        if not self.enabled:
+            return
+        if file_name:
+            self.write({"version": METRICS_VERSION, "run": self.run, "script": self.script, "phase": "run",
+                        "params": params or {}, "python": platform.python_version(), "node": platform.node()})
+        if summary:
+            atexit.register(self.print_summary)
+
+    """ Records a phase (nothing is recorded when the recorder is disabled)
+        Input: name of the phase; output files written by the phase (their size is counted as the bytes written);
+               output files the phase appends to (their growth is counted); counts of the phase known beforehand
+        Output: yields the counts of the phase, which the caller can complete before the phase ends
+    """
+    @contextmanager
+    def phase(self, name, files=(), appends=(), **counts):
+        if not self.enabled:
+            yield counts
+            return
+        sizes = [file_size(file_name) for file_name in appends]
+        parent = self.stack[-1] if self.stack else None
+        self.stack.append(name)
+        start, cpu = time.time(), cpu_time()
+        try:
+            yield counts
+        finally:
+            self.stack.pop()
+            record = {"run": self.run, "script": self.script, "phase": name, "parent": parent,
+                      "wall": round(time.time() - start, 6), "cpu": round(cpu_time() - cpu, 6),
+                      "rss": current_rss(), "max_rss": peak_rss()}
+            if record["rss"] is not None and record["max_rss"] is not None:
+                record["max_rss"] = max(record["max_rss"], record["rss"])     # the peak is sampled less often
+            if files or appends:
+                record["bytes"] = (sum(file_size(file_name) for file_name in files) +
+                                   sum(file_size(file_name) - size for file_name, size in zip(appends, sizes)))
+            record.update(counts)
+            self.records.append(record)
+            if self.file_name:
+                self.write(record)
+
+    """ Records every call of a method of an object as a phase (e.g. the host configuration done by Mininet.build)
+    """
+    def wrap(self, obj, method, name):
+        if not self.enabled:
+            return
+        original = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            with self.phase(name):
+                return original(*args, **kwargs)
+        setattr(obj, method, timed)
+
+    """ Appends a record to the metrics file
+    """
+    def write(self, record):
+        f_metrics = open(self.file_name, 'a')
+        f_metrics.write(json.dumps(record, sort_keys=True) + "\n")
+        f_metrics.close()
+
+    """ Prints the phases recorded so far: wall time, CPU time, current and peak RSS and counts (the phases run inside
+        another phase are indented, and not added to the total)
+    """
+    def print_summary(self):
+        if not self.records:
+            return
+        rows = [["phase", "wall (s)", "cpu (s)", "rss (MiB)", "peak (MiB)"] + SUMMARY_COUNTS]
+        for record in self.records:
+            name = "  " + record["phase"] if record["parent"] else record["phase"]
+            rows.append([name, "%.3f" % record["wall"], "%.3f" % record["cpu"],
+                         format_mib(record["rss"]), format_mib(record["max_rss"])] +
+                        [str(record[count]) if count in record else "" for count in SUMMARY_COUNTS])
+        total = sum(record["wall"] for record in self.records if not record["parent"])
+        rows.append(["total", "%.3f" % total] + [""] * (len(rows[0]) - 2))
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        print("%s metrics (%s)" % (self.script, self.run))
+        for row in rows:
+            cells = [cell.rjust(width) for cell, width in zip(row[1:], widths[1:])]
+            print("  ".join([row[0].ljust(widths[0])] + cells))
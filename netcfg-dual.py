@@ -0,0 +1,178 @@
+### LIBRARIES ###
+from __future__ import division
+from __future__ import print_function
+import os
+import sys
+from artifact_cache import ArtifactCache, cache_key
+from check_artifacts import check_artifacts, print_errors
+from addressing import allocator_from_environ
+from fabric import Fabric
+from fabric_mutation import write_fabric
+from metrics import fabric_counts, metrics_from_environ
+from topo_partitions import write_partitions
+
+
+### CONSTANTS ###
+V4_GENERATOR = "netcfg.py"              # generator of the IPv4 outputs (netcfg, topo script, docker-compose, discovery)
+V6_GENERATOR = "netcfg-v6.py"           # generator of the IPv6 outputs (netcfg, topo script, discovery)
+DELTA_VARIABLES = ["prev_leafs", "prev_netcfg", "mutations"]    # delta modes, run by each generator on its own
+
+
+### FUNCTIONS ###
+
+""" Loads a generator as a module (its main is not run): the module is registered so that its source is part of the
+    cache key
+    Input: file name of the generator (next to this one); name of the module
+"""
+def load_generator(file_name, name):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+    try:
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(name, path)
+        generator = importlib.util.module_from_spec(spec)
+        sys.modules[name] = generator
+        spec.loader.exec_module(generator)
+    except ImportError:                 # Python 2
+        import imp
+        generator = imp.load_source(name, path)
+    return generator
+
+
+""" Writes the outputs of one generator from the fabric model (the phases are recorded inside a phase of the generator)
+    Input: generator; fabric model; recorder of the metrics; name of the phase of the generator; True to write the
+           minified netcfg; True to read the fabric from the spec file; partition of the switches (None if the fabric
+           is not partitioned, IPv4 only); True for dual-stack hosts in the IPv4 topology; True to declare the
+           location and the addresses of the hosts in the netcfg; publishing mode and number of reserved ports of the
+           gRPC ports (IPv4 only)
+"""
+def write_outputs(generator, fabric, metrics, name, minify, spec, partition, dual_stack, locations, publish="ports",
+                  reserve=0):
+    v4 = generator.__name__ == "netcfg_v4"
+    spec_files = [generator.TOPO_SPEC_FILE] if spec else []
+    frame_files = [generator.TOPO_FILE, generator.DOCKER_FILE] if v4 else [generator.TOPO_FILE]
+    with metrics.phase(name):
+        with metrics.phase("begin_of_file", files=frame_files + [generator.DISCOVERY_FILE]):
+            generator.begin_of_file()
+        with metrics.phase("netcfg_config", files=[generator.NETCFG_FILE]):
+            if v4:
+                generator.netcfg_config(fabric, minify, dual_stack, locations)
+            else:
+                generator.netcfg_config(minify, locations)
+        with metrics.phase("topology_config", files=spec_files, appends=[generator.TOPO_FILE]):
+            if v4:
+                generator.topology_config(fabric, spec, dual_stack)
+            else:
+                generator.topology_config(spec)
+        if v4:
+            with metrics.phase("docker_config", appends=[generator.DOCKER_FILE]):
+                generator.docker_config(fabric, partition, publish, reserve)
+        with metrics.phase("host_discovery_script", appends=[generator.DISCOVERY_FILE]):
+            if v4:
+                generator.host_discovery_script(fabric)
+            else:
+                generator.host_discovery_script()
+        with metrics.phase("end_of_file", appends=frame_files):
+            if v4:
+                generator.end_of_file(fabric)
+            else:
+                generator.end_of_file()
+
+
+""" Main funcion """
+if __name__ == "__main__":
+    # per-phase metrics (metrics=<file>, metrics_summary=1)
+    metrics = metrics_from_environ(os.environ, __file__)
+
+    for variable in DELTA_VARIABLES:
+        if variable in os.environ:
+            sys.exit("netcfg-dual.py writes the whole fabric: run " + V4_GENERATOR + " and " + V6_GENERATOR +
+                     " for the netcfg patches (" + variable + ")")
+
+    v4 = load_generator(V4_GENERATOR, "netcfg_v4")
+    v6 = load_generator(V6_GENERATOR, "netcfg_v6")
+
+    leaf = int(os.environ['leafs'])
+    spine = int(os.environ['spines'])
+    host = int(os.environ['hosts'])
+    pods = int(os.environ.get('pods', 1))
+    super_spines = int(os.environ.get('super_spines', 0))
+    minify = os.environ.get('minify', '0') == '1'
+    spec = os.environ.get('topo_spec', '0') == '1'
+    partitions = int(os.environ.get('partitions', 1))
+    layout = os.environ.get('host_layout', 'legacy')
+    dual_stack = os.environ.get('host_stack', 'ipv4') == 'dual'
+    locations = os.environ.get('host_locations', '0') == '1'
+    publish = os.environ.get('grpc_publish', 'ports')
+    reserve = int(os.environ.get('grpc_reserve', 0))
+
+    # one fabric model (names, addresses, ports) for both generators
+    with metrics.phase("fabric") as counts:
+        allocator = allocator_from_environ(os.environ, leaf * pods, spine * pods, host, super_spines)
+        for limit in allocator.exceeded():
+            sys.stderr.write("warning: the " + allocator.name + " addressing does not support " + limit + "\n")
+        fabric = Fabric(leaf, spine, host, allocator, layout, pods, super_spines)
+        counts.update(fabric_counts(fabric))
+    v6.fabric = fabric
+    if publish not in v4.GRPC_PUBLISH_MODES:
+        sys.exit("unknown grpc_publish " + publish + " (" + ", ".join(v4.GRPC_PUBLISH_MODES) + ")")
+    if reserve and publish != "host":
+        try:
+            v4.reserved_ports(fabric, reserve)
+        except ValueError as error:
+            sys.exit(str(error))
+
+    with metrics.phase("runtime_modules"):
+        v4.runtime_modules()
+
+    outputs = []
+    for generator in (v4, v6):
+        outputs += generator.OUTPUTS + [generator.TOPO_SPEC_FILE] if spec else generator.OUTPUTS
+        if partitions > 1:
+            outputs.append(generator.PARTITIONS_FILE)
+
+    # artifact cache: the outputs are restored when nothing they depend on changed
+    cache = ArtifactCache.from_environ(os.environ)
+    if cache is not None:
+        key = cache_key(__file__, [leaf, spine, host, minify, spec, allocator.name, layout, pods, super_spines,
+                                   partitions, dual_stack, locations, publish, reserve])
+        with metrics.phase("cache_restore") as counts:
+            counts["hit"] = cache.restore(key, outputs)
+        if counts["hit"]:
+            print("netcfg cache hit " + key[:12])
+            sys.exit(0)
+        print("netcfg cache miss " + key[:12])
+
+    # parameters of the fabric model, for the changes of the running fabric (--control)
+    with metrics.phase("fabric_file", files=[v4.FABRIC_FILE, v6.FABRIC_FILE]):
+        write_fabric(v4.FABRIC_FILE, fabric)
+        write_fabric(v6.FABRIC_FILE, fabric)
+
+    # partitioned execution: the partitions are run by the topo scripts (--partitions)
+    partition = None
+    if partitions > 1:
+        with metrics.phase("partitions", files=[v4.PARTITIONS_FILE, v6.PARTITIONS_FILE], partitions=partitions):
+            if dual_stack:
+                partition = write_partitions(v4.PARTITIONS_FILE, fabric, partitions, v4.DUAL_STACK_FIELDS,
+                                             v4.dual_stack_params)
+            else:
+                partition = write_partitions(v4.PARTITIONS_FILE, fabric, partitions, v4.HOST_FIELDS, v4.host_params)
+            write_partitions(v6.PARTITIONS_FILE, fabric, partitions, v6.HOST_FIELDS, v6.host_params)
+
+    write_outputs(v4, fabric, metrics, "ipv4", minify, spec, partition, dual_stack, locations, publish, reserve)
+    write_outputs(v6, fabric, metrics, "ipv6", minify, spec, None, dual_stack, locations)
+
+    # consistency of the generated files with each other (check=1): nothing is cached when they are inconsistent
+    if os.environ.get('check', '0') == '1':
+        with metrics.phase("check") as counts:
+            errors = (check_artifacts(v4.NETCFG_FILE, v4.TOPO_FILE, v4.DOCKER_FILE, v4.DISCOVERY_FILE,
+                                      v4.PARTITIONS_FILE if partitions > 1 else None) +
+                      check_artifacts(v6.NETCFG_FILE, v6.TOPO_FILE, None, v6.DISCOVERY_FILE,
+                                      v6.PARTITIONS_FILE if partitions > 1 else None))
+            counts["errors"] = len(errors)
+        if errors:
+            print_errors(errors)
+            sys.exit(1)
+
+    if cache is not None:
+        with metrics.phase("cache_store"):
+            cache.store(key, outputs)
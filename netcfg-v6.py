@@ -1,105 +1,130 @@
 ### LIBRARIES ###
 from __future__ import division
+from __future__ import print_function
 import os
+import shutil
+import sys
+from artifact_cache import ArtifactCache, cache_key
+from check_artifacts import check_artifacts, print_errors
+from addressing import allocator_from_environ
+from fabric import Fabric
+from fabric_delta import FabricDelta
+from fabric_mutation import load_fabric, replay_mutations, write_fabric
+from metrics import fabric_counts, metrics_from_environ
+from netcfg_writer import NetcfgWriter, write_delta_from_file, write_removals
+from templates import Template
+from topo_partitions import write_partitions
+from topo_spec import write_spec
 
 
 ### CONSTANTS ###
-LEAF_SAPCING = 200                      # Grid spacing between leaf switches
-ASCII_CONV = 32                         # Value to convert 'A' to 'a' or 'Z' to 'z'
+NETCFG_FILE = "mininet/netcfg-custom-v6.json"
+TOPO_FILE = "mininet/topo-custom-v6.py"                                     # topo script run in the Mininet container
+DISCOVERY_FILE = "util/mn-host-discovery-v6.sh"                             # host discovery script (one ping per host)
+NETCFG_DELTA_FILE = "mininet/netcfg-custom-v6-delta.json"                   # entries added or changed (to be POSTed to ONOS)
+NETCFG_REMOVALS_FILE = "mininet/netcfg-custom-v6-delta-removals.json"       # keys of the entries removed (to be DELETEd from ONOS)
+TOPO_SPEC_FILE = "mininet/topo-custom-v6-spec.json"                         # fabric read by the topo script (with topo_spec=1)
+PARTITIONS_FILE = "mininet/topo-custom-v6-partitions.json"                  # partitions of the fabric (with partitions=N)
+FABRIC_FILE = "mininet/topo-custom-v6-fabric.json"                          # parameters of the fabric model (for the changes of the running fabric)
+HOST_FIELDS = ("mac", "ipv6", "ipv6_gw")                                    # parameters of the hosts in the spec and partitions files
+RUNTIME_MODULES = ["host_discovery.py", "switch_startup.py", "topo_spec.py", "topo_partitions.py",
+                   "addressing.py", "fabric.py", "fabric_mutation.py", "metrics.py",
+                   "throughput.py", "port_counters.py", "failover.py"]     # modules imported by the topo script (copied to mininet/)
+OUTPUTS = [NETCFG_FILE, TOPO_FILE, FABRIC_FILE, DISCOVERY_FILE]     # files generated (and cached)
 
 
 ### VARIABLES ###
-gridX_Leaf = 200                        # XX cordinates of first leaf switch
-gridY_Leaf = 0                          # YY cordinates of first leaf switch  (to be updated in grid_definition())
-gridX_Spine = 0                         # XX cordinates of first spine switch (to be updated in grid_definition())
-gridY_Spine = 200                       # YY cordinates of first spine switch
-spine_spacing = 0                       # spacing between spine switches (to be updated in grid_definition())
-device_default = '''
-    "device:leaf*": {
+# templates of the entities, compiled once ($name slots, see templates.py)
+device_template = Template('''    "device:$name": {
       "basic": {
-        "managementAddress": "grpc://mininet:5*?device_id=1",
+        "managementAddress": "grpc://mininet:$grpc_port?device_id=1",
         "driver": "stratum-bmv2",
         "pipeconf": "org.onosproject.ngsdn-tutorial",
         "locType": "grid",
-        "gridX": *,
-        "gridY": *
+        "gridX": $grid_x,
+        "gridY": $grid_y
       },
       "fabricDeviceConfig": {
-        "myStationMac": "00:*:00:00:00:%",
-        "mySid": "3:*%:2::",
-        "isSpine": *
+        "myStationMac": "$mac",
+        "mySid": "3:$sid:2::",
+        "isSpine": $is_spine
       }
-    },
-    '''
-port_default = '''
-    "device:leaf*/%": {
+    }''')
+port_template = Template('''    "device:$switch/$number": {
       "interfaces": [
         {
-          "name": "leaf*-%",
-          "ips": ["2001:*:*::ff/64"]
+          "name": "$name",
+          "ips": ["$gateway/$prefix"]
         }
       ]
-    },
-    '''
-host_default = '''
-    "00:00:00:00:00:*%/None": {
+    }''')
+host_template = Template('''    "$mac/None": {
       "basic": {
-        "name": "h*%",
+        "name": "$name",
         "locType": "grid",
-        "gridX": *,
-        "gridY": *
+        "gridX": $grid_x,
+        "gridY": $grid_y
       }
-    },
-    '''
-leaf_default = '''
-        # gRPC port 5*
-        leaf* = self.addSwitch('leaf*', cls=StratumBmv2Switch, cpuport=CPU_PORT)
-        '''
-spine_default = '''
-        # gRPC port 5*
-        spine* = self.addSwitch('spine*', cls=StratumBmv2Switch, cpuport=CPU_PORT)
-        '''
-link_default = '''
-        self.addLink(*, leaf%)'''
-host_config = '''
-        h*% = self.addHost('h*%', cls=IPv6Host, mac="00:00:00:00:00:*$",
-                           ipv6='2001:*:*::%/64', ipv6_gw='2001:*:*::ff')
-        '''
-host_discovery_default = 'util/mn-cmd h*% ping -c 1 2001:*:*::ff > /dev/null'
+    }''')
+located_host_template = Template('''    "$mac/None": {
+      "basic": {
+        "name": "$name",
+        "locations": ["device:$switch/$port"],
+        "ips": ["$ipv6"],
+        "locType": "grid",
+        "gridX": $grid_x,
+        "gridY": $grid_y
+      }
+    }''')
+switch_template = Template('''
+        # gRPC port $grpc_port
+        $name = self.addSwitch('$name', cls=StratumBmv2Switch, cpuport=CPU_PORT)''')
+link_template = Template('''
+        self.addLink($node1, $node2)''')
+host_link_template = Template('''
+        self.addLink($name, $leaf) # port $port''')
+topo_host_template = Template('''
+        $name = self.addHost('$name', cls=IPv6Host, mac="$mac",
+                           ipv6='$ipv6', ipv6_gw='$gateway')''')
+spec_template = Template('''        # Switches, hosts and links are read from $spec
+        from topo_spec import build_from_spec
+        build_from_spec(self, '$spec', StratumBmv2Switch, IPv6Host, cpuport=CPU_PORT)''')
+host_discovery_template = Template('''util/mn-cmd $name ping -c 1 $gateway > /dev/null
+''')
 
 
 ### FUNCTIONS ###
 """ Creates the file and writes the initial section of the frame
 """
 def begin_of_file():
-    # creates the netcfg file
-    netcfg_file = open("mininet/netcfg-custom-v6.json", 'w')
-    netcfg_file.write("{\n")
-    netcfg_file.close()
-
     # creates the topo file
-    topo_file = open("mininet/topo-custom-v6.py", 'w')
+    topo_file = open(TOPO_FILE, 'w')
     topo_file.close()
 
     # creates script for host descovery    
-    host_discovery_file = open("util/mn-host-discovery-v6.sh", 'w')
+    host_discovery_file = open(DISCOVERY_FILE, 'w')
     host_discovery_file.close()
 
 
+""" Copies the modules imported by the topo script next to it (mininet/ is the directory mounted in the Mininet
+    container)
+"""
+def runtime_modules():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for module in RUNTIME_MODULES:
+        shutil.copy2(os.path.join(directory, module), os.path.join("mininet", module))
+
+
 """ Finalizes the general frame of the file and closes it 
 """
 def end_of_file():
-    # ends the netcfg file
-    netcfg_file = open("mininet/netcfg-custom-v6.json", 'a')
-    netcfg_file.write("\n}")
-    netcfg_file.close()
-
     # ends the topo file
-    topo_file = open("mininet/topo-custom-v6.py", 'a')
+    topo_file = open(TOPO_FILE, 'a')
     # reads all the lines from the footer topology_v6 frame to an array and changes a single line to the correct leaf-spine values
     topo_v6_frame_footer_file = open("mininet/mn_scripts/topo_v6_frame_footer.txt", 'r')
     topo_v6_frame_footer = topo_v6_frame_footer_file.readlines()
-    topo_v6_frame_footer[-5] = topo_v6_frame_footer[-5].replace('*', str(leaf)).replace('%', str(spine))
+    description = [i for i, line in enumerate(topo_v6_frame_footer) if "description=" in line][0]
+    topo_v6_frame_footer[description] = topo_v6_frame_footer[description].replace('*', str(fabric.leafs)).replace('%', str(fabric.spines))
     topo_v6_frame_footer = ''.join(topo_v6_frame_footer)
     # writes the read lines to the topo file
     topo_file.write(topo_v6_frame_footer)
@@ -109,225 +134,293 @@ def end_of_file():
 
 
 
-""" Auxiliary function that defines the position of all switches
-    Input: number of leaf switches; number of spine switches
+""" Streams the whole netcfg document (devices, ports and hosts) to the netcfg file
+    Input: True to write the minified document; True to declare the location and the address of the hosts
 """
-def grid_definition():
-    global spine_spacing
-    global offset
-    global gridY_Leaf
-    global gridX_Spine
-    leaf_len = (leaf - 1) * 200
-    spine_spacing = leaf_len // spine
-    offset = spine_spacing // 2
-    gridY_Leaf = gridY_Spine + spine_spacing
-    gridX_Spine = gridX_Leaf + offset
+def netcfg_config(minify=False, locations=False):
+    netcfg = NetcfgWriter(NETCFG_FILE, minify)
+    netcfg.block("devices", devices_config(fabric.switches))
+    netcfg.block("ports", ports_config(fabric.edge_ports()))
+    netcfg.block("hosts", hosts_config(fabric.host_list, locations))
+    netcfg.close()
+
+
+""" Writes the netcfg patch files that turn the netcfg of a previous fabric into the netcfg of the new one
+    Only the entries added or changed are rendered, so the cost follows the size of the change, not of the fabric.
+    Input: previous fabric model; True to write the minified patch; True to also update the grid coordinates of the
+           existing entries; True to declare the location and the address of the hosts
+"""
+def netcfg_delta(old_fabric, minify=False, relayout=False, locations=False):
+    delta = FabricDelta(old_fabric, fabric, relayout)
+
+    netcfg = NetcfgWriter(NETCFG_DELTA_FILE, minify)
+    netcfg.block("devices", devices_config(delta.switches_added + delta.switches_changed))
+    netcfg.block("ports", ports_config(delta.ports_added + delta.ports_changed))
+    netcfg.block("hosts", hosts_config(delta.hosts_added + delta.hosts_changed, locations))
+    netcfg.close()
+
+    write_removals(NETCFG_REMOVALS_FILE, [("devices", [device_key(switch) for switch in delta.switches_removed]),
+                                          ("ports", [port_key(port) for port in delta.ports_removed]),
+                                          ("hosts", [host_key(host) for host in delta.hosts_removed] +
+                                                    moved_host_keys(old_fabric, delta.hosts_changed))])
+    return delta.summary()
+
+
+""" Writes the netcfg patch files that turn a previously generated netcfg file into the netcfg of the fabric
+    Input: previous netcfg file; True to write the minified patch; True to also update the grid coordinates of the
+           existing entries; True to declare the location and the address of the hosts
+"""
+def netcfg_delta_from_file(previous_file, minify=False, relayout=False, locations=False):
+    counts = write_delta_from_file(previous_file, [("devices", devices_config(fabric.switches)),
+                                                   ("ports", ports_config(fabric.edge_ports())),
+                                                   ("hosts", hosts_config(fabric.host_list, locations))],
+                                   NETCFG_DELTA_FILE, NETCFG_REMOVALS_FILE, minify, relayout)
+    return ", ".join("%s +%d ~%d -%d" % ((name,) + count) for name, count in counts.items())
 
 
 """ Deals with the configuration of the configuration block of each device
+    Input: switches of the fabric model
+    Output: yields the text of each device entry
 """
-def devices_config():
-    global gridX_Leaf
-    global gridX_Spine
-    i = 1
-    # begining of the devices block
-    netcfg_file = open("mininet/netcfg-custom-v6.json", 'a')
-    netcfg_file.write('  "devices": {')
-
-    while i <= leaf + spine:
-        new_device = device_default.split('\n')
-        new_device[3] = new_device[3].replace('*', str(i).zfill(4))
-        if i <= leaf: 
-            new_device[1] = new_device[1].replace('*', str(i))
-            new_device[7] = new_device[7].replace('*', str(gridX_Leaf))
-            new_device[8] = new_device[8].replace('*', str(gridY_Leaf))
-            new_device[11] = new_device[11].replace('*', 'aa').replace('%', str(i).zfill(2))
-            new_device[12] = new_device[12].replace('*', '1').replace('%', str(i).zfill(2))
-            new_device[13] = new_device[13].replace('*', 'false')
-            gridX_Leaf += LEAF_SAPCING # update XX coordinates of next leaf (YY not need beacuse it is always the same)
-        else:
-            new_device[1] = new_device[1].replace('leaf', 'spine').replace('*', str(i-leaf))
-            new_device[7] = new_device[7].replace('*', str(gridX_Spine))
-            new_device[8] = new_device[8].replace('*', str(gridY_Spine))
-            new_device[11] = new_device[11].replace('*', 'bb').replace('%', str(i-leaf).zfill(2))
-            new_device[12] = new_device[12].replace('*', '2').replace('%', str(i-leaf).zfill(2))
-            new_device[13] = new_device[13].replace('*', 'true')
-            gridX_Spine += spine_spacing # update XX coordinates of next spine (YY not need beacuse it is always the same)
-
-        new_device = '\n'.join(new_device[:-1]) # removes last \n (space between devices config) and converts the array back to a string
-        if i == leaf + spine: # removes the ',' in the last device config and closes the bracket '}' on the whole device block
-            new_device = new_device[:-1] + '\n  },\n'
-        i += 1
-        netcfg_file.write(new_device)
-
-    netcfg_file.close()
+def devices_config(switches):
+    render = device_template.render
+    for switch in switches:
+        yield render({"name": switch.name, "grpc_port": switch.grpc_port, "grid_x": switch.grid_x,
+                      "grid_y": switch.grid_y, "mac": switch.mac.lower(), "sid": switch.ipv6_sid,
+                      "is_spine": 'false' if switch.kind == "leaf" else 'true'})
 
 
 """ Deals with the configuration of the configuration block of each port interface
+    Input: edge ports (attached to hosts) of the fabric model
+    Output: yields the text of each port entry
 """
-def ports_config():
-    i = 1
-    # begining of the devices block
-    netcfg_file = open("mininet/netcfg-custom-v6.json", 'a')
-    netcfg_file.write('  "ports": {')
-
-    while i <= leaf:
-        j = 1
-        while j <= host:
-            new_port = port_default.split('\n')
-            new_port[1] = new_port[1].replace('*', str(i)).replace('%', str(spine + j))
-            new_port[4] = new_port[4].replace('*', str(i)).replace('%', str(spine + j))
-            new_port[5] = new_port[5].replace('*', str(i))
-            new_port = '\n'.join(new_port[:-1]) # removes last \n (space between ports config) and converts the array back to a string
-            if i == leaf and j == host: # removes the ',' in the last port config and closes the bracket '}' on the whole port block
-                new_port = new_port[:-1] + '\n  },\n'
-            j += 1
-            netcfg_file.write(new_port)
-
-        i += 1
-
-    netcfg_file.close()
+def ports_config(ports):
+    render = port_template.render
+    for port in ports:
+        yield render({"switch": port.switch.name, "number": port.number, "name": port.name,
+                      "gateway": port.peer.ipv6_gateway, "prefix": port.peer.ipv6_prefix})
 
 
 """ Deals with the configuration of the configuration block of each host
+    Input: hosts of the fabric model; True to declare the location (leaf port) and the address of the hosts, so that
+           ONOS knows them without the host discovery
+    Output: yields the text of each host entry
+"""
+def hosts_config(hosts, locations=False):
+    if locations:
+        render = located_host_template.render
+        for host in hosts:
+            yield render({"mac": host.mac, "name": host.name, "switch": host.leaf.name, "port": host.port,
+                          "ipv6": host.ipv6, "grid_x": host.grid_x, "grid_y": host.grid_y})
+        return
+    render = host_template.render
+    for host in hosts:
+        yield render({"mac": host.mac, "name": host.name, "grid_x": host.grid_x, "grid_y": host.grid_y})
+
+
+""" Returns the parameters of a host in the spec and partitions files (in the order of HOST_FIELDS)
 """
-def hosts_config():
-    i = 1
-    gridX = 200
-    gridY = gridY_Leaf + 100
-    # begining of the devices block
-    netcfg_file = open("mininet/netcfg-custom-v6.json", 'a')
-    netcfg_file.write('  "hosts": {')
-
-    while i <= leaf:
-        j = 1
-        host_id = ord('A') # letter to identify each host on a given leaf
-        while j <= host:
-            new_host = host_default.split('\n')
-            new_host[1] = new_host[1].replace('*', str(i)).replace('%', chr(host_id))
-            new_host[3] = new_host[3].replace('*', str(i)).replace('%', chr(host_id + ASCII_CONV))
-
-            # Math to place the hosts in the correct grid position
-            if (j%3 == 1): new_host[5] = new_host[5].replace('*', str(gridX-50)) # 1st column
-            elif (j%3 == 2): new_host[5] = new_host[5].replace('*', str(gridX)) # 2nd column
-            else: new_host[5] = new_host[5].replace('*', str(gridX+50)) # 3rd column
-            if (j/3 <= 1): new_host[6] = new_host[6].replace('*', str(gridY)) # 1st line
-            else: new_host[6] = new_host[6].replace('*', str(gridY + 100)) # 2nd line
-
-            new_host = '\n'.join(new_host[:-1]) # removes last \n (space between hosts config) and converts the array back to a string
-            if i == leaf and j == host: # removes the ',' in the last host config and closes the bracket '}' on the whole host block
-                new_host = new_host[:-1] + '\n  }'
-            j += 1
-            host_id += 1
-            netcfg_file.write(new_host)
-
-        gridX += LEAF_SAPCING
-        i += 1
-
-    netcfg_file.close()
+def host_params(host):
+    return (host.mac, host.ipv6 + "/" + str(host.ipv6_prefix), host.ipv6_gateway)
 
 
 """ Deals with the topology of the mininet (second script generated)
 """
-def topology_config():
-    i = 1
-
+def topology_config(spec=False):
     # open the toppology file created in the "begin_of_file()" funtion
-    topo_file = open("mininet/topo-custom-v6.py", 'a')
+    topo_file = open(TOPO_FILE, 'a')
     # reads all the lines from the header topology_v6 frame to an array
     topo_v6_frame_header_file = open("mininet/mn_scripts/topo_v6_frame_header.txt", 'r')
     topo = topo_v6_frame_header_file.readlines()
     topo_v6_frame_header_file.close()
     # replaces the line with "*x% fabric topology with IPv6 hosts" to the correct values of leaf and spine (JUST PRESENTABLE)
-    topo[-5] = topo[-5].replace('*', str(leaf)).replace('%', str(spine))
+    topo[-5] = topo[-5].replace('*', str(fabric.leafs)).replace('%', str(fabric.spines))
     # converts the array back to a string
     topo = ''.join(topo)
     topo_file.write(topo)
+
+    # compact topology: the fabric is written to the spec file and the topology loops over it
+    if spec:
+        write_spec(TOPO_SPEC_FILE, fabric, HOST_FIELDS, host_params)
+        topo_file.write(spec_template.render({"spec": os.path.basename(TOPO_SPEC_FILE)}))
+        topo_file.close()
+        return
     
     # leaves configuration
     topo_file.write('        # Leaves')
-    while i <= leaf:
-        new_leaf = leaf_default.split('\n')
-        new_leaf[1] = new_leaf[1].replace('*', str(i).zfill(4))
-        new_leaf[2] = new_leaf[2].replace('*', str(i))
-        # converts the array back to a string
-        new_leaf = '\n'.join(new_leaf[:-1])
-        topo_file.write(new_leaf)
-        i += 1
-    
+    topo_file.write(switch_template.render_all(switch_values(fabric.leaf_switches)))
+
     # spines configuration
     topo_file.write('\n\n        # Spines')
-    while i <= leaf + spine:
-        new_spine = spine_default.split('\n')
-        new_spine[1] = new_spine[1].replace('*', str(i).zfill(4))
-        new_spine[2] = new_spine[2].replace('*', str(i-leaf))
-        # converts the array back to a string
-        new_spine = '\n'.join(new_spine[:-1])
-        topo_file.write(new_spine)
-        i += 1
-
-    # links configuration
+    topo_file.write(switch_template.render_all(switch_values(fabric.spine_switches)))
+
+    # super spines configuration (3-tier fabrics only)
+    if fabric.super_spine_switches:
+        topo_file.write('\n\n        # Super spines')
+        topo_file.write(switch_template.render_all(switch_values(fabric.super_spine_switches)))
+
+    # links configuration (the switch links come first in the fabric)
     topo_file.write('\n\n        # Switch Links')
-    i = 1
-    while i <= spine:
-        j = 1
-        while j <= leaf:
-            new_link = link_default.replace('*', 'spine' + str(i)).replace('%', str(j))
-            j += 1
-            topo_file.write(new_link)
-        i += 1
-    
-    # host configuration
-    i = 1
-    while i <= leaf:
-        topo_file.write('\n\n        # IPv6 hosts attached to leaf ' + str(i))
-        j = 1
-        host_id = ord('A') # letter to identify each host on a given leaf
-        new_link = ''
-        while j <= host:
-            new_host = host_config.split('\n')
-            new_host[1] = new_host[1].replace('*', str(i)).replace('%', chr(host_id + ASCII_CONV)).replace('$', chr(host_id))
-            new_host[2] = new_host[2].replace('*', str(i)).replace('%', chr(host_id + ASCII_CONV))
-            new_link += link_default.replace('*', 'h' + str(i) + chr(host_id + ASCII_CONV)).replace('%', str(i)) + ' # port ' + str(spine + j)
-            new_host = '\n'.join(new_host[:-1])
-            topo_file.write(new_host)
-            j += 1
-            host_id += 1
-        topo_file.write(new_link)
-        i += 1
-    
+    topo_file.write(link_template.render_all({"node1": link.node1.name, "node2": link.node2.name}
+                                             for link in fabric.switch_links()))
+
+    # host configuration: the hosts of each leaf, then their links
+    for switch in fabric.leaf_switches:
+        topo_file.write('\n\n        # IPv6 hosts attached to leaf ' + str(switch.number))
+        topo_file.write(topo_host_template.render_all(
+            {"name": host.name, "mac": host.mac, "ipv6": host.ipv6 + '/' + str(host.ipv6_prefix),
+             "gateway": host.ipv6_gateway} for host in switch.hosts))
+        topo_file.write(host_link_template.render_all({"name": host.name, "leaf": switch.name, "port": host.port}
+                                                      for host in switch.hosts))
+
+
     # closes the file after everything is written
     topo_file.close()
 
 
+""" Yields the values of the topology template of each switch
+    Input: leaf, spine or super spine switches of the fabric
+"""
+def switch_values(switches):
+    for switch in switches:
+        yield {"grpc_port": switch.grpc_port, "name": switch.name}
+
+
 """ Generates a script to automate the host location discovery in mininet
 """
 def host_discovery_script():
-    host_discovery_file = open("util/mn-host-discovery-v6.sh", 'a')
-    i = 1
+    host_discovery_file = open(DISCOVERY_FILE, 'a')
+    host_discovery_file.write(host_discovery_template.render_all({"name": host.name, "gateway": host.ipv6_gateway}
+                                                                 for host in fabric.host_list))
+    host_discovery_file.close()
+
 
-    while(i<=leaf):
-        j = 1
-        host_id = ord('a') # letter to identify each host on a given leaf
-        while(j<=host):
-            new_host_discovery = host_discovery_default.replace('*', str(i)).replace('%', chr(host_id))
-            host_id += 1
-            j += 1
-            host_discovery_file.write(new_host_discovery + '\n')
-        i += 1
+""" Returns the previous netcfg keys of the changed hosts whose key changed (e.g. a new MAC address)
+    Input: previous fabric model; changed hosts (new fabric)
+"""
+def moved_host_keys(old_fabric, hosts):
+    keys = []
+    for host in hosts:
+        old_key = host_key(old_fabric.lookup(host.name))
+        if old_key != host_key(host):
+            keys.append(old_key)
+    return keys
+
+
+""" Auxiliary functions that return the netcfg keys of a device, an edge port and a host
+"""
+def device_key(switch):
+    return 'device:' + switch.name
+
+def port_key(port):
+    return 'device:' + port.switch.name + '/' + str(port.number)
+
+def host_key(host):
+    return host.mac + '/None'
 
 
 """ Main funcion
 """
 if __name__ == "__main__":
+    # per-phase metrics (metrics=<file>, metrics_summary=1)
+    metrics = metrics_from_environ(os.environ, __file__)
+    locations = os.environ.get('host_locations', '0') == '1'
+
+    # mutations mode: only the netcfg patch files of the changes of the running fabric are written (the changes logged
+    # by the topo script are replayed on the generated fabric)
+    if 'mutations' in os.environ:
+        with metrics.phase("fabric") as counts:
+            old_fabric = load_fabric(FABRIC_FILE)
+            fabric = load_fabric(FABRIC_FILE)
+            counts["mutations"] = replay_mutations(fabric, os.environ['mutations'])
+            counts.update(fabric_counts(fabric))
+        with metrics.phase("netcfg_delta", files=[NETCFG_DELTA_FILE, NETCFG_REMOVALS_FILE]):
+            print(netcfg_delta(old_fabric, os.environ.get('minify', '0') == '1', locations=locations))
+        sys.exit(0)
+
     leaf = int(os.environ['leafs'])
     spine = int(os.environ['spines'])
     host = int(os.environ['hosts'])
-    grid_definition()
-    begin_of_file()
-    devices_config()
-    ports_config()
-    hosts_config()
-    topology_config()
-    host_discovery_script()
-    end_of_file()
+    pods = int(os.environ.get('pods', 1))
+    super_spines = int(os.environ.get('super_spines', 0))
+    minify = os.environ.get('minify', '0') == '1'
+    relayout = os.environ.get('relayout', '0') == '1'
+    spec = os.environ.get('topo_spec', '0') == '1'
+    partitions = int(os.environ.get('partitions', 1))
+    layout = os.environ.get('host_layout', 'legacy')
+    with metrics.phase("fabric") as counts:
+        allocator = allocator_from_environ(os.environ, leaf * pods, spine * pods, host, super_spines)
+        for limit in allocator.exceeded():
+            sys.stderr.write("warning: the " + allocator.name + " addressing does not support " + limit + "\n")
+        fabric = Fabric(leaf, spine, host, allocator, layout, pods, super_spines)
+        counts.update(fabric_counts(fabric))
+
+    # delta mode: only the netcfg patch files are written (against a previous netcfg file or previous dimensions)
+    if 'prev_netcfg' in os.environ:
+        with metrics.phase("netcfg_delta", files=[NETCFG_DELTA_FILE, NETCFG_REMOVALS_FILE]):
+            print(netcfg_delta_from_file(os.environ['prev_netcfg'], minify, relayout, locations))
+        sys.exit(0)
+    if 'prev_leafs' in os.environ:
+        old_leaf, old_spine, old_host = (int(os.environ['prev_leafs']), int(os.environ.get('prev_spines', spine)),
+                                         int(os.environ.get('prev_hosts', host)))
+        old_pods = int(os.environ.get('prev_pods', pods))
+        old_super_spines = int(os.environ.get('prev_super_spines', super_spines))
+        old_allocator = allocator_from_environ(os.environ, old_leaf * old_pods, old_spine * old_pods, old_host,
+                                               old_super_spines)
+        old_fabric = Fabric(old_leaf, old_spine, old_host, old_allocator, layout, old_pods, old_super_spines)
+        with metrics.phase("netcfg_delta", files=[NETCFG_DELTA_FILE, NETCFG_REMOVALS_FILE]):
+            print(netcfg_delta(old_fabric, minify, relayout, locations))
+        sys.exit(0)
+
+    with metrics.phase("runtime_modules"):
+        runtime_modules()
+
+    outputs = OUTPUTS + [TOPO_SPEC_FILE] if spec else OUTPUTS
+    if partitions > 1:
+        outputs = outputs + [PARTITIONS_FILE]
+
+    # artifact cache: the outputs are restored when nothing they depend on changed
+    cache = ArtifactCache.from_environ(os.environ)
+    if cache is not None:
+        key = cache_key(__file__, [leaf, spine, host, minify, spec, allocator.name, layout, pods, super_spines,
+                                   partitions, locations])
+        with metrics.phase("cache_restore") as counts:
+            counts["hit"] = cache.restore(key, outputs)
+        if counts["hit"]:
+            print("netcfg cache hit " + key[:12])
+            sys.exit(0)
+        print("netcfg cache miss " + key[:12])
+
+    # parameters of the fabric model, for the changes of the running fabric (--control)
+    with metrics.phase("fabric_file", files=[FABRIC_FILE]):
+        write_fabric(FABRIC_FILE, fabric)
+
+    # partitioned execution: the partitions are run by the topo script (--partitions)
+    if partitions > 1:
+        with metrics.phase("partitions", files=[PARTITIONS_FILE], partitions=partitions):
+            write_partitions(PARTITIONS_FILE, fabric, partitions, HOST_FIELDS, host_params)
+
+    with metrics.phase("begin_of_file", files=[TOPO_FILE, DISCOVERY_FILE]):
+        begin_of_file()
+    with metrics.phase("netcfg_config", files=[NETCFG_FILE]):
+        netcfg_config(minify, locations)
+    with metrics.phase("topology_config", files=[TOPO_SPEC_FILE] if spec else [], appends=[TOPO_FILE]):
+        topology_config(spec)
+    with metrics.phase("host_discovery_script", appends=[DISCOVERY_FILE]):
+        host_discovery_script()
+    with metrics.phase("end_of_file", appends=[TOPO_FILE]):
+        end_of_file()
+
+    # consistency of the generated files with each other (check=1): nothing is cached when they are inconsistent
+    if os.environ.get('check', '0') == '1':
+        with metrics.phase("check") as counts:
+            errors = check_artifacts(NETCFG_FILE, TOPO_FILE, None, DISCOVERY_FILE,
+                                     PARTITIONS_FILE if partitions > 1 else None)
+            counts["errors"] = len(errors)
+        if errors:
+            print_errors(errors)
+            sys.exit(1)
+
+    if cache is not None:
+        with metrics.phase("cache_store"):
+            cache.store(key, outputs)
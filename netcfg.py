@@ -1,31 +1,40 @@
 ### LIBRARIES ###
 from __future__ import division
+from __future__ import print_function
 import os
+import shutil
+import sys
+from artifact_cache import ArtifactCache, cache_key
+from check_artifacts import check_artifacts, print_errors
+from addressing import GRPC_MAX_PORT, allocator_from_environ
+from fabric import Fabric
+from fabric_delta import FabricDelta
+from fabric_mutation import load_fabric, replay_mutations, write_fabric
+from metrics import fabric_counts, metrics_from_environ
+from netcfg_writer import NetcfgWriter, write_delta_from_file, write_removals
+from topo_partitions import write_partitions
+from topo_spec import write_spec
 
 
 ### CONSTANTS ###
-DEVICE_FRAME_SIZE = 18                  # Number of lines until a given line occurs again in the device frame block
-PORT_FRAME_SIZE = 13                    # Number of lines until a given line occurs again in the port frame block
-HOST_FRAME_SIZE = 8                     # Number of lines until a given line occurs again in the host frame block
-LEAF_IPV4_LOOPBACK = "192.168.1."       # IPv4 loopback address of leaf switches will follow the schema "192.168.1.X" (where X=number of the switch)
-SPINE_IPV4_LOOPBACK = "192.168.2."      # IPv4 loopback address of spine switches will follow the schema "192.168.2.X" (where X=number of the switch)
-LEAF_MAC = "00:AA:00:00:00:"            # MAC address of the leaf switches follow the schema "00:AA:00:00:00:XX" (where XX=number of the switch)
-SPINE_MAC = "00:BB:00:00:00:"           # MAC address of the spine switches follow the schema "00:BB:00:00:00:XX" (where XX=number of the switch)
-LEAF_MPLS_ID = "1"                      # MPLS ID of leaf switch follow the schema "1XX" (where XX=number of switch)
-SPINE_MPLS_ID = "2"                     # MPLS ID of spine switch follow the schema "2XX" (where XX=number of switch)
-LEAF_SAPCING = 200                      # Grid spacing between leaf switches
-HOST_GATEWAY = "172.16.X.254"           # Hosts subnets will follow the schema "172.16.X.Y" (where X=number of switch; Y=interface [in this case gw=254])
-HOST_MAC = "00:00:00:00:00:X"           # Hosts MAC will follow the schema "00:00:00:00:00:X" (where X=number of host)
-HOST_IP = "172.16.X.Y"                  # Hosts IP will follow the schema "172.16.X.Y" (where X=number of leaf and Y=number of host)
 START_LEAF_BLOCK = 98                   # Number of the line where the leaf block configuration starts for the mininet topology configuration file
-ASCII_CONV = 32                         # Value to convert 'A' to 'a' or 'Z' to 'z'
-
-### VARIABLES ###
-gridX_Leaf = 200                        # XX cordinates of first leaf switch
-gridY_Leaf = 0                          # YY cordinates of first leaf switch  (to be updated in grid_definition())
-gridX_Spine = 0                         # XX cordinates of first spine switch (to be updated in grid_definition())
-gridY_Spine = 200                       # TT cordinates of first spine switch
-spine_spacing = 0                       # spacing between spine switches (to be updated in grid_definition())
+NETCFG_FILE = "mininet/netcfg-custom.json"
+TOPO_FILE = "mininet/topo-custom.py"                                    # topo script run in the Mininet container
+DOCKER_FILE = "docker-compose.yml"                                      # services of the tutorial (with the gRPC ports of the switches)
+DISCOVERY_FILE = "util/mn-host-discovery.sh"                            # host discovery script (one ping per host)
+NETCFG_DELTA_FILE = "mininet/netcfg-custom-delta.json"                  # entries added or changed (to be POSTed to ONOS)
+NETCFG_REMOVALS_FILE = "mininet/netcfg-custom-delta-removals.json"      # keys of the entries removed (to be DELETEd from ONOS)
+TOPO_SPEC_FILE = "mininet/topo-custom-spec.json"                        # fabric read by the topo script (with topo_spec=1)
+PARTITIONS_FILE = "mininet/topo-custom-partitions.json"                 # partitions of the fabric (with partitions=N)
+FABRIC_FILE = "mininet/topo-custom-fabric.json"                         # parameters of the fabric model (for the changes of the running fabric)
+HOST_FIELDS = ("mac", "ip", "gw", "vlan")                               # parameters of the hosts in the spec and partitions files
+DUAL_STACK_FIELDS = HOST_FIELDS + ("ipv6", "ipv6_gw")                   # parameters of the dual-stack hosts (host_stack=dual)
+RUNTIME_MODULES = ["host_discovery.py", "switch_startup.py", "topo_spec.py", "topo_partitions.py",
+                   "addressing.py", "fabric.py", "fabric_mutation.py", "metrics.py",
+                   "throughput.py", "port_counters.py", "failover.py"]    # modules imported by the topo script (copied to mininet/)
+OUTPUTS = [NETCFG_FILE, TOPO_FILE, FABRIC_FILE, DOCKER_FILE, DISCOVERY_FILE]     # files generated (and cached)
+GRPC_PUBLISH_MODES = ["ports", "range", "host"]                         # publishing of the gRPC ports (grpc_publish): one mapping per switch, contiguous ranges, or the host network
+RESERVED_COMMENT = "      # reserved for the switches added to the running fabric\n"     # precedes the reserved gRPC ports (grpc_reserve=N)
 
 
 ### FUNCTIONS ###
@@ -33,44 +42,46 @@ spine_spacing = 0                       # spacing between spine switches (to be
 """ Creates the file and writes the initial section of the frame
 """
 def begin_of_file():
-    file = open("mininet/netcfg-custom.json", 'w')
-    file.write("{\n")
-    file.close()
-
-    topo_file = open("mininet/topo-custom.py", 'w')
+    topo_file = open(TOPO_FILE, 'w')
     f_topo_v4_frame = open("mininet/mn_scripts/topo_v4_frame_header.txt", 'r')
     topo_v4_frame = f_topo_v4_frame.read()
     topo_file.write(topo_v4_frame)
     topo_file.close()
     f_topo_v4_frame.close()
 
-    docker_file = open("docker-compose.yml", 'w')
+    docker_file = open(DOCKER_FILE, 'w')
     f_docker_frame = open("mininet/mn_scripts/docker_frame_header.txt", 'r')
     docker_frame = f_docker_frame.read()
     docker_file.write(docker_frame)
     docker_file.close()
     f_docker_frame.close()
 
-    host_discovery_file = open("util/mn-host-discovery.sh", 'w')
+    host_discovery_file = open(DISCOVERY_FILE, 'w')
     host_discovery_file.close()
 
 
-""" Finalizes the general frame of the file and closes it 
+""" Copies the modules imported by the topo script next to it (mininet/ is the directory mounted in the Mininet
+    container)
 """
-def end_of_file(leaf, spine):
-    file = open("mininet/netcfg-custom.json", 'a')
-    file.write("}")
-    file.close()
+def runtime_modules():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for module in RUNTIME_MODULES:
+        shutil.copy2(os.path.join(directory, module), os.path.join("mininet", module))
 
-    topo_file = open("mininet/topo-custom.py", 'a')
+
+""" Finalizes the general frame of the file and closes it 
+"""
+def end_of_file(fabric):
+    topo_file = open(TOPO_FILE, 'a')
     f_topo_v4_frame = open("mininet/mn_scripts/topo_v4_frame_footer.txt", 'r')
     topo_v4_frame = f_topo_v4_frame.readlines()
-    topo_v4_frame[16] = "        description='Mininet topology script for " + str(leaf) + 'x' + str(spine) + " fabric with stratum_bmv2 and IPv4 hosts')\n"
+    description = [i for i, line in enumerate(topo_v4_frame) if "description=" in line][0]
+    topo_v4_frame[description] = "        description='Mininet topology script for " + str(fabric.leafs) + 'x' + str(fabric.spines) + " fabric with stratum_bmv2 and IPv4 hosts')\n"
     topo_file.writelines(topo_v4_frame)
     topo_file.close()
     f_topo_v4_frame.close()
 
-    docker_file = open("docker-compose.yml", 'a')
+    docker_file = open(DOCKER_FILE, 'a')
     f_docker_frame = open("mininet/mn_scripts/docker_frame_footer.txt", 'r')
     docker_frame = f_docker_frame.read()
     docker_file.write(docker_frame)
@@ -78,252 +89,319 @@ def end_of_file(leaf, spine):
     f_docker_frame.close()
 
 
-""" Deals with the configuration of the configuration block of each device
+""" Streams the whole netcfg document (devices, ports and hosts) to the netcfg file
+    Input: fabric model; True to write the minified document; True if the hosts are dual-stack; True to declare the
+           location and the addresses of the hosts
+"""
+def netcfg_config(fabric, minify=False, dual_stack=False, locations=False):
+    netcfg = NetcfgWriter(NETCFG_FILE, minify)
+    netcfg.block("devices", devices_config(fabric.switches))
+    netcfg.block("ports", ports_config(fabric.edge_ports(), dual_stack))
+    netcfg.block("hosts", hosts_config(fabric.host_list, locations, dual_stack))
+    netcfg.close()
+
+
+""" Writes the netcfg patch files that turn the netcfg of a previous fabric into the netcfg of the new one
+    Only the entries added or changed are rendered, so the cost follows the size of the change, not of the fabric.
+    Input: previous fabric model; fabric model; True to write the minified patch; True to also update the grid
+           coordinates of the existing entries; True if the hosts are dual-stack; True to declare the location and the
+           addresses of the hosts
+"""
+def netcfg_delta(old_fabric, fabric, minify=False, relayout=False, dual_stack=False, locations=False):
+    delta = FabricDelta(old_fabric, fabric, relayout)
+
+    netcfg = NetcfgWriter(NETCFG_DELTA_FILE, minify)
+    netcfg.block("devices", devices_config(delta.switches_added + delta.switches_changed))
+    netcfg.block("ports", ports_config(delta.ports_added + delta.ports_changed, dual_stack))
+    netcfg.block("hosts", hosts_config(delta.hosts_added + delta.hosts_changed, locations, dual_stack))
+    netcfg.close()
+
+    write_removals(NETCFG_REMOVALS_FILE, [("devices", [device_key(switch) for switch in delta.switches_removed]),
+                                          ("ports", [port_key(port) for port in delta.ports_removed]),
+                                          ("hosts", [host_key(host) for host in delta.hosts_removed] +
+                                                    moved_host_keys(old_fabric, delta.hosts_changed))])
+    return delta.summary()
+
+
+""" Writes the netcfg patch files that turn a previously generated netcfg file into the netcfg of the fabric
+    Input: previous netcfg file; fabric model; True to write the minified patch; True to also update the grid
+           coordinates of the existing entries; True if the hosts are dual-stack; True to declare the location and the
+           addresses of the hosts
 """
-def devices_config(leaf, spine):
-    global gridX_Leaf
-    global gridX_Spine
-    i = 1
-    i_dev = 2
-    i_gRPC = 4
-    i_gridX = 8
-    i_gridY = 9
-    i_dev_name = 12
-    i_ipv4_node_sid = 13
-    i_ipv4_lb = 14
-    i_mac = 15
-    i_er = 16
-
-    f_device_frame = open("mininet/mn_scripts/device_frame.txt", 'r')
-    device_frame = f_device_frame.read()
-    f_device_frame.close()
-
-    file = open("mininet/netcfg-custom.json", 'a')
-    file.write('  "devices": {\n')
-    file.close()
-
-    while(i <= leaf+spine):
-        file = open("mininet/netcfg-custom.json", 'a')
-        file.write(device_frame + ',\n')
-        file.close()
-
-        if(i <= leaf):
-            replace_line("mininet/netcfg-custom.json", i_dev, '    "device:leaf' + str(i) + '": {\n')
-            replace_line("mininet/netcfg-custom.json", i_gRPC, '        "managementAddress": "grpc://mininet:5' + str(i).zfill(4) + '?device_id=1",\n')
-            replace_line("mininet/netcfg-custom.json", i_gridX, '        "gridX": ' + str(gridX_Leaf) + ',\n')
-            replace_line("mininet/netcfg-custom.json", i_gridY, '        "gridY": ' + str(gridY_Leaf) + '\n')
-            replace_line("mininet/netcfg-custom.json", i_dev_name, '        "name": "leaf' + str(i) + '",\n')
-            replace_line("mininet/netcfg-custom.json", i_ipv4_node_sid, '        "ipv4NodeSid": ' + LEAF_MPLS_ID + str(i).zfill(2) + ',\n')
-            replace_line("mininet/netcfg-custom.json", i_ipv4_lb, '        "ipv4Loopback": "' + LEAF_IPV4_LOOPBACK + str(i) + '",\n')
-            replace_line("mininet/netcfg-custom.json", i_mac, '        "routerMac": "' + LEAF_MAC + str(i).zfill(2) + '",\n')
-            gridX_Leaf = gridX_Leaf + LEAF_SAPCING
+def netcfg_delta_from_file(previous_file, fabric, minify=False, relayout=False, dual_stack=False, locations=False):
+    counts = write_delta_from_file(previous_file, [("devices", devices_config(fabric.switches)),
+                                                   ("ports", ports_config(fabric.edge_ports(), dual_stack)),
+                                                   ("hosts", hosts_config(fabric.host_list, locations, dual_stack))],
+                                   NETCFG_DELTA_FILE, NETCFG_REMOVALS_FILE, minify, relayout)
+    return ", ".join("%s +%d ~%d -%d" % ((name,) + count) for name, count in counts.items())
 
-        else:
-            replace_line("mininet/netcfg-custom.json", i_dev, '    "device:spine' + str(i-leaf) + '": {\n')
-            replace_line("mininet/netcfg-custom.json", i_gRPC, '        "managementAddress": "grpc://mininet:5' + str(i).zfill(4) + '?device_id=1",\n')
-            replace_line("mininet/netcfg-custom.json", i_gridX, '        "gridX": ' + str(gridX_Spine) + ',\n')
-            replace_line("mininet/netcfg-custom.json", i_gridY, '        "gridY": ' + str(gridY_Spine) + '\n')
-            replace_line("mininet/netcfg-custom.json", i_dev_name, '        "name": "spine' + str(i-leaf) + '",\n')
-            replace_line("mininet/netcfg-custom.json", i_ipv4_node_sid, '        "ipv4NodeSid": ' + SPINE_MPLS_ID + str(i-leaf).zfill(2) + ',\n')
-            replace_line("mininet/netcfg-custom.json", i_ipv4_lb, '        "ipv4Loopback": "' + SPINE_IPV4_LOOPBACK + str(i-leaf) + '",\n')
-            replace_line("mininet/netcfg-custom.json", i_mac, '        "routerMac": "' + SPINE_MAC + str(i-leaf).zfill(2) + '",\n')
-            replace_line("mininet/netcfg-custom.json", i_er, '        "isEdgeRouter": false,\n')
-            gridX_Spine = gridX_Spine + spine_spacing
-            
-            if(i == leaf+spine):    # last loop of the cicle                
-                remove_last_char("mininet/netcfg-custom.json")
-        
-        i = i + 1
-        i_dev = i_dev + DEVICE_FRAME_SIZE
-        i_gRPC = i_gRPC + DEVICE_FRAME_SIZE
-        i_gridX = i_gridX + DEVICE_FRAME_SIZE
-        i_gridY = i_gridY + DEVICE_FRAME_SIZE
-        i_dev_name = i_dev_name + DEVICE_FRAME_SIZE
-        i_ipv4_node_sid = i_ipv4_node_sid + DEVICE_FRAME_SIZE
-        i_ipv4_lb = i_ipv4_lb + DEVICE_FRAME_SIZE
-        i_mac = i_mac + DEVICE_FRAME_SIZE
-        i_er = i_er + DEVICE_FRAME_SIZE
-
-    file = open("mininet/netcfg-custom.json", 'a')
-    file.write("}\n  },\n")
-    file.close()
+
+""" Deals with the configuration of the configuration block of each device
+    Input: switches of the fabric model
+    Output: yields the text of each device entry
+"""
+def devices_config(switches):
+    i_dev = 0                   # line numbers are relative to the beginning of the device frame
+    i_gRPC = 2
+    i_gridX = 6
+    i_gridY = 7
+    i_dev_name = 10
+    i_ipv4_node_sid = 11
+    i_ipv4_lb = 12
+    i_mac = 13
+    i_er = 14
+
+    device_frame = read_frame("mininet/mn_scripts/device_frame.txt")
+
+    for switch in switches:
+        new_device = list(device_frame)
+        new_device[i_dev] = '    "' + device_key(switch) + '": {\n'
+        new_device[i_gRPC] = '        "managementAddress": "grpc://mininet:' + str(switch.grpc_port) + '?device_id=1",\n'
+        new_device[i_gridX] = '        "gridX": ' + str(switch.grid_x) + ',\n'
+        new_device[i_gridY] = '        "gridY": ' + str(switch.grid_y) + '\n'
+        new_device[i_dev_name] = '        "name": "' + switch.name + '",\n'
+        new_device[i_ipv4_node_sid] = '        "ipv4NodeSid": ' + switch.sid + ',\n'
+        new_device[i_ipv4_lb] = '        "ipv4Loopback": "' + switch.ipv4_loopback + '",\n'
+        new_device[i_mac] = '        "routerMac": "' + switch.mac + '",\n'
+        if switch.kind != "leaf":
+            new_device[i_er] = '        "isEdgeRouter": false,\n'
+        yield ''.join(new_device)
 
 
 """ Deals with the configuration of the configuration block of each port interface
+    Input: edge ports (attached to hosts) of the fabric model; True to also route the IPv6 subnet of the hosts
+    Output: yields the text of each port entry
 """
-def ports_config(leaf, spine):
-    i = 1
-    begin_port_config = 4 + (leaf + spine) * DEVICE_FRAME_SIZE      # math to discover the first line of the port config block
-    i_port = begin_port_config
-    i_port_name = begin_port_config + 3
-    i_port_ip = begin_port_config + 5
-    i_port_vlan = begin_port_config + 8
-    
-    f_port_frame = open("mininet/mn_scripts/port_frame.txt", 'r')
-    port_frame = f_port_frame.read()
-    f_port_frame.close()
-
-    file = open("mininet/netcfg-custom.json", 'a')
-    file.write('  "ports": {\n')
-    file.close()
-
-    while(i<=leaf):
-        j = 1
-        while(j<=host):
-            file = open("mininet/netcfg-custom.json", 'a')
-            file.write(port_frame + ',\n')
-            file.close()
-
-            replace_line("mininet/netcfg-custom.json", i_port, '    "device:leaf' + str(i) + '/' + str(spine+j) + '": {\n')
-            replace_line("mininet/netcfg-custom.json", i_port_name, '          "name": "leaf' + str(i) + '-' + str(spine+j) + '",\n')
-            replace_line("mininet/netcfg-custom.json", i_port_ip, '            "' + HOST_GATEWAY.replace("X", str(i)) + '/24"\n')
-            replace_line("mininet/netcfg-custom.json", i_port_vlan, '            ' + str(i) + "".ljust(2,'0') + '\n')
-
-            j += 1
-            i_port += PORT_FRAME_SIZE
-            i_port_name += PORT_FRAME_SIZE
-            i_port_ip += PORT_FRAME_SIZE
-            i_port_vlan += PORT_FRAME_SIZE
-        i += 1
-   
-    remove_last_char("mininet/netcfg-custom.json")
-    file = open("mininet/netcfg-custom.json", 'a')
-    file.write("}\n  },\n")
-    file.close()
+def ports_config(ports, dual_stack=False):
+    i_port = 0                  # line numbers are relative to the beginning of the port frame
+    i_port_name = 3
+    i_port_ip = 5
+    i_port_vlan = 8
+
+    port_frame = read_frame("mininet/mn_scripts/port_frame.txt")
+
+    for port in ports:
+        new_port = list(port_frame)
+        new_port[i_port] = '    "' + port_key(port) + '": {\n'
+        new_port[i_port_name] = '          "name": "' + port.name + '",\n'
+        new_port[i_port_ip] = '            "' + port.peer.ipv4_gateway + '/' + str(port.peer.ipv4_prefix) + '"\n'
+        if dual_stack:
+            new_port[i_port_ip] = (new_port[i_port_ip][:-1] + ',\n            "' + port.peer.ipv6_gateway + '/' +
+                                   str(port.peer.ipv6_prefix) + '"\n')
+        new_port[i_port_vlan] = '            ' + str(port.peer.vlan) + '\n'
+        yield ''.join(new_port)
 
 
 """ Deals with the configuration of the configuration block of each host
+    Input: hosts of the fabric model; True to declare the location (leaf port) and the addresses of the hosts, so that
+           ONOS knows them without the host discovery; True to also declare the IPv6 address of the hosts
+    Output: yields the text of each host entry
+"""
+def hosts_config(hosts, locations=False, dual_stack=False):
+    i_host_mac = 0              # line numbers are relative to the beginning of the host frame
+    i_host_name = 2
+    i_gridX = 4
+    i_gridY = 5
+
+    host_frame = read_frame("mininet/mn_scripts/host_frame.txt")
+
+    for host in hosts:
+        new_host = list(host_frame)
+        new_host[i_host_mac] = '   "' + host_key(host) + '": {\n'
+        new_host[i_host_name] = '        "name": "' + host.name + '",\n'
+        new_host[i_gridX] = '       "gridX": ' + str(host.grid_x) + ',\n'
+        new_host[i_gridY] = '       "gridY":' + str(host.grid_y) + '\n'
+        if locations:
+            ips = '"' + host.ipv4 + '", "' + host.ipv6 + '"' if dual_stack else '"' + host.ipv4 + '"'
+            new_host[i_host_name] += ('        "locations": ["device:' + host.leaf.name + '/' + str(host.port) + '"],\n'
+                                      '        "ips": [' + ips + '],\n')
+        yield ''.join(new_host)
+
+
+""" Returns the parameters of a host in the spec and partitions files (in the order of HOST_FIELDS)
+"""
+def host_params(host):
+    return (host.mac, host.ipv4 + "/" + str(host.ipv4_prefix), host.ipv4_gateway, host.vlan)
+
+
+""" Returns the parameters of a dual-stack host in the spec and partitions files (in the order of DUAL_STACK_FIELDS)
 """
-def hosts_config(leaf, spine):
-    i = 1
-    begin_host_config = find_EOF("mininet/netcfg-custom.json") + 1
-    i_host_mac = begin_host_config 
-    i_host_name = begin_host_config + 2
-    i_gridX = begin_host_config + 4
-    i_gridY = begin_host_config + 5
-    gridX = 200
-    gridY = gridY_Leaf + 100
-
-    f_host_frame = open("mininet/mn_scripts/host_frame.txt", 'r')
-    host_frame = f_host_frame.read()
-    f_host_frame.close()
-
-    file = open("mininet/netcfg-custom.json", 'a')
-    file.write('  "hosts": {\n')
-    file.close()
-
-    while(i<=leaf):
-        j = 1
-        letter = ord('A')
-        while(j<=host):
-            file = open("mininet/netcfg-custom.json", 'a')
-            file.write(host_frame + ',\n')
-            file.close()
-
-            replace_line("mininet/netcfg-custom.json", i_host_mac, '   "' + HOST_MAC.replace("X", str(i) + chr(letter)) + '/' + str(i) + "".ljust(2,'0') + '": {\n')
-            replace_line("mininet/netcfg-custom.json", i_host_name, '        "name": "h' + str(i) + chr(letter + ASCII_CONV) + '",\n')
-            if (j%3 == 1): replace_line("mininet/netcfg-custom.json", i_gridX, '       "gridX": ' + str(gridX-50) + ',\n')
-            elif (j%3 == 2): replace_line("mininet/netcfg-custom.json", i_gridX, '       "gridX": ' + str(gridX) + ',\n')
-            else: replace_line("mininet/netcfg-custom.json", i_gridX, '       "gridX": ' + str(gridX+50) + ',\n')
-            replace_line("mininet/netcfg-custom.json", i_gridY, '       "gridY":' + str(gridY) + '\n') if (j/3 <= 1) else replace_line("mininet/netcfg-custom.json", i_gridY, '       "gridY":' + str(gridY + 100) + '\n')
-
-            j += 1
-            letter += 1
-            i_host_mac += HOST_FRAME_SIZE 
-            i_host_name += HOST_FRAME_SIZE
-            i_gridX += HOST_FRAME_SIZE
-            i_gridY += HOST_FRAME_SIZE
-        gridX += LEAF_SAPCING    
-        i = i + 1
-    
-    remove_last_char("mininet/netcfg-custom.json")
-    file = open("mininet/netcfg-custom.json", 'a')
-    file.write("}\n  }\n")
-    file.close()    
+def dual_stack_params(host):
+    return host_params(host) + (host.ipv6 + "/" + str(host.ipv6_prefix), host.ipv6_gateway)
 
 
 """ Deals with the topology of the mininet (second script generated)
+    Input: fabric model; True to read the fabric from the spec file; True for dual-stack hosts (DualStackHost, with the
+           IPv6 address and gateway of the hosts)
 """
-def topology_config(leaf, spine):
-    i = 1
-    j = 1
-    leaf_block = "        # Leaves\n"
-    spine_block = "        # Spines\n"
-    link_block = "        # Switch Links\n"
-    host_block = "        # IPv4 hosts attached to leaf 1\n"
-
-    topo_file = open("mininet/topo-custom.py", 'a')
-    
-    replace_line("mininet/topo-custom.py", 93, '    """' + str(leaf) + 'x' + str(spine) + ' fabric topology with IPv4 hosts"""\n')
-
-    while(i<=leaf):
-        leaf_block += '        # gRPC port 5' + str(i).zfill(4) + '\n'
-        leaf_block += '        leaf' + str(i) + ' = self.addSwitch(' + "'leaf" + str(i) + "', cls=StratumBmv2Switch, cpuport=CPU_PORT)\n"
-        i += 1
-    topo_file.write(leaf_block)
-
-    while(i<=leaf+spine):
-        spine_block += '        # gRPC port 5' + str(i).zfill(4) + '\n'
-        spine_block += '        spine' + str(i-leaf) + ' = self.addSwitch(' + "'spine" + str(i-leaf) + "', cls=StratumBmv2Switch, cpuport=CPU_PORT)\n"
-        i += 1
-    topo_file.write('\n' + spine_block)
-    
-    i=1
-    while(i<=spine):
-        j = 1
-        while(j<=leaf):
-            link_block += '        self.addLink(spine' + str(i) + ', leaf' + str(j) + ')\n'
-            j += 1
-        i += 1
-    topo_file.write('\n' + link_block)
-
-    i=1
-    while(i<=leaf):
-        j=1
-        letter = ord('A')
-        while(j<=host):
-            host_block += '        h' + str(i) + chr(letter + ASCII_CONV) + " = self.addHost('h" + str(i) + chr(letter + ASCII_CONV) + "', cls=TaggedIPv4Host, mac=" + '"' + HOST_MAC.replace("X", str(i) + chr(letter)) + '",\n'
-            host_block += "                          ip='" + HOST_IP.replace("X", str(i)).replace("Y", str(j)) + "/24', gw='" + HOST_GATEWAY.replace("X", str(i)) + "', vlan=" + str(i) + "".ljust(2,'0') + ')\n'
-            host_block += '        self.addLink(h' + str(i) + chr(letter + ASCII_CONV) + ', leaf' + str(i) +')  # port ' + str(spine+j) + '\n'
-            letter += 1
-            j += 1
-        if(i!=leaf):
-            host_block += '\n        # IPv4 hosts attached to leaf ' + str(i+1) + "\n"
-        i += 1
-    host_block += '\n'
-    topo_file.write('\n' + host_block + '\n')
+def topology_config(fabric, spec=False, dual_stack=False):
+    topo_file = open(TOPO_FILE, 'a')
+
+    replace_line(TOPO_FILE, find_line(TOPO_FILE, 'fabric topology with IPv4 hosts"""'), '    """' + str(fabric.leafs) + 'x' + str(fabric.spines) + ' fabric topology with IPv4 hosts"""\n')
+    host_cls = "TaggedIPv4Host"
+    if dual_stack:
+        host_cls = "DualStackHost"
+        replace_line(TOPO_FILE, find_line(TOPO_FILE, 'HOST_CLASS = TaggedIPv4Host'), 'HOST_CLASS = DualStackHost\n')
+
+    if spec:
+        if dual_stack:
+            write_spec(TOPO_SPEC_FILE, fabric, DUAL_STACK_FIELDS, dual_stack_params)
+        else:
+            write_spec(TOPO_SPEC_FILE, fabric, HOST_FIELDS, host_params)
+        topo_file.write("        # Switches, hosts and links are read from " + os.path.basename(TOPO_SPEC_FILE) + "\n"
+                        "        from topo_spec import build_from_spec\n"
+                        "        build_from_spec(self, '" + os.path.basename(TOPO_SPEC_FILE) + "', StratumBmv2Switch, " + host_cls + ",\n"
+                        "                        cpuport=CPU_PORT)\n\n\n")
+        topo_file.close()
+        return
+
+    leaf_block = ["        # Leaves\n"]
+    for switch in fabric.leaf_switches:
+        leaf_block.append('        # gRPC port ' + str(switch.grpc_port) + '\n')
+        leaf_block.append('        ' + switch.name + " = self.addSwitch('" + switch.name + "', cls=StratumBmv2Switch, cpuport=CPU_PORT)\n")
+    topo_file.write(''.join(leaf_block))
+
+    spine_block = ["\n        # Spines\n"]
+    for switch in fabric.spine_switches:
+        spine_block.append('        # gRPC port ' + str(switch.grpc_port) + '\n')
+        spine_block.append('        ' + switch.name + " = self.addSwitch('" + switch.name + "', cls=StratumBmv2Switch, cpuport=CPU_PORT)\n")
+    topo_file.write(''.join(spine_block))
+
+    if fabric.super_spine_switches:
+        super_spine_block = ["\n        # Super spines\n"]
+        for switch in fabric.super_spine_switches:
+            super_spine_block.append('        # gRPC port ' + str(switch.grpc_port) + '\n')
+            super_spine_block.append('        ' + switch.name + " = self.addSwitch('" + switch.name + "', cls=StratumBmv2Switch, cpuport=CPU_PORT)\n")
+        topo_file.write(''.join(super_spine_block))
+
+    link_block = ["\n        # Switch Links\n"]     # the switch links come first in the fabric
+    for link in fabric.switch_links():
+        link_block.append('        self.addLink(' + link.node1.name + ', ' + link.node2.name + ')\n')
+    topo_file.write(''.join(link_block))
+
+    host_block = []
+    for switch in fabric.leaf_switches:
+        host_block.append('\n        # IPv4 hosts attached to leaf ' + str(switch.number) + "\n")
+        for host in switch.hosts:
+            host_block.append('        ' + host.name + " = self.addHost('" + host.name + "', cls=" + host_cls + ", mac=" + '"' + host.mac + '",\n')
+            if dual_stack:
+                host_block.append("                          ip='" + host.ipv4 + "/" + str(host.ipv4_prefix) + "', gw='" + host.ipv4_gateway + "', vlan=" + str(host.vlan) + ',\n')
+                host_block.append("                          ipv6='" + host.ipv6 + "/" + str(host.ipv6_prefix) + "', ipv6_gw='" + host.ipv6_gateway + "')\n")
+            else:
+                host_block.append("                          ip='" + host.ipv4 + "/" + str(host.ipv4_prefix) + "', gw='" + host.ipv4_gateway + "', vlan=" + str(host.vlan) + ')\n')
+            host_block.append('        self.addLink(' + host.name + ', ' + switch.name + ')  # port ' + str(host.port) + '\n')
+    host_block.append('\n\n')
+    topo_file.write(''.join(host_block))
+    topo_file.close()
 
 
 """ Deals with the docker-compose.yml file configuration, namely, the gRPC ports needed for a given mininet topology
+    Each port is published on its own ("ports"), or the consecutive ports are published as a single range ("range"),
+    so that Docker sets up one proxy and one set of rules per range instead of per switch. With "host" the Mininet
+    container shares the network of the host and nothing is published (the devices are then reached on the Docker host).
+    Input: fabric model; {switch: index of its partition} of a partitioned fabric (the ports are grouped by partition);
+           publishing mode (GRPC_PUBLISH_MODES); number of gRPC ports reserved after the last one of the fabric
 """
-def docker_config(leaf, spine):
-    i = 1
-    ports_block = ""
+def docker_config(fabric, partition=None, publish="ports", reserve=0):
+    ports_block = []
+
+    if publish == "host":
+        replace_line(DOCKER_FILE, find_line(DOCKER_FILE, '    ports:'), '    network_mode: host\n')
+        return
+
+    docker_file = open(DOCKER_FILE, 'a')
+
+    if partition is None:
+        groups = [fabric.switches]
+    else:
+        groups = [[] for _ in range(max(partition.values()) + 1)]
+        for switch in fabric.switches:
+            groups[partition[switch]].append(switch)
+    for index, switches in enumerate(groups):
+        if partition is not None:
+            ports_block.append('      # partition ' + str(index) + '\n')
+        ports_block.extend(port_mappings([switch.grpc_port for switch in switches], publish))
+    if reserve:
+        ports_block.append(RESERVED_COMMENT)
+        ports_block.extend(port_mappings(reserved_ports(fabric, reserve), publish))
+    docker_file.write(''.join(ports_block))
+    docker_file.close()
 
-    docker_file = open("docker-compose.yml", 'a')
 
-    while(i <= leaf+spine):
-        ports_block += '      - "5' + str(i).zfill(4) + ':5' + str(i).zfill(4) + '"\n'
-        i += 1
-    docker_file.write(ports_block)
+""" Returns the lines of docker-compose.yml that publish a list of ports
+    Input: ports; publishing mode ("ports" for one line per port, "range" for one line per run of consecutive ports)
+"""
+def port_mappings(ports, publish="ports"):
+    if publish != "range":
+        return ['      - "' + str(port) + ':' + str(port) + '"\n' for port in ports]
+    mappings = []
+    for first, last in port_runs(ports):
+        if first == last:
+            mappings.append('      - "' + str(first) + ':' + str(first) + '"\n')
+        else:
+            ports_range = str(first) + '-' + str(last)
+            mappings.append('      - "' + ports_range + ':' + ports_range + '"\n')
+    return mappings
+
+
+""" Returns the runs of consecutive ports of a list of ports: [(first, last), ...]
+"""
+def port_runs(ports):
+    runs = []
+    for port in sorted(ports):
+        if runs and port == runs[-1][1] + 1:
+            runs[-1][1] = port
+        else:
+            runs.append([port, port])
+    return [tuple(run) for run in runs]
+
+
+""" Returns the gRPC ports reserved for the switches added to the running fabric: the switches added get the ports that
+    follow the last port of the fabric (see Fabric.new_switch)
+    Input: fabric model; number of ports reserved
+"""
+def reserved_ports(fabric, reserve):
+    last = max(switch.grpc_port for switch in fabric.switches)
+    if last + reserve > GRPC_MAX_PORT:
+        raise ValueError("%d gRPC ports cannot be reserved after port %d (the last port is %d)"
+                         % (reserve, last, GRPC_MAX_PORT))
+    return list(range(last + 1, last + reserve + 1))
 
 
 """ Generates a script to automate the host location discovery in mininet
 """
-def host_discovery_script():
-    host_discovery_file = open("util/mn-host-discovery.sh", 'a')
-    i = 1
-    data = ''
-
-    while(i<=leaf):
-        j = 1
-        letter = ord('A')
-        while(j<=host):
-            data += "util/mn-cmd h" + str(i) + chr(letter + ASCII_CONV) + " ping -c 1 " + HOST_GATEWAY.replace("X", str(i)) + " > /dev/null\n"
-            letter += 1
-            j += 1
-        i += 1
-    host_discovery_file.write(data)
+def host_discovery_script(fabric):
+    host_discovery_file = open(DISCOVERY_FILE, 'a')
+    data = []
+
+    for host in fabric.host_list:
+        data.append("util/mn-cmd " + host.name + " ping -c 1 " + host.ipv4_gateway + " > /dev/null\n")
+    host_discovery_file.write(''.join(data))
+    host_discovery_file.close()
+
+
+""" Auxiliary functions that return the netcfg keys of a device, an edge port and a host
+"""
+def device_key(switch):
+    return 'device:' + switch.name
+
+def port_key(port):
+    return 'device:' + port.switch.name + '/' + str(port.number)
+
+def host_key(host):
+    return host.mac + '/' + str(host.vlan)
+
+
+""" Returns the previous netcfg keys of the changed hosts whose key changed (e.g. a new MAC address)
+    Input: previous fabric model; changed hosts (new fabric)
+"""
+def moved_host_keys(old_fabric, hosts):
+    keys = []
+    for host in hosts:
+        old_key = host_key(old_fabric.lookup(host.name))
+        if old_key != host_key(host):
+            keys.append(old_key)
+    return keys
 
 
 """ Auxiliary function that replaces a given line
@@ -337,52 +415,150 @@ def replace_line(file_name, line_num, text):
     out.close()
 
 
-""" Auxiliary function that defines the position of all switches
-    Input: number of leaf switches; number of spine switches
+""" Auxiliary function that returns the number of the first line of a file that contains a given text
+    Input: name of the file; text to be found
 """
-def grid_definition(leaf, spine):
-    global spine_spacing
-    global offset
-    global gridY_Leaf
-    global gridX_Spine
-    leaf_len = (leaf - 1) * 200
-    spine_spacing = leaf_len // spine
-    offset = spine_spacing // 2
-    gridY_Leaf = gridY_Spine + spine_spacing
-    gridX_Spine = gridX_Leaf + offset
-
-
-""" Auxiliary function that removes last char of a given file
-    Input: file that will have its last character removed
+def find_line(file_name, text):
+    f_file = open(file_name, 'r')
+    for line_num, line in enumerate(f_file):
+        if text in line:
+            f_file.close()
+            return line_num
+    f_file.close()
+    raise ValueError("'%s' not found in %s" % (text, file_name))
+
+
+""" Auxiliary function that reads a frame file split in lines (keeping the line endings)
+    Input: name of the frame file
 """
-def remove_last_char(file_name):
-        f = open(file_name, 'rb+')
-        f.seek(-3, 2)    # moves the cursor to the last character of the file
-        f.truncate()     # resizes the file to not include the last character (removes last character from the file)
-        f.close()    
-
-
-""" Auxiliary function that returns the line number of a given expression/word
-    Input: file used for the lookup 
-"""
-def find_EOF(file_name):
-    f = open(file_name, 'rb+')
-    data = f.readlines()
-    return len(data)
+def read_frame(file_name):
+    f_frame = open(file_name, 'r')
+    frame = f_frame.read().splitlines(True)
+    f_frame.close()
+    return frame
 
 
 """ Main funcion
 """
 if __name__ == "__main__":
+    # per-phase metrics (metrics=<file>, metrics_summary=1)
+    metrics = metrics_from_environ(os.environ, __file__)
+    dual_stack = os.environ.get('host_stack', 'ipv4') == 'dual'
+    locations = os.environ.get('host_locations', '0') == '1'
+
+    # mutations mode: only the netcfg patch files of the changes of the running fabric are written (the changes logged
+    # by the topo script are replayed on the generated fabric)
+    if 'mutations' in os.environ:
+        with metrics.phase("fabric") as counts:
+            old_fabric = load_fabric(FABRIC_FILE)
+            fabric = load_fabric(FABRIC_FILE)
+            counts["mutations"] = replay_mutations(fabric, os.environ['mutations'])
+            counts.update(fabric_counts(fabric))
+        with metrics.phase("netcfg_delta", files=[NETCFG_DELTA_FILE, NETCFG_REMOVALS_FILE]):
+            print(netcfg_delta(old_fabric, fabric, os.environ.get('minify', '0') == '1', dual_stack=dual_stack,
+                               locations=locations))
+        sys.exit(0)
+
     leaf = int(os.environ['leafs'])
     spine = int(os.environ['spines'])
     host = int(os.environ['hosts'])
-    grid_definition(leaf, spine)
-    begin_of_file()
-    devices_config(leaf, spine)
-    ports_config(leaf, spine)
-    hosts_config(leaf, spine)
-    topology_config(leaf, spine)
-    docker_config(leaf, spine)
-    host_discovery_script()
-    end_of_file(leaf,spine)
+    pods = int(os.environ.get('pods', 1))
+    super_spines = int(os.environ.get('super_spines', 0))
+    minify = os.environ.get('minify', '0') == '1'
+    relayout = os.environ.get('relayout', '0') == '1'
+    spec = os.environ.get('topo_spec', '0') == '1'
+    partitions = int(os.environ.get('partitions', 1))
+    layout = os.environ.get('host_layout', 'legacy')
+    publish = os.environ.get('grpc_publish', 'ports')
+    reserve = int(os.environ.get('grpc_reserve', 0))
+    if publish not in GRPC_PUBLISH_MODES:
+        sys.exit("unknown grpc_publish " + publish + " (" + ", ".join(GRPC_PUBLISH_MODES) + ")")
+    with metrics.phase("fabric") as counts:
+        allocator = allocator_from_environ(os.environ, leaf * pods, spine * pods, host, super_spines)
+        for limit in allocator.exceeded():
+            sys.stderr.write("warning: the " + allocator.name + " addressing does not support " + limit + "\n")
+        fabric = Fabric(leaf, spine, host, allocator, layout, pods, super_spines)
+        counts.update(fabric_counts(fabric))
+
+    # delta mode: only the netcfg patch files are written (against a previous netcfg file or previous dimensions)
+    if 'prev_netcfg' in os.environ:
+        with metrics.phase("netcfg_delta", files=[NETCFG_DELTA_FILE, NETCFG_REMOVALS_FILE]):
+            print(netcfg_delta_from_file(os.environ['prev_netcfg'], fabric, minify, relayout, dual_stack, locations))
+        sys.exit(0)
+    if 'prev_leafs' in os.environ:
+        old_leaf, old_spine, old_host = (int(os.environ['prev_leafs']), int(os.environ.get('prev_spines', spine)),
+                                         int(os.environ.get('prev_hosts', host)))
+        old_pods = int(os.environ.get('prev_pods', pods))
+        old_super_spines = int(os.environ.get('prev_super_spines', super_spines))
+        old_allocator = allocator_from_environ(os.environ, old_leaf * old_pods, old_spine * old_pods, old_host,
+                                               old_super_spines)
+        old_fabric = Fabric(old_leaf, old_spine, old_host, old_allocator, layout, old_pods, old_super_spines)
+        with metrics.phase("netcfg_delta", files=[NETCFG_DELTA_FILE, NETCFG_REMOVALS_FILE]):
+            print(netcfg_delta(old_fabric, fabric, minify, relayout, dual_stack, locations))
+        sys.exit(0)
+
+    # the gRPC ports reserved for the running fabric (grpc_reserve=N) must fit after the ports of the fabric
+    if reserve and publish != "host":
+        try:
+            reserved_ports(fabric, reserve)
+        except ValueError as error:
+            sys.exit(str(error))
+
+    with metrics.phase("runtime_modules"):
+        runtime_modules()
+
+    outputs = OUTPUTS + [TOPO_SPEC_FILE] if spec else OUTPUTS
+    if partitions > 1:
+        outputs = outputs + [PARTITIONS_FILE]
+
+    # artifact cache: the outputs are restored when nothing they depend on changed
+    cache = ArtifactCache.from_environ(os.environ)
+    if cache is not None:
+        key = cache_key(__file__, [leaf, spine, host, minify, spec, allocator.name, layout, pods, super_spines,
+                                   partitions, dual_stack, locations, publish, reserve])
+        with metrics.phase("cache_restore") as counts:
+            counts["hit"] = cache.restore(key, outputs)
+        if counts["hit"]:
+            print("netcfg cache hit " + key[:12])
+            sys.exit(0)
+        print("netcfg cache miss " + key[:12])
+
+    # parameters of the fabric model, for the changes of the running fabric (--control)
+    with metrics.phase("fabric_file", files=[FABRIC_FILE]):
+        write_fabric(FABRIC_FILE, fabric)
+
+    # partitioned execution: the partitions are run by the topo script (--partitions)
+    partition = None
+    if partitions > 1:
+        with metrics.phase("partitions", files=[PARTITIONS_FILE], partitions=partitions):
+            if dual_stack:
+                partition = write_partitions(PARTITIONS_FILE, fabric, partitions, DUAL_STACK_FIELDS, dual_stack_params)
+            else:
+                partition = write_partitions(PARTITIONS_FILE, fabric, partitions, HOST_FIELDS, host_params)
+
+    with metrics.phase("begin_of_file", files=[TOPO_FILE, DOCKER_FILE, DISCOVERY_FILE]):
+        begin_of_file()
+    with metrics.phase("netcfg_config", files=[NETCFG_FILE]):
+        netcfg_config(fabric, minify, dual_stack, locations)
+    with metrics.phase("topology_config", files=[TOPO_SPEC_FILE] if spec else [], appends=[TOPO_FILE]):
+        topology_config(fabric, spec, dual_stack)
+    with metrics.phase("docker_config", appends=[DOCKER_FILE]):
+        docker_config(fabric, partition, publish, reserve)
+    with metrics.phase("host_discovery_script", appends=[DISCOVERY_FILE]):
+        host_discovery_script(fabric)
+    with metrics.phase("end_of_file", appends=[TOPO_FILE, DOCKER_FILE]):
+        end_of_file(fabric)
+
+    # consistency of the generated files with each other (check=1): nothing is cached when they are inconsistent
+    if os.environ.get('check', '0') == '1':
+        with metrics.phase("check") as counts:
+            errors = check_artifacts(NETCFG_FILE, TOPO_FILE, DOCKER_FILE, DISCOVERY_FILE,
+                                     PARTITIONS_FILE if partitions > 1 else None)
+            counts["errors"] = len(errors)
+        if errors:
+            print_errors(errors)
+            sys.exit(1)
+
+    if cache is not None:
+        with metrics.phase("cache_store"):
+            cache.store(key, outputs)
@@ -0,0 +1,290 @@
+#  Bulk push of a generated netcfg file to ONOS
+#
+#  Instead of POSTing the whole netcfg in one request (where a bad entry rejects the whole upload), the blocks are
+#  pushed in chunks to /onos/v1/network/configuration: the devices first, then the ports, then the hosts, the chunks of
+#  a block concurrently over a pool of persistent HTTP connections. A chunk is retried with an exponential backoff on
+#  connection errors and server errors, and a rejected chunk is split in halves until the rejected entries are isolated,
+#  so that every valid entry is applied. onos_stub.py mimics the endpoint to test and benchmark the push offline.
+
+### LIBRARIES ###
+from __future__ import division
+from __future__ import print_function
+import argparse
+import base64
+import json
+import socket
+import sys
+import threading
+import time
+
+try:
+    import http.client as httplib
+    from queue import Queue, Empty
+    from urllib.parse import urlparse
+except ImportError:
+    import httplib
+    from Queue import Queue, Empty
+    from urlparse import urlparse
+
+
+### CONSTANTS ###
+CONFIG_PATH = "/onos/v1/network/configuration"    # Path of the network configuration endpoint
+ONOS_USER = "onos"
+ONOS_PASSWORD = "rocks"
+DEFAULT_URL = "http://localhost:8181"   # Base URL of ONOS
+DEFAULT_FILE = "mininet/netcfg-custom.json"
+DEFAULT_CHUNK_SIZE = 500                # Number of entries per chunk
+DEFAULT_WORKERS = 4                     # Number of chunks pushed at the same time (and of pooled connections)
+DEFAULT_RETRIES = 3                     # Number of retries of a chunk after a connection or server error
+DEFAULT_BACKOFF = 0.5                   # Delay (in seconds) before the first retry, doubled at each retry
+DEFAULT_TIMEOUT = 30                    # Timeout (in seconds) of a request
+BLOCK_ORDER = ["devices", "ports", "hosts"]       # Blocks pushed first, in this order (the other blocks follow)
+
+
+### FUNCTIONS ###
+
+""" Splits a netcfg in chunks of at most chunk_size entries, grouped by block in the order the blocks are pushed
+    Input: netcfg (dictionary of blocks); number of entries per chunk
+    Output: [(block, [[(key, entry), ...], ...]), ...]
+"""
+def chunk_config(config, chunk_size):
+    blocks = [block for block in BLOCK_ORDER if block in config]
+    blocks += sorted(block for block in config if block not in BLOCK_ORDER)
+    chunked = []
+    for block in blocks:
+        entries = sorted(config[block].items())
+        chunked.append((block, [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]))
+    return chunked
+
+
+""" Returns the value at a percentile of sorted values (0 if there is none)
+"""
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+""" Prints a summary of a push: the chunks pushed, the latency of the chunks, the retries and the rejected entries
+"""
+def print_report(report):
+    latencies = sorted(chunk["latency"] for chunk in report["chunks"])
+    print("netcfg push: %d entries in %d chunks (%d requests, %d retries) in %.2fs" % (
+        report["entries"], len(report["chunks"]), report["requests"], report["retries"], report["elapsed"]))
+    print("chunk latency: p50 %.3fs, p95 %.3fs, max %.3fs" % (
+        percentile(latencies, 0.5), percentile(latencies, 0.95), latencies[-1] if latencies else 0.0))
+    if report["rejected"]:
+        print("rejected entries (%d): %s" % (len(report["rejected"]), ", ".join(report["rejected"])))
+    if report["failed"]:
+        print("entries not pushed after %d retries (%d): %s" % (report["retries_max"], len(report["failed"]),
+                                                                ", ".join(report["failed"])))
+
+
+### CLASSES ###
+
+""" Error of a request that may succeed when retried (connection error, server error)
+"""
+class RetryableError(Exception):
+    pass
+
+
+""" Pool of persistent HTTP connections to ONOS, one per concurrent request
+    Input: base URL of ONOS; number of connections; timeout (in seconds) of a request
+"""
+class ConnectionPool(object):
+
+    def __init__(self, url, size, timeout=DEFAULT_TIMEOUT):
+        parsed = urlparse(url)
+        self.connection_cls = httplib.HTTPSConnection if parsed.scheme == "https" else httplib.HTTPConnection
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.timeout = timeout
+        self.idle = Queue()
+        for _ in range(size):
+            self.idle.put(None)         # connections are opened on their first use
+
+    def get(self):
+        connection = self.idle.get()
+        if connection is None:
+            connection = self.connection_cls(self.host, self.port, timeout=self.timeout)
+        return connection
+
+    """ Returns a connection to the pool (a broken connection is closed and reopened on its next use)
+    """
+    def put(self, connection, broken=False):
+        if broken:
+            connection.close()
+            connection = None
+        self.idle.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                connection = self.idle.get_nowait()
+            except Empty:
+                return
+            if connection is not None:
+                connection.close()
+
+
+""" Pushes a netcfg to the network configuration endpoint of ONOS in chunks
+    Input: base URL of ONOS; number of entries per chunk; number of chunks pushed at the same time; number of retries
+           of a chunk; delay before the first retry; timeout of a request; credentials of ONOS
+"""
+class NetcfgPusher(object):
+
+    def __init__(self, url=DEFAULT_URL, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=DEFAULT_TIMEOUT, user=ONOS_USER,
+                 password=ONOS_PASSWORD):
+        self.url = url
+        self.chunk_size = max(chunk_size, 1)
+        self.workers = max(workers, 1)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        credentials = base64.b64encode(("%s:%s" % (user, password)).encode('utf-8')).decode('ascii')
+        self.headers = {"Authorization": "Basic " + credentials, "Content-Type": "application/json",
+                        "Accept": "application/json"}
+        self.path = urlparse(url).path.rstrip('/') + CONFIG_PATH
+
+    """ POSTs a chunk of a block once
+        Output: True if the chunk was applied, False if ONOS rejected it (client error)
+    """
+    def post(self, pool, block, entries):
+        body = json.dumps({block: dict(entries)}, separators=(',', ':')).encode('utf-8')
+        connection = pool.get()
+        try:
+            if connection.sock is None:
+                # the headers and the body are sent separately: without TCP_NODELAY every request waits for the
+                # delayed ACK of the server
+                connection.connect()
+                connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection.request("POST", self.path, body, self.headers)
+            response = connection.getresponse()
+            response.read()
+        except (socket.error, httplib.HTTPException) as error:
+            pool.put(connection, broken=True)
+            raise RetryableError(str(error))
+        pool.put(connection, broken=response.getheader("Connection", "").lower() == "close")
+        if response.status >= 500 or response.status == 429:
+            raise RetryableError("HTTP %d" % response.status)
+        return response.status < 400
+
+    """ Pushes a chunk, retrying it on retryable errors and splitting it in halves when it is rejected
+        Output: result of the chunk {"block", "entries", "status", "latency", "requests", "retries", "rejected",
+                "failed"}
+    """
+    def push_chunk(self, pool, block, entries):
+        result = {"block": block, "entries": len(entries), "requests": 0, "retries": 0, "rejected": [], "failed": []}
+        start = time.time()
+        pending = [entries]
+        while pending:
+            part = pending.pop()
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    result["retries"] += 1
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+                result["requests"] += 1
+                try:
+                    applied = self.post(pool, block, part)
+                    break
+                except RetryableError:
+                    continue
+            else:
+                result["failed"].extend(key for key, _ in part)
+                continue
+            if not applied:
+                if len(part) == 1:
+                    result["rejected"].append(part[0][0])
+                else:
+                    pending.extend([part[len(part) // 2:], part[:len(part) // 2]])
+        result["latency"] = time.time() - start
+        result["status"] = "failed" if result["failed"] else "rejected" if result["rejected"] else "ok"
+        return result
+
+    """ Pushes a netcfg: the blocks one after the other, the chunks of a block concurrently
+        Input: netcfg (dictionary of blocks)
+        Output: report of the push {"elapsed", "entries", "requests", "retries", "retries_max", "rejected", "failed",
+                "chunks": [result of each chunk]}
+    """
+    def push(self, config):
+        pool = ConnectionPool(self.url, self.workers, self.timeout)
+        results = []
+        lock = threading.Lock()
+        start = time.time()
+        try:
+            for block, chunks in chunk_config(config, self.chunk_size):
+                queue = Queue()
+                for entries in chunks:
+                    queue.put(entries)
+
+                def worker():
+                    while True:
+                        try:
+                            entries = queue.get_nowait()
+                        except Empty:
+                            return
+                        result = self.push_chunk(pool, block, entries)
+                        with lock:
+                            results.append(result)
+
+                threads = [threading.Thread(target=worker) for _ in range(min(self.workers, len(chunks)))]
+                for thread in threads:
+                    thread.daemon = True
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            pool.close()
+        return {"elapsed": time.time() - start,
+                "entries": sum(result["entries"] for result in results),
+                "requests": sum(result["requests"] for result in results),
+                "retries": sum(result["retries"] for result in results),
+                "retries_max": self.retries,
+                "rejected": sorted(key for result in results for key in result["rejected"]),
+                "failed": sorted(key for result in results for key in result["failed"]),
+                "chunks": results}
+
+
+""" Main funcion
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Bulk push of a generated netcfg file to ONOS')
+    parser.add_argument('file', nargs='?', default=DEFAULT_FILE, help='netcfg file (default ' + DEFAULT_FILE + ')')
+    parser.add_argument('--url', default=DEFAULT_URL, help='base URL of ONOS (default ' + DEFAULT_URL + ')')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='number of entries per chunk')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='number of chunks pushed at the same time (and of pooled connections)')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help='number of retries of a chunk after a connection or server error')
+    parser.add_argument('--backoff', type=float, default=DEFAULT_BACKOFF,
+                        help='delay (in seconds) before the first retry, doubled at each retry')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='timeout (in seconds) of a request')
+    parser.add_argument('--stub', action='store_true',
+                        help='push to a local stub of the endpoint (onos_stub.py) instead of ONOS')
+    parser.add_argument('--stub-latency', type=float, default=0.0,
+                        help='latency (in seconds) added by the stub to every request')
+    parser.add_argument('--output', help='file where the report of the push is saved (JSON)')
+    args = parser.parse_args()
+
+    f_netcfg = open(args.file, 'r')
+    netcfg = json.load(f_netcfg)
+    f_netcfg.close()
+
+    stub = None
+    if args.stub:
+        from onos_stub import start_stub
+        stub = start_stub(latency=args.stub_latency)
+        args.url = stub.url()
+    pusher = NetcfgPusher(args.url, args.chunk_size, args.workers, args.retries, args.backoff, args.timeout)
+    report = pusher.push(netcfg)
+    if stub is not None:
+        stub.shutdown()
+        stub.server_close()
+
+    print_report(report)
+    if args.output:
+        f_output = open(args.output, 'w')
+        json.dump(report, f_output, indent=2, sort_keys=True)
+        f_output.close()
+    sys.exit(1 if report["rejected"] or report["failed"] else 0)
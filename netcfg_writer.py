@@ -0,0 +1,146 @@
+### LIBRARIES ###
+import json
+from collections import OrderedDict
+
+
+### CONSTANTS ###
+BUFFER_SIZE = 1 << 16                   # Size (in bytes) of the write buffer used for the netcfg file
+BLOCK_INDENT = "  "                     # Indentation of the "devices", "ports" and "hosts" keys in the pretty-printed file
+
+
+### CLASSES ###
+
+""" Streams a netcfg document to a file, one block and one entry at a time
+    Entries are written as soon as they are produced, so memory does not grow with the fabric size, and the commas
+    are written before each entry (never after), so the writer never has to seek back or re-read the file.
+    Input: name of the netcfg file; True to write the minified document (no indentation nor line breaks)
+"""
+class NetcfgWriter(object):
+
+    def __init__(self, file_name, minify=False):
+        self.minify = minify
+        self.blocks = 0
+        self.bytes = 0
+        self.file = open(file_name, 'w', BUFFER_SIZE)
+        self.write("{" if minify else "{\n")
+
+    """ Writes a whole block ("devices", "ports", "hosts")
+        Input: name of the block; iterable with the text of each entry (as rendered from the frames, without commas)
+    """
+    def block(self, name, entries):
+        if self.blocks:
+            self.write("," if self.minify else ",\n")
+        if self.minify:
+            self.write('"' + name + '":{')
+        else:
+            self.write(BLOCK_INDENT + '"' + name + '": {\n')
+
+        separator = ""
+        for entry in entries:
+            if self.minify:
+                entry = minify_entry(entry)
+            self.write(separator + entry)
+            separator = "," if self.minify else ",\n"
+
+        self.write("}" if self.minify else "\n" + BLOCK_INDENT + "}")
+        self.blocks += 1
+
+    """ Closes the document and the file
+    """
+    def close(self):
+        self.write("}" if self.minify else "\n}")
+        self.file.close()
+
+    def write(self, text):
+        self.file.write(text)
+        self.bytes += len(text)
+
+
+### FUNCTIONS ###
+
+""" Converts a pretty-printed entry ('"key": {...}') to its minified form ('"key":{...}')
+    Input: text of the entry
+"""
+def minify_entry(entry):
+    value = json.loads("{" + entry + "}", object_pairs_hook=OrderedDict)
+    return json.dumps(value, separators=(',', ':'))[1:-1]
+
+
+""" Parses a pretty-printed or minified entry into its key and value
+    Input: text of the entry
+"""
+def parse_entry(entry):
+    return list(json.loads("{" + entry + "}", object_pairs_hook=OrderedDict).items())[0]
+
+
+""" Compares two values of the same netcfg entry, ignoring the grid coordinates unless there is a relayout
+"""
+def same_entry(old, new, relayout):
+    if relayout:
+        return old == new
+    return strip_grid(old) == strip_grid(new)
+
+
+""" Returns a copy of a netcfg entry value without its grid coordinates
+"""
+def strip_grid(value):
+    if not isinstance(value, dict) or not isinstance(value.get("basic"), dict):
+        return value
+    value = OrderedDict(value)
+    value["basic"] = OrderedDict((k, v) for k, v in value["basic"].items() if k not in ("gridX", "gridY"))
+    return value
+
+
+""" Writes the keys of the netcfg entries to be removed from ONOS, grouped by block
+    Each key is to be removed with DELETE /onos/v1/network/configuration/<block>/<key>
+    Input: name of the file; list of (block, list of keys)
+"""
+def write_removals(file_name, removals):
+    removals_file = open(file_name, 'w')
+    json.dump(OrderedDict(removals), removals_file, indent=2)
+    removals_file.close()
+
+
+""" Writes the netcfg patch files that turn a previously generated netcfg file into the netcfg of the new fabric
+    Entries added or changed go to a netcfg document (to be POSTed to ONOS) and the keys of the entries that
+    disappeared go to the removals file.
+    Input: previous netcfg file; list of (block, iterable of new entries); patch file; removals file; True to write
+           the minified patch; True to also update the grid coordinates of existing entries
+    Output: dictionary {block: (added, changed, removed)} with the number of entries of each kind
+"""
+def write_delta_from_file(previous_file, blocks, delta_file, removals_file, minify=False, relayout=False):
+    f_previous = open(previous_file, 'r')
+    previous = json.load(f_previous, object_pairs_hook=OrderedDict)
+    f_previous.close()
+
+    counts = OrderedDict()
+    removals = []
+    netcfg = NetcfgWriter(delta_file, minify)
+    for name, entries in blocks:
+        old_entries = previous.get(name, {})
+        seen = set()
+        changes = [0, 0]
+        netcfg.block(name, changed_entries(entries, old_entries, relayout, seen, changes))
+        removed = [key for key in old_entries if key not in seen]
+        removals.append((name, removed))
+        counts[name] = (changes[0], changes[1], len(removed))
+    netcfg.close()
+
+    write_removals(removals_file, removals)
+    return counts
+
+
+""" Yields the entries that are new or changed with regard to the previous entries of the same block
+    Input: new entries; previous entries {key: value}; True on a relayout; set filled with the keys of the new entries;
+           list [added, changed] updated with the number of entries of each kind
+"""
+def changed_entries(entries, old_entries, relayout, seen, changes):
+    for entry in entries:
+        key, value = parse_entry(entry)
+        seen.add(key)
+        if key not in old_entries:
+            changes[0] += 1
+            yield entry
+        elif not same_entry(old_entries[key], value, relayout):
+            changes[1] += 1
+            yield entry
@@ -0,0 +1,188 @@
+#  Local stub of the ONOS network configuration REST endpoint
+#
+#  Mimics /onos/v1/network/configuration closely enough to test and benchmark the netcfg push (netcfg_push.py) without
+#  ONOS: POST merges the blocks of the body into the configuration, GET returns it and DELETE removes it (whole, or one
+#  entry). Entries can be rejected (HTTP 400, nothing of the request is applied, as ONOS does) and every request can be
+#  delayed to emulate the latency of ONOS.
+
+### LIBRARIES ###
+from __future__ import print_function
+import argparse
+import base64
+import json
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import unquote
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+
+
+### CONSTANTS ###
+CONFIG_PATH = "/onos/v1/network/configuration"    # Path of the network configuration endpoint
+ONOS_USER = "onos"
+ONOS_PASSWORD = "rocks"
+DEFAULT_PORT = 8181                     # Port of the ONOS REST API
+
+
+### CLASSES ###
+
+""" Handler of the requests to the stub (one persistent HTTP/1.1 connection per client)
+"""
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True      # the headers and the body of a response are written separately
+
+    def log_message(self, format, *args):
+        pass
+
+    """ Sends a response with a JSON body (the Content-Length keeps the connection open)
+    """
+    def reply(self, status, body=None):
+        data = json.dumps(body if body is not None else {}).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    """ Returns True if the request carries the credentials of ONOS (otherwise answers 401)
+    """
+    def authorized(self):
+        credentials = base64.b64encode(("%s:%s" % (ONOS_USER, ONOS_PASSWORD)).encode('utf-8')).decode('ascii')
+        if self.headers.get("Authorization") == "Basic " + credentials:
+            return True
+        self.reply(401, {"code": 401, "message": "Unauthorized"})
+        return False
+
+    """ Returns the request path relative to the configuration endpoint (None if the path is not under the endpoint)
+    """
+    def config_path(self):
+        path = self.path.split('?')[0].rstrip('/')
+        if path != CONFIG_PATH and not path.startswith(CONFIG_PATH + '/'):
+            self.reply(404, {"code": 404, "message": "Not found"})
+            return None
+        return [unquote(part) for part in path[len(CONFIG_PATH):].split('/') if part]
+
+    def do_POST(self):
+        self.server.count_request()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.authorized() or self.config_path() is None:
+            return
+        try:
+            config = json.loads(body.decode('utf-8'))
+        except ValueError as error:
+            self.reply(400, {"code": 400, "message": "Invalid JSON: %s" % error})
+            return
+        rejected = self.server.rejected(config)
+        time.sleep(self.server.latency)
+        if rejected:
+            self.reply(400, {"code": 400, "message": "Invalid entries: %s" % ", ".join(sorted(rejected))})
+            return
+        self.server.merge(config)
+        self.reply(200)
+
+    def do_GET(self):
+        self.server.count_request()
+        path = self.config_path() if self.authorized() else None
+        if path is None:
+            return
+        with self.server.lock:
+            node = self.server.config
+            for part in path:
+                node = node.get(part, {})
+            self.reply(200, node)
+
+    def do_DELETE(self):
+        self.server.count_request()
+        path = self.config_path() if self.authorized() else None
+        if path is None:
+            return
+        with self.server.lock:
+            if not path:
+                self.server.config = {}
+            elif len(path) == 1:
+                self.server.config.pop(path[0], None)
+            else:
+                self.server.config.get(path[0], {}).pop(path[1], None)
+        self.reply(200)
+
+
+""" Stub of the ONOS network configuration endpoint, serving each connection from its own thread
+    config: network configuration merged from the POST requests; requests: number of requests served
+    Input: address (host, port); latency (in seconds) added to every POST; keys of the entries to reject
+"""
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, reject=()):
+        HTTPServer.__init__(self, address, StubHandler)
+        self.latency = latency
+        self.reject = set(reject)
+        self.config = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    """ Returns the URL of the stub
+    """
+    def url(self):
+        return "http://%s:%d" % self.server_address[:2]
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    """ Returns the keys of the entries of a configuration that ONOS would reject: entries listed in reject and entries
+        that are not objects
+    """
+    def rejected(self, config):
+        keys = []
+        for block, entries in config.items():
+            if not isinstance(entries, dict):
+                keys.append(block)
+                continue
+            keys.extend(key for key, entry in entries.items() if key in self.reject or not isinstance(entry, dict))
+        return keys
+
+    """ Merges the blocks of a configuration into the configuration of the stub (entry by entry, as ONOS does)
+    """
+    def merge(self, config):
+        with self.lock:
+            for block, entries in config.items():
+                self.config.setdefault(block, {}).update(entries)
+
+
+### FUNCTIONS ###
+
+""" Starts a stub in a background thread
+    Input: port (0 for any free port); latency (in seconds) added to every POST; keys of the entries to reject
+    Output: the running stub (stopped with shutdown())
+"""
+def start_stub(port=0, latency=0.0, reject=()):
+    server = StubServer(("127.0.0.1", port), latency, reject)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+""" Main funcion
+"""
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local stub of the ONOS network configuration REST endpoint')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on (default 8181)')
+    parser.add_argument('--latency', type=float, default=0.0, help='latency (in seconds) added to every POST')
+    parser.add_argument('--reject', default='', help='keys of the entries to reject, comma separated')
+    args = parser.parse_args()
+
+    stub = StubServer(("127.0.0.1", args.port), args.latency, [key for key in args.reject.split(',') if key])
+    print("ONOS netcfg stub listening on " + stub.url() + CONFIG_PATH)
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,248 @@
+#  Per-port counter sampler of the running fabric
+#
+#  The ports of the switches (leafN-ethM, spineN-ethM, sspineN-ethM) are veth interfaces of the Mininet host, so their
+#  kernel counters show the traffic and the drops of every port without any external service. The sampler reads the
+#  counters of every interface in a single read of /proc/net/dev (the same counters as /sys/class/net/*/statistics,
+#  without one file per counter and port) at a sub-second interval, keeps the last samples of each port in a compact
+#  ring buffer, computes the rates and the drop deltas between samples and streams them to a JSON-lines time-series
+#  file: one line per sample with the rates of the ports that carried traffic and the totals of each tier.
+
+### LIBRARIES ###
+from __future__ import division
+from __future__ import print_function
+import json
+import os
+import re
+import threading
+import time
+from array import array
+
+
+### CONSTANTS ###
+NET_DEV_FILE = "/proc/net/dev"
+COUNTERS = ["rx_bytes", "rx_packets", "rx_dropped", "tx_bytes", "tx_packets", "tx_dropped"]   # counters sampled
+NET_DEV_FIELDS = [0, 1, 3, 8, 9, 11]    # columns of the counters in /proc/net/dev (after the interface name)
+RATES = ["rx_bps", "tx_bps", "rx_pps", "tx_pps", "rx_drops", "tx_drops"]     # values of a port in each sample
+DEFAULT_INTERVAL = 0.5                  # Time (in seconds) between two samples
+DEFAULT_HISTORY = 120                   # Number of samples kept for each port
+SERIES_VERSION = 1                      # Version of the layout of the time-series file
+TIER_PATTERN = re.compile(r'\d+$')
+
+
+### FUNCTIONS ###
+
+""" Reads the counters of every interface: {interface: [counter, ...]} (in the order of COUNTERS)
+"""
+def read_counters(file_name=NET_DEV_FILE):
+    counters = {}
+    f_dev = open(file_name, 'r')
+    for line in f_dev:
+        name, separator, values = line.partition(':')
+        if not separator or '|' in line:
+            continue
+        fields = values.split()
+        counters[name.strip()] = [int(fields[i]) for i in NET_DEV_FIELDS]
+    f_dev.close()
+    return counters
+
+
+""" Returns the tier of a switch from its name ("leaf", "spine" or "sspine")
+"""
+def switch_tier(name):
+    return TIER_PATTERN.sub('', name)
+
+
+""" Returns the ports of the switches of the network: [(interface, switch, tier), ...]
+"""
+def switch_ports(net):
+    ports = []
+    for switch in list(net.switches):
+        tier = switch_tier(switch.name)
+        for name in switch.intfNames():
+            if name != 'lo':
+                ports.append((name, switch.name, tier))
+    return ports
+
+
+""" Starts the sampler of the ports of the running network (also set as net.port_sampler, for the counters command of
+    the CLI)
+    Input: running network; time (in seconds) between two samples; number of samples kept for each port; time-series
+           file the samples are appended to (relative to the directory of this module; None to keep them in the ring
+           buffers only); capacity (in Mbit/s) of the links, to report the utilization of the tiers (optional)
+"""
+def start_sampler(net, interval=DEFAULT_INTERVAL, history=DEFAULT_HISTORY, file_name=None, link_mbps=None):
+    sampler = PortSampler(net, interval, history, file_name, link_mbps)
+    net.port_sampler = sampler
+    sampler.start()
+    return sampler
+
+
+""" Mininet CLI command: counters [top N | <switch or interface>]
+"""
+def do_counters(cli, line):
+    sampler = getattr(cli.mn, 'port_sampler', None)
+    if sampler is None:
+        print("The ports are not sampled: the topology was started without --counters")
+        return
+    args = line.split()
+    rows = sampler.latest()
+    if not rows:
+        print("No sample yet")
+        return
+    if args and args[0] == "top":
+        count = int(args[1]) if len(args) > 1 else 10
+        ports = sorted(rows["ports"].items(), key=lambda item: -(item[1][0] + item[1][1]))[:count]
+    elif args:
+        ports = sorted((name, rates) for name, rates in rows["ports"].items()
+                       if name == args[0] or name.startswith(args[0] + "-"))
+    else:
+        ports = []
+    print("%-8s %12s %12s %10s %10s" % ("tier", "rx Mbit/s", "tx Mbit/s", "drops", "util"))
+    for tier, totals in sorted(rows["tiers"].items()):
+        print("%-8s %12.2f %12.2f %10d %10s" % (tier, totals["rx_bps"] / 1e6, totals["tx_bps"] / 1e6,
+                                               totals["drops"], "-" if totals["util"] is None
+                                               else "%.1f%%" % (totals["util"] * 100)))
+    for name, rates in ports:
+        print("%-16s rx %10.2f Mbit/s  tx %10.2f Mbit/s  drops %d/%d" % (name, rates[0] / 1e6, rates[1] / 1e6,
+                                                                         rates[4], rates[5]))
+
+
+### CLASSES ###
+
+""" Ring buffer of the last samples of the counters of a port (one array of doubles for the times and one for the
+    counters, so that a port costs the same memory whatever the length of the run)
+    Input: number of samples kept
+"""
+class PortRing(object):
+    __slots__ = ("capacity", "times", "values", "count", "next")
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array('d', [0.0] * capacity)
+        self.values = array('d', [0.0] * (capacity * len(COUNTERS)))
+        self.count = 0                  # number of samples in the buffer
+        self.next = 0                   # slot of the next sample
+
+    def append(self, timestamp, counters):
+        self.times[self.next] = timestamp
+        base = self.next * len(COUNTERS)
+        for i, value in enumerate(counters):
+            self.values[base + i] = value
+        self.next = (self.next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    """ Returns a sample: time and counters (0 for the latest sample, 1 for the previous one...)
+    """
+    def sample(self, age=0):
+        slot = (self.next - 1 - age) % self.capacity
+        base = slot * len(COUNTERS)
+        return self.times[slot], self.values[base:base + len(COUNTERS)]
+
+    """ Returns the rates between two samples, in the order of RATES: bits/s and packets/s received and sent, packets
+        dropped on receive and on send (None when there are not enough samples)
+        Input: number of samples between the two samples (1 for the rates of the last interval)
+    """
+    def rates(self, window=1):
+        window = min(window, self.count - 1)
+        if window < 1:
+            return None
+        end, current = self.sample(0)
+        start, previous = self.sample(window)
+        elapsed = end - start
+        if elapsed <= 0:
+            return None
+        delta = [max(now - before, 0) for now, before in zip(current, previous)]     # counters reset on restarts
+        return [delta[0] * 8 / elapsed, delta[3] * 8 / elapsed, delta[1] / elapsed, delta[4] / elapsed,
+                int(delta[2]), int(delta[5])]
+
+
+""" Samples the counters of the ports of the switches of a running network in a background thread
+    rings: ring buffer of each port {interface: PortRing}
+"""
+class PortSampler(object):
+
+    def __init__(self, net, interval=DEFAULT_INTERVAL, history=DEFAULT_HISTORY, file_name=None, link_mbps=None):
+        self.net = net
+        self.interval = interval
+        self.history = max(history, 2)
+        self.file_name = file_name
+        self.link_bps = link_mbps * 1e6 if link_mbps else None
+        self.rings = {}
+        self.last = None                # rates of the latest sample (see sample)
+        self.samples = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.series = None
+
+    def start(self):
+        if self.file_name:
+            self.series = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), self.file_name), 'a')
+            self.series.write(json.dumps({"version": SERIES_VERSION, "interval": self.interval, "rates": RATES,
+                                          "start": time.time()}, sort_keys=True) + "\n")
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.series is not None:
+            self.series.close()
+            self.series = None
+
+    def run(self):
+        deadline = time.time()
+        while not self.stopped.is_set():
+            self.sample()
+            deadline += self.interval
+            self.stopped.wait(max(deadline - time.time(), 0))
+
+    """ Reads the counters of every port, appends them to the rings and streams the rates of the ports that carried
+        traffic (or dropped packets) with the totals of each tier
+    """
+    def sample(self):
+        timestamp = time.time()
+        counters = read_counters()
+        ports = {}
+        tiers = {}
+        with self.lock:
+            seen = set()
+            for name, switch, tier in switch_ports(self.net):
+                if name not in counters:
+                    continue
+                seen.add(name)
+                ring = self.rings.get(name)
+                if ring is None:
+                    ring = self.rings[name] = PortRing(self.history)
+                ring.append(timestamp, counters[name])
+                rates = ring.rates()
+                totals = tiers.setdefault(tier, {"rx_bps": 0.0, "tx_bps": 0.0, "drops": 0, "ports": 0})
+                totals["ports"] += 1
+                if rates is None:
+                    continue
+                totals["rx_bps"] += rates[0]
+                totals["tx_bps"] += rates[1]
+                totals["drops"] += rates[4] + rates[5]
+                if any(rates):
+                    ports[name] = [round(value, 1) for value in rates]
+            for name in list(self.rings):
+                if name not in seen:    # port of a switch removed from the running fabric
+                    del self.rings[name]
+            for totals in tiers.values():
+                totals["util"] = (round(totals["tx_bps"] / (totals["ports"] * self.link_bps), 4)
+                                  if self.link_bps and totals["ports"] else None)
+                totals["rx_bps"], totals["tx_bps"] = round(totals["rx_bps"], 1), round(totals["tx_bps"], 1)
+            self.samples += 1
+            self.last = {"time": timestamp, "ports": ports, "tiers": tiers}
+        if self.series is not None:
+            self.series.write(json.dumps({"time": round(timestamp, 3), "ports": ports, "tiers": tiers},
+                                         sort_keys=True) + "\n")
+            self.series.flush()
+
+    """ Returns the rates of the latest sample: {"time", "ports": {interface: rates}, "tiers": {tier: totals}}
+    """
+    def latest(self):
+        with self.lock:
+            return self.last
@@ -0,0 +1,156 @@
+#  Parallel switch startup for the generated Mininet topologies
+#
+#  Mininet starts the switches one after the other and StratumBmv2Switch waits for the gRPC server of each switch
+#  before returning, so the bring-up of a fabric grows with the number of switches times the startup of stratum_bmv2.
+#  ParallelMininet starts the switches from a bounded pool of threads and waits for all the gRPC ports together.
+
+### LIBRARIES ###
+from __future__ import division
+import json
+import multiprocessing
+import socket
+import threading
+import time
+from itertools import groupby
+
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
+
+from mininet.log import info, warn
+from mininet.net import Mininet
+
+
+### CONSTANTS ###
+DEFAULT_WORKERS = multiprocessing.cpu_count()     # Number of switches started at the same time
+GRPC_TIMEOUT = 120                      # Time (in seconds) to wait for the gRPC ports of all the switches
+POLL_INTERVAL = 0.05                    # Time (in seconds) between two checks of the gRPC ports
+
+
+### FUNCTIONS ###
+
+""" Returns True if a TCP port of the local host accepts connections
+"""
+def listening(port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        return sock.connect_ex(('127.0.0.1', port)) == 0
+    finally:
+        sock.close()
+
+
+### CLASSES ###
+
+""" Mininet network whose switches are started concurrently
+    readiness: {switch name: time (in seconds) from the launch of the switch until its gRPC port accepted connections}
+    Input: number of switches started at the same time (the CPU count by default); file to write the readiness times
+           to (JSON, optional); arguments of Mininet
+"""
+class ParallelMininet(Mininet):
+
+    def __init__(self, workers=DEFAULT_WORKERS, readiness_file=None, *args, **kwargs):
+        self.workers = max(workers, 1)
+        self.readiness_file = readiness_file
+        self.readiness = {}
+        Mininet.__init__(self, *args, **kwargs)
+
+    """ Same as Mininet.start, with the switches started by a pool of threads
+    """
+    def start(self):
+        if not self.built:
+            self.build()
+        info('*** Starting controller\n')
+        for controller in self.controllers:
+            info(controller.name + ' ')
+            controller.start()
+        info('\n')
+
+        info('*** Starting %s switches (%d at a time)\n' % (len(self.switches), self.workers))
+        start = time.time()
+        self.start_switches()
+        for swclass, switches in groupby(sorted(self.switches, key=lambda s: str(type(s))), type):
+            if hasattr(swclass, 'batchStartup'):
+                swclass.batchStartup(tuple(switches))
+        self.report(time.time() - start)
+
+        wait_connected = getattr(self, 'waitConn', None)
+        if wait_connected:
+            self.waitConnected(wait_connected)
+
+    """ Starts the switches from the pool of threads while the gRPC ports of the launched switches are checked, and
+        returns when every port accepts connections (or on timeout)
+    """
+    def start_switches(self):
+        queue = Queue()
+        for switch in self.switches:
+            queue.put(switch)
+        launched = {}                   # switch -> launch time
+        started = set()                 # switches whose start returned
+        errors = {}                     # switch -> exception raised by its start
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                try:
+                    switch = queue.get_nowait()
+                except Empty:
+                    return
+                with lock:
+                    launched[switch] = time.time()
+                try:
+                    switch.start(self.controllers)
+                except Exception as error:
+                    with lock:
+                        errors[switch] = error
+                with lock:
+                    started.add(switch)
+
+        threads = [threading.Thread(target=worker) for _ in range(min(self.workers, len(self.switches)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        deadline = time.time() + GRPC_TIMEOUT
+        pending = set(self.switches)
+        while pending and time.time() < deadline:
+            running = any(thread.is_alive() for thread in threads)
+            with lock:
+                pending.difference_update(errors)
+                candidates = [s for s in pending if s in launched]
+            for switch in candidates:
+                port = getattr(switch, 'grpcPort', None)
+                if (port is None and not running) or (port is not None and listening(port)):
+                    self.readiness[switch.name] = time.time() - launched[switch]
+                    pending.discard(switch)
+            if not running and not [s for s in pending if getattr(s, 'grpcPort', None) is not None]:
+                break
+            time.sleep(POLL_INTERVAL)
+
+        while True:                     # the switches not launched by the deadline are not launched any more
+            try:
+                queue.get_nowait()
+            except Empty:
+                break
+        for thread in threads:
+            thread.join(max(deadline - time.time(), 0))     # a switch whose start hangs does not block the bring-up
+        with lock:
+            hanging = [switch for switch in launched if switch not in started]
+        for switch in hanging:
+            warn('*** Start of %s still running after %ds\n' % (switch.name, GRPC_TIMEOUT))
+        for switch, error in errors.items():
+            warn('*** Error starting %s: %s\n' % (switch.name, error))
+        for switch in pending:
+            warn('*** gRPC port of %s not ready after %ds\n' % (switch.name, GRPC_TIMEOUT))
+
+    """ Logs the startup time and the slowest switches, and writes the readiness times to the readiness file
+    """
+    def report(self, elapsed):
+        slowest = sorted(self.readiness.items(), key=lambda item: -item[1])[:3]
+        info('*** %d switches ready in %.2fs (slowest: %s)\n' % (
+            len(self.readiness), elapsed, ', '.join('%s %.2fs' % item for item in slowest)))
+        if self.readiness_file:
+            f_readiness = open(self.readiness_file, 'w')
+            json.dump({"workers": self.workers, "elapsed": elapsed, "switches": self.readiness}, f_readiness,
+                      indent=2, sort_keys=True)
+            f_readiness.close()
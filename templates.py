@@ -0,0 +1,47 @@
+#  Precompiled text templates of the generators
+#
+#  A template is written once with named slots ($name, or ${name} when the slot is followed by a letter, a digit or an
+#  underscore) and compiled when it is created into a %-format string, so that rendering an entity is a single string
+#  formatting of the values of its slots: no split, replace and join of the template lines per entity. The literal %
+#  of the template are escaped by the compilation.
+
+### LIBRARIES ###
+import re
+
+
+### CONSTANTS ###
+SLOT_PATTERN = re.compile(r'\$(?:(\w+)|\{(\w+)\})')
+
+
+### CLASSES ###
+
+""" Template compiled into a %-format string with one named slot per $name
+    slots: names of the slots, in the order of their first occurrence
+    Input: text of the template
+"""
+class Template(object):
+    __slots__ = ("text", "format", "slots")
+
+    def __init__(self, text):
+        self.text = text
+        self.slots = []
+        self.format = SLOT_PATTERN.sub(self.compile_slot, text.replace('%', '%%'))
+
+    def compile_slot(self, match):
+        name = match.group(1) or match.group(2)
+        if name not in self.slots:
+            self.slots.append(name)
+        return '%(' + name + ')s'
+
+    """ Renders an entity
+        Input: values of the slots (dictionary)
+    """
+    def render(self, values):
+        return self.format % values
+
+    """ Renders a batch of entities into a single string
+        Input: values of the slots of each entity (iterable of dictionaries)
+    """
+    def render_all(self, rows):
+        fmt = self.format
+        return ''.join([fmt % values for values in rows])
@@ -0,0 +1,363 @@
+#  Throughput benchmark of the generated fabrics (all-pairs matrix and ECMP spread)
+#
+#  Flows are run between hosts attached to different leaves, in one of the patterns below, with iperf or with the
+#  built-in generator of this module (python throughput.py serve|send, for images without iperf). The flows are
+#  scheduled in rounds of at most "parallelism" concurrent flows, a host sending one flow at a time; the flows of a
+#  round run together, so the aggregate throughput of a round is the bandwidth the fabric delivered across leaves (the
+#  bisection bandwidth for a permutation run in a single round). The bytes sent by the spines during the run are read
+#  from their interface counters, to show how evenly ECMP spread the load. The report is saved as JSON.
+#    permutation: every host sends to one host of another leaf, and receives from one
+#    all-to-all: every host sends to every host of the other leaves
+#    incast: every host of the other leaves sends to a single host
+
+### LIBRARIES ###
+from __future__ import division
+from __future__ import print_function
+import json
+import os
+import random
+import select
+import socket
+import sys
+import threading
+import time
+
+from port_counters import COUNTERS, read_counters, switch_tier
+
+try:
+    from mininet.log import info, warn
+except ImportError:                     # the built-in generator runs outside of Mininet (python throughput.py ...)
+    info = warn = None
+
+
+### CONSTANTS ###
+PATTERNS = ["permutation", "all-to-all", "incast"]
+TOOLS = ["iperf", "builtin"]
+DEFAULT_DURATION = 5                    # Duration (in seconds) of each flow
+DEFAULT_PARALLELISM = 32                # Number of flows running at the same time
+DEFAULT_PORT = 5201                     # Port of the receivers
+DEFAULT_SEED = 1                        # Seed of the pairing of the permutation
+REPORT_VERSION = 1                      # Version of the layout of the report
+SERVER_STARTUP = 1                      # Time (in seconds) given to the receivers to listen before the flows start
+CLIENT_GRACE = 5                        # Extra time (in seconds) after the duration before a flow is interrupted
+BUFFER_SIZE = 64 * 1024                 # Size (in bytes) of the writes of the built-in generator
+
+
+### FUNCTIONS ###
+
+""" Returns the address of a host (IPv4 hosts are configured with "ip", IPv6 hosts with "ipv6")
+"""
+def address(host):
+    return (host.params.get('ip') or host.params.get('ipv6')).split('/')[0]
+
+
+""" Returns the name of the switch a host is attached to
+"""
+def host_leaf(host):
+    link = host.defaultIntf().link
+    peer = link.intf2 if link.intf1.node is host else link.intf1
+    return peer.node.name
+
+
+""" Returns the flows of a pattern: [(sender, receiver), ...], between hosts of different leaves
+    Input: hosts; {host name: leaf}; pattern (PATTERNS); receiver of the incast (the first host by default); seed of the
+           pairing of the permutation
+"""
+def pattern_flows(hosts, leaves, pattern, target=None, seed=DEFAULT_SEED):
+    if pattern == "all-to-all":
+        return [(src, dst) for src in hosts for dst in hosts if leaves[src.name] != leaves[dst.name]]
+    if pattern == "incast":
+        receivers = [host for host in hosts if host.name == target] if target else hosts[:1]
+        if not receivers:
+            raise ValueError("unknown host %r" % target)
+        receiver = receivers[0]
+        return [(src, receiver) for src in hosts if leaves[src.name] != leaves[receiver.name]]
+    if pattern == "permutation":
+        # hosts ordered by leaf (shuffled within each leaf) and paired with the host one leaf size further: the
+        # receiver is on another leaf as long as no leaf has more than half of the hosts
+        rng = random.Random(seed)
+        by_leaf = {}
+        for host in hosts:
+            by_leaf.setdefault(leaves[host.name], []).append(host)
+        ordered = []
+        for leaf in sorted(by_leaf):
+            rng.shuffle(by_leaf[leaf])
+            ordered.extend(by_leaf[leaf])
+        shift = max(len(group) for group in by_leaf.values()) if by_leaf else 0
+        flows = [(src, ordered[(i + shift) % len(ordered)]) for i, src in enumerate(ordered)]
+        return [(src, dst) for src, dst in flows if leaves[src.name] != leaves[dst.name]]
+    raise ValueError("unknown pattern %r (%s)" % (pattern, ", ".join(PATTERNS)))
+
+
+""" Schedules the flows in rounds of at most "parallelism" flows, each sender sending one flow per round (the senders
+    take turns, so that every round mixes the senders)
+    Output: [[(sender, receiver), ...], ...]
+"""
+def schedule(flows, parallelism):
+    queues = {}
+    order = []
+    for src, dst in flows:
+        if src.name not in queues:
+            queues[src.name] = []
+            order.append(src.name)
+        queues[src.name].append((src, dst))
+    for queue in queues.values():
+        queue.reverse()
+
+    rounds = []
+    start = 0
+    while order:
+        count = min(parallelism, len(order))
+        turn = [order[(start + i) % len(order)] for i in range(count)]
+        rounds.append([queues[name].pop() for name in turn])
+        following = order[(start + count) % len(order)]
+        order = [name for name in order if queues[name]]
+        start = order.index(following) if following in order else 0
+    return rounds
+
+
+""" Returns the command that starts a receiver in the background, followed by its process id
+"""
+def server_command(tool, port, ipv6):
+    if tool == "iperf":
+        command = "iperf -s -p %d%s" % (port, " -V" if ipv6 else "")
+    else:
+        command = "%s %s serve %d%s" % (sys.executable, os.path.abspath(__file__).replace('.pyc', '.py'), port,
+                                         " --ipv6" if ipv6 else "")
+    return command + " > /dev/null 2>&1 & echo $!"
+
+
+""" Returns the command of a flow: its last line of output ends with the bytes sent and the throughput (bits/s)
+"""
+def client_command(tool, destination, port, duration):
+    ipv6 = ':' in destination
+    if tool == "iperf":
+        return "iperf -c %s -p %d -t %d -y C%s 2>&1" % (destination, port, duration, " -V" if ipv6 else "")
+    return "%s %s send %s %d %d 2>&1" % (sys.executable, os.path.abspath(__file__).replace('.pyc', '.py'),
+                                         destination, port, duration)
+
+
+""" Returns the bytes sent and the throughput (bits/s) reported by a flow (None, None if the flow failed)
+"""
+def parse_result(output):
+    lines = [line.strip() for line in output.splitlines() if line.strip().count(',') >= 1]
+    if not lines:
+        return None, None
+    fields = lines[-1].split(',')
+    try:
+        return int(float(fields[-2])), float(fields[-1])
+    except ValueError:
+        return None, None
+
+
+""" Returns the bytes sent so far by each spine: {switch name: bytes} (sum of the counters of its interfaces)
+    Input: switches of a tier of spines (spines or super spines)
+"""
+def spine_bytes(spines):
+    counters = read_counters()
+    tx_bytes = COUNTERS.index("tx_bytes")
+    return dict((switch.name, sum(counters[name][tx_bytes] for name in switch.intfNames() if name in counters and
+                                  name != 'lo')) for switch in spines)
+
+
+""" Returns how evenly the load was spread: mean, min and max bytes per spine, imbalance (max / mean), coefficient of
+    variation and Jain's fairness index (1 when every spine carried the same load)
+"""
+def spread(loads):
+    values = list(loads.values())
+    if not values or not sum(values):
+        return None
+    mean = sum(values) / len(values)
+    variance = sum((value - mean) ** 2 for value in values) / len(values)
+    return {"mean": mean, "min": min(values), "max": max(values), "imbalance": max(values) / mean,
+            "cv": variance ** 0.5 / mean, "jain": sum(values) ** 2 / (len(values) * sum(v * v for v in values))}
+
+
+""" Runs the flows of a round together, with a deadline
+    Output: [{"src", "dst", "bytes", "bps", "error"}, ...]
+"""
+def run_round(flows, tool, port, duration):
+    active = {}                         # file descriptor of the sender shell -> [sender, receiver, output]
+    results = []
+    poller = select.poll()
+    for src, dst in flows:
+        src.sendCmd(client_command(tool, address(dst), port, duration))
+        fd = src.stdout.fileno()
+        poller.register(fd, select.POLLIN)
+        active[fd] = [src, dst, '']
+
+    deadline = time.time() + duration + CLIENT_GRACE
+    while active:
+        for fd, _ in poller.poll(100):
+            entry = active[fd]
+            entry[2] += entry[0].monitor(0)
+            if not entry[0].waiting:
+                poller.unregister(fd)
+                del active[fd]
+                results.append(flow_result(entry[0], entry[1], entry[2]))
+        if time.time() > deadline:
+            for fd, entry in list(active.items()):
+                entry[0].sendInt()
+                entry[0].waitOutput()
+                poller.unregister(fd)
+                del active[fd]
+                results.append({"src": entry[0].name, "dst": entry[1].name, "bytes": None, "bps": None,
+                                "error": "interrupted after %ds" % (duration + CLIENT_GRACE)})
+    return results
+
+
+""" Returns the result of a flow from the output of its command
+"""
+def flow_result(src, dst, output):
+    sent, bps = parse_result(output)
+    result = {"src": src.name, "dst": dst.name, "bytes": sent, "bps": bps, "error": None}
+    if bps is None:
+        result["error"] = output.strip().splitlines()[-1] if output.strip() else "no output"
+    return result
+
+
+""" Runs a throughput benchmark on the running network
+    Input: Mininet network; pattern (PATTERNS); duration (in seconds) of each flow; number of flows running at the same
+           time; tool (TOOLS); receiver of the incast; port of the receivers; seed of the permutation; JSON file the
+           report is written to (optional, relative to the directory of this module)
+    Output: report: the flows (with their round and throughput), the aggregate throughput of each round, the
+            bisection bandwidth (best aggregate of a round), the bytes sent by each spine and their spread (and by each
+            super spine and their spread, on 3-tier fabrics: the tiers are spread by ECMP separately)
+"""
+def run_benchmark(net, pattern="permutation", duration=DEFAULT_DURATION, parallelism=DEFAULT_PARALLELISM,
+                  tool="iperf", target=None, port=DEFAULT_PORT, seed=DEFAULT_SEED, report_file=None):
+    if tool not in TOOLS:
+        raise ValueError("unknown tool %r (%s)" % (tool, ", ".join(TOOLS)))
+    hosts = [host for host in net.hosts if host.params.get('ip') or host.params.get('ipv6')]
+    leaves = dict((host.name, host_leaf(host)) for host in hosts)
+    leaf_names = set(leaves.values())
+    spines = [switch for switch in net.switches if switch_tier(switch.name) == "spine"]
+    super_spines = [switch for switch in net.switches if switch_tier(switch.name) == "sspine"]
+    flows = pattern_flows(hosts, leaves, pattern, target, seed)
+    rounds = schedule(flows, max(parallelism, 1))
+
+    receivers = dict((dst.name, dst) for _, dst in flows)
+    servers = []
+    for host in receivers.values():
+        pid = host.cmd(server_command(tool, port, ':' in address(host))).strip().splitlines()
+        servers.append((host, pid[-1] if pid else None))
+    time.sleep(SERVER_STARTUP)
+
+    start = time.time()
+    before = spine_bytes(spines + super_spines)
+    results = []
+    round_reports = []
+    try:
+        for index, current in enumerate(rounds):
+            round_start = time.time()
+            round_results = run_round(current, tool, port, duration)
+            for result in round_results:
+                result["round"] = index
+                result["src_leaf"], result["dst_leaf"] = leaves[result["src"]], leaves[result["dst"]]
+            results.extend(round_results)
+            round_reports.append({"round": index, "flows": len(current), "elapsed": time.time() - round_start,
+                                  "aggregate_bps": sum(result["bps"] or 0 for result in round_results)})
+    finally:
+        for host, pid in servers:
+            if pid:
+                host.cmd("kill %s 2>/dev/null" % pid)
+    after = spine_bytes(spines + super_spines)
+
+    loads = dict((switch.name, after[switch.name] - before.get(switch.name, 0)) for switch in spines)
+    super_loads = dict((switch.name, after[switch.name] - before.get(switch.name, 0)) for switch in super_spines)
+    throughputs = [result["bps"] for result in results if result["bps"] is not None]
+    report = {"version": REPORT_VERSION, "pattern": pattern, "tool": tool, "duration": duration,
+              "parallelism": parallelism, "hosts": len(hosts), "leaves": len(leaf_names),
+              "elapsed": time.time() - start, "flows": results, "rounds": round_reports,
+              "failed": sum(1 for result in results if result["bps"] is None),
+              "flow_bps": {"min": min(throughputs), "mean": sum(throughputs) / len(throughputs),
+                           "max": max(throughputs)} if throughputs else None,
+              "bisection_bps": max([r["aggregate_bps"] for r in round_reports] or [0]),
+              "spines": loads, "spread": spread(loads)}
+    if super_spines:
+        report.update(super_spines=super_loads, super_spine_spread=spread(super_loads))
+    if report_file:
+        f_report = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), report_file), 'w')
+        json.dump(report, f_report, indent=2, sort_keys=True)
+        f_report.close()
+    return report
+
+
+""" Logs the result of a throughput benchmark
+"""
+def print_report(report):
+    info("*** Throughput (%s, %s): %d flows in %d rounds, %.2fs\n" % (
+        report["pattern"], report["tool"], len(report["flows"]), len(report["rounds"]), report["elapsed"]))
+    if report["flow_bps"]:
+        info("*** Per flow: min %.1f / mean %.1f / max %.1f Mbit/s, bisection %.1f Mbit/s\n" % (
+            report["flow_bps"]["min"] / 1e6, report["flow_bps"]["mean"] / 1e6, report["flow_bps"]["max"] / 1e6,
+            report["bisection_bps"] / 1e6))
+    if report["spread"]:
+        info("*** Spine spread: imbalance %.2f, cv %.2f, jain %.3f\n" % (
+            report["spread"]["imbalance"], report["spread"]["cv"], report["spread"]["jain"]))
+    if report.get("super_spine_spread"):
+        info("*** Super spine spread: imbalance %.2f, cv %.2f, jain %.3f\n" % (
+            report["super_spine_spread"]["imbalance"], report["super_spine_spread"]["cv"],
+            report["super_spine_spread"]["jain"]))
+    if report["failed"]:
+        warn("*** %d flows failed\n" % report["failed"])
+
+
+""" Mininet CLI command: throughput [pattern] [duration] [parallelism] [tool] [report file] [incast receiver]
+"""
+def do_throughput(cli, line):
+    args = line.split()
+    pattern = args[0] if len(args) > 0 else "permutation"
+    duration = int(args[1]) if len(args) > 1 else DEFAULT_DURATION
+    parallelism = int(args[2]) if len(args) > 2 else DEFAULT_PARALLELISM
+    tool = args[3] if len(args) > 3 else "iperf"
+    report_file = args[4] if len(args) > 4 and args[4] != "-" else None     # "-": no report file
+    target = args[5] if len(args) > 5 else None
+    try:
+        print_report(run_benchmark(cli.mn, pattern, duration, parallelism, tool, target, report_file=report_file))
+    except ValueError as error:
+        print("throughput: %s" % error)
+
+
+""" Built-in receiver: accepts the flows and discards their data
+"""
+def serve(port, ipv6=False):
+    server = socket.socket(socket.AF_INET6 if ipv6 else socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("::" if ipv6 else "0.0.0.0", port))
+    server.listen(128)
+    while True:
+        connection, _ = server.accept()
+        thread = threading.Thread(target=drain, args=(connection,))
+        thread.daemon = True
+        thread.start()
+
+
+def drain(connection):
+    while connection.recv(BUFFER_SIZE):
+        pass
+    connection.close()
+
+
+""" Built-in sender: sends as fast as possible for the duration, then prints the bytes sent and the throughput (bits/s)
+"""
+def send(destination, port, duration):
+    client = socket.socket(socket.AF_INET6 if ':' in destination else socket.AF_INET, socket.SOCK_STREAM)
+    client.connect((destination, port))
+    data = b'\0' * BUFFER_SIZE
+    sent = 0
+    start = time.time()
+    while time.time() - start < duration:
+        sent += client.send(data)
+    client.close()
+    print("%d,%f" % (sent, sent * 8 / (time.time() - start)))
+
+
+""" Main funcion (built-in generator: serve <port> [--ipv6] | send <address> <port> <duration>) """
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "serve":
+        serve(int(sys.argv[2]), "--ipv6" in sys.argv[3:])
+    elif len(sys.argv) > 4 and sys.argv[1] == "send":
+        send(sys.argv[2], int(sys.argv[3]), float(sys.argv[4]))
+    else:
+        sys.exit("usage: throughput.py serve <port> [--ipv6] | send <address> <port> <duration>")
@@ -15,15 +15,42 @@
 #  limitations under the License.
 
 import argparse
+import sys
 
 from mininet.cli import CLI
-from mininet.log import setLogLevel
+from mininet.log import error, setLogLevel
 from mininet.net import Mininet
 from mininet.node import Host
 from mininet.topo import Topo
 from stratum import StratumBmv2Switch
 
+from fabric_mutation import DEFAULT_CONTROL_PORT, do_fabric, start_control
+import failover
+from host_discovery import DEFAULT_PARALLELISM, DEFAULT_RETRIES, DEFAULT_TIMEOUT, discover_hosts, do_discover, \
+    print_report
+from metrics import Metrics
+from port_counters import DEFAULT_HISTORY, DEFAULT_INTERVAL, do_counters, start_sampler
+from switch_startup import DEFAULT_WORKERS, ParallelMininet
+import throughput
+from topo_partitions import attach_cross_links, partition_topo, run_partitions, wait_for_stop
+
 CPU_PORT = 255
+PARTITIONS_FILE = 'topo-custom-v6-partitions.json'
+FABRIC_FILE = 'topo-custom-v6-fabric.json'
+MUTATIONS_FILE = 'topo-custom-v6-mutations.jsonl'
+
+
+def batchConfig(host, commands, intf):
+    """Runs the `ip` commands of a host in a single `ip -batch` call and
+    disables the offloads of its interface with a single ethtool call, in one
+    round-trip on the host shell. Both only print on errors, which are logged
+    together.
+    """
+    out = host.cmd("printf '%%s\\n' %s | ip -force -batch - 2>&1; "
+                   "/sbin/ethtool --offload %s rx off tx off sg off 2>&1 >/dev/null"
+                   % (' '.join("'%s'" % c for c in commands), intf))
+    if out.strip():
+        error('*** Error configuring %s: %s\n' % (host.name, out.strip()))
 
 
 class IPv6Host(Host):
@@ -32,15 +59,13 @@ class IPv6Host(Host):
 
     def config(self, ipv6, ipv6_gw=None, **params):
         super(IPv6Host, self).config(**params)
-        self.cmd('ip -4 addr flush dev %s' % self.defaultIntf())
-        self.cmd('ip -6 addr flush dev %s' % self.defaultIntf())
-        self.cmd('ip -6 addr add %s dev %s' % (ipv6, self.defaultIntf()))
+        intf = self.defaultIntf()
+        commands = ['addr flush dev %s' % intf,
+                    'addr add %s dev %s' % (ipv6, intf)]
         if ipv6_gw:
-            self.cmd('ip -6 route add default via %s' % ipv6_gw)
-        # Disable offload
-        for attr in ["rx", "tx", "sg"]:
-            cmd = "/sbin/ethtool --offload %s %s off" % (self.defaultIntf(), attr)
-            self.cmd(cmd)
+            commands.append('route add default via %s' % ipv6_gw)
+        # Configure the interface and disable offload in one round-trip
+        batchConfig(self, commands, intf)
 
         def updateIP():
             return ipv6.split('/')[0]
@@ -146,11 +171,115 @@ class TutorialTopo(Topo):
         self.addLink(h4d, leaf4) # port 7
 
 
-def main():
-    net = Mininet(topo=TutorialTopo(), controller=None)
-    net.start()
-    CLI(net)
-    net.stop()
+def hostParams(host):
+    """Parameters of a host of the fabric model added to the running
+    topology (the same as the hosts of TutorialTopo).
+    """
+    return dict(mac=host.mac, ipv6=host.ipv6 + '/' + str(host.ipv6_prefix), ipv6_gw=host.ipv6_gateway)
+
+
+class FabricCLI(CLI):
+    """Mininet CLI with the fabric commands (discover, fabric, throughput,
+    counters, failover)."""
+
+    do_discover = do_discover
+    do_fabric = do_fabric
+    do_throughput = throughput.do_throughput
+    do_counters = do_counters
+    do_failover = failover.do_failover
+
+
+def main(args):
+    if args.partitions:
+        # Coordinator: runs this script once per partition (without the
+        # --partitions argument) and stops every partition together
+        sys.exit(run_partitions(__file__, PARTITIONS_FILE,
+                                [arg for arg in sys.argv[1:] if arg != '--partitions']))
+    # Per-phase metrics: wall time, CPU time, RSS and counts of each step of
+    # the bring-up (--metrics-file, --metrics-summary)
+    metrics = Metrics(args.metrics_file, args.metrics_summary, __file__,
+                      {'partition': args.partition, 'parallel_start': args.parallel_start,
+                       'discover': args.discover, 'throughput': args.throughput,
+                       'failover': args.failover})
+    with metrics.phase('topo') as counts:
+        if args.partition is not None:
+            topo = partition_topo(PARTITIONS_FILE, args.partition, StratumBmv2Switch,
+                                  IPv6Host, cpuport=CPU_PORT)
+        else:
+            topo = TutorialTopo()
+        counts.update(switches=len(topo.switches()), links=len(topo.links()),
+                      hosts=len(topo.hosts()))
+    # The benchmark arguments are checked before the network is started
+    if (args.throughput == 'incast' and args.throughput_target and args.partition is None and
+            args.throughput_target not in topo.hosts()):
+        sys.exit('unknown host %s (--throughput-target)' % args.throughput_target)
+    if args.failover and args.partition is None:
+        try:
+            failover.parse_target(args.failover, args.failover_target, topo.switches())
+        except ValueError as error:
+            sys.exit('%s (--failover-target)' % error)
+    if args.parallel_start:
+        net = ParallelMininet(workers=args.start_workers, readiness_file=args.readiness_file,
+                              topo=topo, controller=None)
+    else:
+        net = Mininet(topo=topo, controller=None)
+    # The host config is done while the network is built
+    metrics.wrap(net, 'configHosts', 'host_config')
+    with metrics.phase('build') as counts:
+        if args.partition is not None:
+            attach_cross_links(net, PARTITIONS_FILE, args.partition)
+        else:
+            net.build()
+        counts.update(switches=len(net.switches), links=len(net.links),
+                      hosts=len(net.hosts))
+    with metrics.phase('start', switches=len(net.switches)):
+        net.start()
+    sampler = None
+    try:
+        # Per-port counters of the switches, sampled during the run (--counters)
+        if args.counters and args.partition is None:
+            sampler = start_sampler(net, args.counters_interval, args.counters_history,
+                                    args.counters_file, args.counters_link_mbps)
+        if args.discover:
+            with metrics.phase('discovery') as counts:
+                report = discover_hosts(net, args.discovery_parallelism, args.discovery_timeout,
+                                        args.discovery_retries, args.onos_url)
+                counts.update(hosts=report['hosts'], failed=len(report['failed']))
+            print_report(report)
+        if args.throughput and args.partition is None:
+            with metrics.phase('throughput') as counts:
+                report = throughput.run_benchmark(net, args.throughput, args.throughput_duration,
+                                                  args.throughput_parallelism, args.throughput_tool,
+                                                  args.throughput_target,
+                                                  report_file=args.throughput_report)
+                counts.update(hosts=report['hosts'], flows=len(report['flows']),
+                              failed=report['failed'])
+            throughput.print_report(report)
+        if args.failover and args.partition is None:
+            with metrics.phase('failover') as counts:
+                report = failover.run_benchmark(net, args.failover, args.failover_repeat,
+                                                args.failover_pairs, args.failover_rate,
+                                                args.failover_hold, args.failover_settle,
+                                                args.failover_target,
+                                                report_file=args.failover_report)
+                counts.update(runs=len(report['runs']), pairs=len(report['pairs']))
+            failover.print_report(report)
+        if args.control and args.partition is None:
+            start_control(net, FABRIC_FILE, MUTATIONS_FILE, StratumBmv2Switch, IPv6Host, hostParams,
+                          args.control_port, cpuport=CPU_PORT)
+        if args.partition is not None:
+            wait_for_stop()
+        else:
+            FabricCLI(net)
+    finally:
+        # The network is stopped even when a benchmark fails, so that no switch
+        # process or veth is left behind
+        if sampler is not None:
+            sampler.stop()
+        with metrics.phase('stop'):
+            net.stop()
+    if args.partition is not None:
+        return
     print '#' * 80
     print 'ATTENTION: Mininet was stopped! Perhaps accidentally?'
     print 'No worries, it will restart automatically in a few seconds...'
@@ -163,7 +292,73 @@ def main():
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description='Mininet topology script for 4x3 fabric with stratum_bmv2 and IPv6 hosts')
+    parser.add_argument('--parallel-start', action='store_true',
+                        help='start the switches concurrently and wait for their gRPC ports together')
+    parser.add_argument('--start-workers', type=int, default=DEFAULT_WORKERS,
+                        help='number of switches started at the same time (default: CPU count)')
+    parser.add_argument('--readiness-file', default=None,
+                        help='JSON file to write the readiness time of each switch to')
+    parser.add_argument('--discover', action='store_true',
+                        help='make every host ping its gateway after the start, so that ONOS learns the hosts')
+    parser.add_argument('--discovery-parallelism', type=int, default=DEFAULT_PARALLELISM,
+                        help='number of hosts pinging at the same time')
+    parser.add_argument('--discovery-timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help='deadline (in seconds) of the ping of each host')
+    parser.add_argument('--discovery-retries', type=int, default=DEFAULT_RETRIES,
+                        help='number of retries of the hosts that did not get an answer')
+    parser.add_argument('--onos-url', default=None,
+                        help='ONOS URL (e.g. http://onos:8181) to report the hosts it did not learn')
+    parser.add_argument('--throughput', choices=throughput.PATTERNS, default=None,
+                        help='run a throughput benchmark between the hosts of different leaves after the start')
+    parser.add_argument('--throughput-duration', type=int, default=throughput.DEFAULT_DURATION,
+                        help='duration (in seconds) of each flow of the benchmark')
+    parser.add_argument('--throughput-parallelism', type=int, default=throughput.DEFAULT_PARALLELISM,
+                        help='number of flows of the benchmark running at the same time')
+    parser.add_argument('--throughput-tool', choices=throughput.TOOLS, default='iperf',
+                        help='traffic generator of the benchmark (builtin when iperf is not installed)')
+    parser.add_argument('--throughput-target', default=None,
+                        help='host receiving the incast (default: the first host)')
+    parser.add_argument('--throughput-report', default='throughput-report.json',
+                        help='JSON file to save the report of the benchmark to (next to this script)')
+    parser.add_argument('--failover', nargs='+', choices=failover.SCENARIOS, default=None,
+                        help='measure the convergence time of the fabric after these failures and their restoration')
+    parser.add_argument('--failover-repeat', type=int, default=failover.DEFAULT_REPEAT,
+                        help='number of runs of each failure scenario')
+    parser.add_argument('--failover-pairs', type=int, default=failover.DEFAULT_PAIRS,
+                        help='number of host pairs (on different leaves) probing during the failures')
+    parser.add_argument('--failover-rate', type=int, default=failover.DEFAULT_RATE,
+                        help='probes sent per second by each host pair')
+    parser.add_argument('--failover-hold', type=float, default=failover.DEFAULT_HOLD,
+                        help='time (in seconds) each failure is held before it is restored')
+    parser.add_argument('--failover-settle', type=float, default=failover.DEFAULT_SETTLE,
+                        help='time (in seconds) probed before each failure and after each restoration')
+    parser.add_argument('--failover-target', default=None,
+                        help='link (leafN:spineM) or spine failed (default: the one carrying the most probes)')
+    parser.add_argument('--failover-report', default='failover-report.json',
+                        help='JSON file to save the report of the benchmark to (next to this script)')
+    parser.add_argument('--counters', action='store_true',
+                        help='sample the counters of every switch port while running (counters command)')
+    parser.add_argument('--counters-interval', type=float, default=DEFAULT_INTERVAL,
+                        help='time (in seconds) between two samples of the port counters')
+    parser.add_argument('--counters-history', type=int, default=DEFAULT_HISTORY,
+                        help='number of samples kept for each port')
+    parser.add_argument('--counters-file', default='port-counters.jsonl',
+                        help='JSON-lines file to stream the port rates to (next to this script)')
+    parser.add_argument('--counters-link-mbps', type=float, default=None,
+                        help='capacity (in Mbit/s) of the links, to report the utilization of each tier')
+    parser.add_argument('--control', action='store_true',
+                        help='allow leaves, spines and hosts to be added or removed while running (fabric command)')
+    parser.add_argument('--control-port', type=int, default=DEFAULT_CONTROL_PORT,
+                        help='port of the local HTTP endpoint of the fabric changes (default: %d)' % DEFAULT_CONTROL_PORT)
+    parser.add_argument('--partitions', action='store_true',
+                        help='run every partition of the fabric (generated with partitions=N) in its own process')
+    parser.add_argument('--partition', type=int, default=None,
+                        help='run a single partition of the fabric (started by --partitions)')
+    parser.add_argument('--metrics-file', default=None,
+                        help='JSON-lines file to append the metrics of each step of the start to')
+    parser.add_argument('--metrics-summary', action='store_true',
+                        help='print a table of the metrics of each step on exit')
     args = parser.parse_args()
     setLogLevel('info')
 
-    main()
+    main(args)
@@ -0,0 +1,207 @@
+#  Partitioned execution of the generated Mininet topologies
+#
+#  A single Mininet process starts and supervises every switch and host shell of the fabric. The generators can cut the
+#  fabric into partitions (write_partitions): each partition is a group of leaves (with their hosts) and of spines that
+#  runs in its own Mininet process on the same machine. The switches of every partition live in the root namespace, so
+#  a link between two partitions is a veth pair created by the coordinator (run_partitions) before the partitions start,
+#  and each partition attaches its end of the pair to its switch with the port number of the whole fabric. The gRPC port
+#  of each switch is the one of the fabric model (the port of its netcfg device), not the next port of the switch class,
+#  which starts again at the same port in every partition process.
+
+### LIBRARIES ###
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from topo_spec import add_hosts, spec_hosts
+
+
+### CONSTANTS ###
+PARTITIONS_VERSION = 2                  # Version of the layout of the partitions file
+POLL_INTERVAL = 0.5                     # Time (in seconds) between two checks of the partition processes
+STOP_TIMEOUT = 30                       # Time (in seconds) given to the partitions to stop before they are killed
+
+
+### FUNCTIONS ###
+
+""" Assigns every switch of a fabric to a partition: the leaves are cut in blocks of consecutive leaves, the spines of a
+    pod go with the middle leaf of the pod (the spines of a single pod are spread over the partitions) and the super
+    spines are spread over the partitions
+    Input: fabric model; number of partitions (1 to the number of leaves)
+    Output: {switch: index of its partition}
+"""
+def assign_partitions(fabric, count):
+    if not 1 <= count <= fabric.leafs:
+        raise ValueError("a fabric with %d leaves can be cut in 1 to %d partitions" % (fabric.leafs, fabric.leafs))
+    partition = {}
+    for i, switch in enumerate(fabric.leaf_switches):
+        partition[switch] = i * count // fabric.leafs
+    for i, switch in enumerate(fabric.spine_switches):
+        if fabric.pods > 1:
+            pod = i // fabric.pod_spines
+            partition[switch] = partition[fabric.leaf_switches[pod * fabric.pod_leafs + fabric.pod_leafs // 2]]
+        else:
+            partition[switch] = i * count // fabric.spines
+    for i, switch in enumerate(fabric.super_spine_switches):
+        partition[switch] = i * count // fabric.super_spines
+    return partition
+
+
+""" Returns the name Mininet gives to the interface of a port of a switch
+"""
+def intf_name(switch, port):
+    return switch.name + "-eth" + str(port)
+
+
+""" Writes the partitions of a fabric: for each partition its switches (with their gRPC ports), hosts, links (with the
+    port numbers of the whole fabric) and the ends of the links to other partitions, and the veth pairs of the links
+    between partitions
+    Input: name of the partitions file; fabric model; number of partitions; names of the host parameters; function
+           returning the values of the parameters of a host
+    Output: {switch: index of its partition}
+"""
+def write_partitions(file_name, fabric, count, host_fields, host_values):
+    partition = assign_partitions(fabric, count)
+    partitions = [{"switches": [], "links": [], "intfs": []} for _ in range(count)]
+    veths = []
+    for switch in fabric.switches:
+        partitions[partition[switch]]["switches"].append([switch.name, switch.grpc_port])
+    for link in fabric.switch_links():
+        index1, index2 = partition[link.node1], partition[link.node2]
+        if index1 == index2:
+            partitions[index1]["links"].append([link.node1.name, link.port1, link.node2.name, link.port2])
+        else:
+            intf1, intf2 = intf_name(link.node1, link.port1), intf_name(link.node2, link.port2)
+            partitions[index1]["intfs"].append([link.node1.name, link.port1, intf1])
+            partitions[index2]["intfs"].append([link.node2.name, link.port2, intf2])
+            veths.append([intf1, intf2])
+    for index, part in enumerate(partitions):
+        leaf_switches = [switch for switch in fabric.leaf_switches if partition[switch] == index]
+        hosts = [host for switch in leaf_switches for host in switch.hosts]
+        part["hosts"] = spec_hosts(hosts, host_fields, host_values)
+        part["links"].extend([host.name, 0, host.leaf.name, host.port] for host in hosts)
+
+    f_partitions = open(file_name, 'w')
+    json.dump({"version": PARTITIONS_VERSION, "partitions": partitions, "veths": veths}, f_partitions,
+              separators=(',', ':'))
+    f_partitions.close()
+    return partition
+
+
+""" Reads a partitions file (relative to the directory of this module, where the generators also write it)
+"""
+def read_partitions(file_name):
+    if not os.path.isabs(file_name):
+        file_name = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+    f_partitions = open(file_name, 'r')
+    partitions = json.load(f_partitions)
+    f_partitions.close()
+    if partitions.get("version") != PARTITIONS_VERSION:
+        raise ValueError("unsupported partitions version %r in %s" % (partitions.get("version"), file_name))
+    return partitions
+
+
+""" Returns the Mininet topology of a partition (the links to other partitions are attached by attach_cross_links)
+    Input: partitions file; index of the partition; class of the switches; class of the hosts; parameters of every
+           switch
+"""
+def partition_topo(file_name, index, switch_cls, host_cls, **switch_params):
+    from mininet.topo import Topo         # only available in the Mininet container, not where the generators run
+
+    part = read_partitions(file_name)["partitions"][index]
+    topo = Topo()
+    for name, _ in part["switches"]:
+        topo.addSwitch(str(name), cls=switch_cls, **switch_params)
+    add_hosts(topo, part["hosts"], host_cls)
+    for node1, port1, node2, port2 in part["links"]:
+        topo.addLink(str(node1), str(node2), port1=port1, port2=port2)
+    return topo
+
+
+""" Builds the network of a partition, sets the gRPC ports of its switches and attaches the ends of the veth pairs
+    (created by the coordinator) to its switches, before the switches are started
+    Input: Mininet network of the partition; partitions file; index of the partition
+"""
+def attach_cross_links(net, file_name, index):
+    from mininet.link import Intf
+
+    if not net.built:
+        net.build()
+    part = read_partitions(file_name)["partitions"][index]
+    for name, grpc_port in part["switches"]:
+        net[str(name)].grpcPort = grpc_port     # the gRPC port of the fabric model, not the next port of the class
+    for switch, port, name in part["intfs"]:
+        Intf(str(name), node=net[str(switch)], port=port)
+
+
+""" Blocks until the process is interrupted (Ctrl-C) or terminated by the coordinator, after which the termination
+    signals are ignored so that the partition can stop its network
+"""
+def wait_for_stop():
+    def terminate(signum, frame):
+        raise KeyboardInterrupt()
+
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        while True:
+            signal.pause()
+    except KeyboardInterrupt:
+        pass
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+""" Runs ip link commands, ignoring the errors of the interfaces that do not exist
+"""
+def ip_link(*args):
+    devnull = open(os.devnull, 'w')
+    try:
+        return subprocess.call(["ip", "link"] + list(args), stderr=devnull)
+    finally:
+        devnull.close()
+
+
+""" Coordinator: creates the veth pairs between the partitions, starts one process of the topology script per partition
+    and waits until one of them exits or the coordinator is interrupted, then stops every partition together and deletes
+    the veth pairs
+    Input: topology script; partitions file; arguments given to every partition (besides --partition)
+    Output: exit code (the first non-zero exit code of a partition)
+"""
+def run_partitions(script, file_name, args):
+    spec = read_partitions(file_name)
+    for intf1, intf2 in spec["veths"]:
+        ip_link("del", intf1)
+        if ip_link("add", intf1, "type", "veth", "peer", "name", intf2) != 0:
+            raise RuntimeError("cannot create the veth pair %s-%s" % (intf1, intf2))
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt()
+
+    signal.signal(signal.SIGTERM, terminate)
+    processes = []
+    try:
+        for index in range(len(spec["partitions"])):
+            processes.append(subprocess.Popen([sys.executable, script, "--partition", str(index)] + list(args)))
+        sys.stdout.write("*** %d partitions started (%d links between partitions)\n"
+                         % (len(processes), len(spec["veths"])))
+        while all(process.poll() is None for process in processes):
+            time.sleep(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        deadline = time.time() + STOP_TIMEOUT
+        while any(process.poll() is None for process in processes) and time.time() < deadline:
+            time.sleep(POLL_INTERVAL)
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        for intf1, _ in spec["veths"]:
+            ip_link("del", intf1)
+    return next((process.returncode for process in processes if process.returncode), 0)
@@ -0,0 +1,67 @@
+#  Compact topology spec for the generated Mininet topologies
+#
+#  Instead of one addSwitch/addHost/addLink line per entity, the generators can write the fabric to a spec file and a
+#  topo script whose topology loops over the spec, so the size (and the compile time) of the script does not grow with
+#  the fabric. The spec is written by the generators (write_spec) and read in the Mininet container (build_from_spec).
+
+### LIBRARIES ###
+import json
+import os
+
+
+### CONSTANTS ###
+SPEC_VERSION = 1                        # Version of the layout of the spec file
+
+
+### FUNCTIONS ###
+
+""" Writes the spec of a fabric: the switches (in the order their gRPC ports are assigned), the parameters of the hosts
+    (one row per host, in the order of the columns in "fields") and the links (in the order Mininet numbers the ports)
+    Input: name of the spec file; fabric model; names of the host parameters; function returning the values of the
+           parameters of a host
+"""
+def write_spec(file_name, fabric, host_fields, host_values):
+    spec = {"version": SPEC_VERSION,
+            "switches": [switch.name for switch in fabric.switches],
+            "hosts": spec_hosts(fabric.host_list, host_fields, host_values),
+            "links": [[link.node1.name, link.node2.name] for link in fabric.links]}
+    spec_file = open(file_name, 'w')
+    json.dump(spec, spec_file, separators=(',', ':'))
+    spec_file.close()
+
+
+""" Returns the hosts of a spec: the names of the host parameters and one row per host (name and parameters)
+    Input: hosts of the fabric; names of the host parameters; function returning the values of the parameters of a host
+"""
+def spec_hosts(hosts, host_fields, host_values):
+    return {"fields": list(host_fields), "rows": [[host.name] + list(host_values(host)) for host in hosts]}
+
+
+""" Adds the switches, hosts and links of a spec file to a Mininet topology
+    Input: topology; spec file (relative to the directory of this module, where the generators also write the spec);
+           class of the switches; class of the hosts; parameters of every switch
+"""
+def build_from_spec(topo, spec_file, switch_cls, host_cls, **switch_params):
+    if not os.path.isabs(spec_file):
+        spec_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), spec_file)
+    f_spec = open(spec_file, 'r')
+    spec = json.load(f_spec)
+    f_spec.close()
+    if spec.get("version") != SPEC_VERSION:
+        raise ValueError("unsupported topology spec version %r in %s" % (spec.get("version"), spec_file))
+
+    for name in spec["switches"]:
+        topo.addSwitch(str(name), cls=switch_cls, **switch_params)
+    add_hosts(topo, spec["hosts"], host_cls)
+    for node1, node2 in spec["links"]:
+        topo.addLink(str(node1), str(node2))
+
+
+""" Adds the hosts of a spec to a Mininet topology
+    Input: topology; hosts of the spec (see spec_hosts); class of the hosts
+"""
+def add_hosts(topo, hosts, host_cls):
+    fields = [str(field) for field in hosts["fields"]]
+    for row in hosts["rows"]:
+        params = dict(zip(fields, [str(value) if not isinstance(value, int) else value for value in row[1:]]))
+        topo.addHost(str(row[0]), cls=host_cls, **params)